@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""Memory and access time benchmark for model objects.
+
+Compares the slotted `Domain` implementation against the original
+dictionary-backed one, by materialising a portfolio of synthetic domain
+records:
+
+    python benchmarks/bench_models.py --count 100000
+"""
+
+import argparse
+import gc
+import json
+import logging
+import time
+import tracemalloc
+
+from dnsgateway.domain import Domain
+
+log = logging.getLogger(__name__)
+
+
+class InternedDomain(Domain):
+    """Slotted domain with string interning enabled."""
+
+    intern_strings = True
+
+
+class DictDomain(object):
+    """Dictionary-backed domain, as originally implemented."""
+
+    _keys = Domain._keys
+
+    _properties = {}
+
+    def __init__(self, client=None, **kwargs):
+        """Initialise a new instance."""
+        self.client = client
+        self._properties = {k: v for k, v in kwargs.items() if k in self._keys}
+
+    def __getattr__(self, name):
+        """Return value from internal attribute dictionary."""
+        try:
+            return self._properties[name]
+        except KeyError as e:
+            log.error(e)
+            raise AttributeError(e)
+
+    def __setattr__(self, name, value):
+        """Set the requested value on the internal attr dictionary."""
+        if name in self._keys:
+            raise NotImplementedError
+        super().__setattr__(name, value)
+
+
+def records(count):
+    """Generate synthetic domain records, as decoded from JSON."""
+    zones = ("co.za", "africa", "joburg", "capetown", "durban")
+    for i in range(count):
+        zone = zones[i % len(zones)]
+        record = {
+            "wid": i, "name": f"example-{i}.{zone}", "zone": zone,
+            "zone_id": i % len(zones), "transport": "epp",
+            "passthrough": False, "registrant": f"C{i % 100}",
+            "admin": f"C{i % 100}", "tech": f"C{i % 100}",
+            "billing": f"C{i % 100}", "cdate": "2019-01-01T00:00:00Z",
+            "expiry": "2020-01-01T00:00:00Z",
+            "curExpDate": "2020-01-01T00:00:00Z", "rar": 1, "period": 1,
+            "period_unit": "y", "autorenew": True,
+            "statuses": [{"status": "ok"}],
+            "hosts": [{"hostname": "ns1.example.net"},
+                      {"hostname": "ns2.example.net"}],
+        }
+        # round-trip through JSON so that strings are not shared
+        yield json.loads(json.dumps(record))
+
+
+def measure(cls, count):
+    """Measure memory and time used to build and read `count` objects.
+
+    Memory is the size of the objects and of the record data they retain
+    once the decoded records are discarded.
+    """
+    data = list(records(count))
+    gc.disable()
+    start = time.perf_counter()
+    objects = [cls(client=None, **record) for record in data]
+    build = time.perf_counter() - start
+    gc.enable()
+    start = time.perf_counter()
+    for obj in objects:
+        obj.name, obj.zone, obj.expiry, obj.statuses
+    access = time.perf_counter() - start
+    del data, objects
+    gc.collect()
+    tracemalloc.start()
+    data = list(records(count))
+    objects = [cls(client=None, **record) for record in data]
+    del data
+    gc.collect()
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(objects) == count
+    return memory, build, access
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=50000,
+                        help="number of domains to materialise")
+    args = parser.parse_args()
+    results = {cls.__name__: measure(cls, args.count)
+               for cls in (DictDomain, Domain, InternedDomain)}
+    print(f"{'implementation':<16}{'memory (MiB)':>14}"
+          f"{'bytes/object':>14}{'build (s)':>12}{'access (s)':>12}")
+    for name, (memory, build, access) in results.items():
+        print(f"{name:<16}{memory / 2 ** 20:>14.1f}"
+              f"{memory / args.count:>14.0f}{build:>12.3f}{access:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
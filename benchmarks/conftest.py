@@ -0,0 +1,80 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway benchmark fixtures.
+
+The benchmarks run against a seeded `MockGateway`, so measure the client and
+CLI rather than the network. Run them with:
+
+    pytest benchmarks --benchmark-autosave
+
+They are run separately from the test suite, as both have a `conftest`
+module.
+"""
+
+import itertools
+
+from dnsgateway import DnsGatewayClient
+from dnsgateway.testing import MockGateway, MockRegistry
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+DOMAINS = 2000
+CONTACTS = 200
+PAGE_SIZE = 100
+CREDENTIALS = ("bench", "bench")
+
+
+def record_rate(benchmark, count, unit="records"):
+    """Record the throughput of the benchmarked function."""
+    benchmark.extra_info[unit] = count
+    if benchmark.stats is not None:
+        mean = benchmark.stats.stats.mean
+        benchmark.extra_info[f"{unit}_per_second"] = round(count / mean)
+
+
+@pytest.fixture(scope="session")
+def registry():
+    """Provide a registry seeded with a large portfolio."""
+    return MockRegistry().seed(domains=DOMAINS, contacts=CONTACTS)
+
+
+@pytest.fixture(scope="session")
+def gateway(registry):
+    """Provide a mock gateway serving the seeded registry."""
+    with MockGateway(registry, page_size=PAGE_SIZE,
+                     credentials=CREDENTIALS) as gateway:
+        yield gateway
+
+
+@pytest.fixture
+def make_client(gateway):
+    """Provide a factory of clients of the mock gateway."""
+    clients = []
+
+    def make(**kwargs):
+        client = DnsGatewayClient(endpoint=gateway.endpoint,
+                                  username=CREDENTIALS[0],
+                                  password=CREDENTIALS[1], **kwargs)
+        clients.append(client)
+        return client
+    yield make
+    for client in clients:
+        client.close()
+
+
+@pytest.fixture(scope="session")
+def names():
+    """Provide a source of domain names never used before in the session."""
+    counter = itertools.count()
+    return lambda: f"bench-{next(counter)}.co.za"
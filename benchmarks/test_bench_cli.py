@@ -0,0 +1,51 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway CLI benchmarks."""
+
+import click.testing
+
+from conftest import CREDENTIALS, DOMAINS, record_rate
+
+from dnsgateway.cli import main
+
+import pytest
+
+
+@pytest.fixture
+def invoke(gateway):
+    """Provide a function invoking the CLI against the mock gateway."""
+    runner = click.testing.CliRunner()
+    options = ["--username", CREDENTIALS[0], "--password", CREDENTIALS[1],
+               "--endpoint-url", gateway.endpoint]
+
+    def invoke(*args):
+        result = runner.invoke(main, options + list(args))
+        assert result.exit_code == 0, result.output
+        return result.output
+    return invoke
+
+
+class TestCli(object):
+    """Benchmarks of CLI commands."""
+
+    @pytest.mark.parametrize("output_format", ("ndjson", "csv", "table"))
+    def test_domain_list(self, benchmark, invoke, output_format):
+        """Benchmark listing domains, projected to a few fields."""
+        output = benchmark(invoke, "--prefetch", "4", "domain", "list",
+                           "-o", output_format, "--fields", "wid,name")
+        assert output.count("\n") >= DOMAINS
+        record_rate(benchmark, DOMAINS)
+
+    def test_domain_list_pretty(self, benchmark, invoke):
+        """Benchmark listing domains in the default format."""
+        benchmark(invoke, "domain", "list")
+        record_rate(benchmark, DOMAINS)
@@ -0,0 +1,151 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway client benchmarks."""
+
+import datetime
+import io
+
+from conftest import CONTACTS, DOMAINS, record_rate
+
+from dnsgateway.mirror import Mirror
+from dnsgateway.plan import Planner, State
+from dnsgateway.renewal import RenewalScheduler
+
+import pytest
+
+BULK_ROWS = 50
+CONTACT = "seed-0-0"
+NOW = datetime.datetime(2020, 6, 1, tzinfo=datetime.timezone.utc)
+
+
+class TestListing(object):
+    """Benchmarks of collection listing throughput."""
+
+    @pytest.mark.parametrize("options", (
+        {},
+        {"prefetch": 4},
+        {"stream": True},
+        {"prefetch": 4, "stream": True},
+    ), ids=("serial", "prefetch", "stream", "prefetch-stream"))
+    def test_domains(self, benchmark, make_client, options):
+        """Benchmark listing every domain."""
+        client = make_client(**options)
+        count = benchmark(lambda: sum(1 for _ in client.domains))
+        assert count == DOMAINS
+        record_rate(benchmark, count)
+
+    def test_contacts(self, benchmark, make_client):
+        """Benchmark listing every contact."""
+        client = make_client()
+        count = benchmark(lambda: sum(1 for _ in client.contacts))
+        assert count == CONTACTS
+        record_rate(benchmark, count)
+
+
+class TestLookup(object):
+    """Benchmarks of single object lookup latency."""
+
+    def test_domain_by_wid(self, benchmark, make_client):
+        """Benchmark fetching a domain by wid."""
+        client = make_client()
+        domain = benchmark(client.domain, wid=DOMAINS // 2)
+        assert domain.wid == DOMAINS // 2
+
+    def test_domain_by_name(self, benchmark, make_client, registry):
+        """Benchmark looking a domain up by name."""
+        name = registry.get("domains", DOMAINS // 2)["name"]
+        client = make_client()
+        domain = benchmark(client.domain, name=name)
+        assert domain.name == name
+
+    def test_domain_cached(self, benchmark, make_client):
+        """Benchmark fetching a domain from the response cache."""
+        client = make_client(cache=True)
+        domain = benchmark(client.domain, wid=DOMAINS // 2)
+        assert domain.wid == DOMAINS // 2
+
+
+class TestBulkCreate(object):
+    """Benchmarks of bulk domain creation rates."""
+
+    @pytest.mark.parametrize("workers", (1, 8))
+    def test_create_domains(self, benchmark, make_client, names, workers):
+        """Benchmark creating a batch of domains."""
+        client = make_client()
+
+        def setup():
+            rows = [{"name": names()} for _ in range(BULK_ROWS)]
+            return (rows,), {}
+
+        def create(rows):
+            return [result["status"] for result in client.create_domains(
+                rows, workers=workers, admin=CONTACT, registrant=CONTACT,
+                billing=CONTACT, tech=CONTACT
+            )]
+        statuses = benchmark.pedantic(create, setup=setup, rounds=5)
+        assert statuses == ["created"] * BULK_ROWS
+        record_rate(benchmark, BULK_ROWS, unit="domains")
+
+
+class TestPlan(object):
+    """Benchmarks of planning an unchanged portfolio."""
+
+    @staticmethod
+    def _state(registry):
+        domains = {r["name"]: {"name": r["name"], "autorenew": r["autorenew"],
+                               "hosts": [h["hostname"] for h in r["hosts"]]}
+                   for r in registry.find("domains")}
+        return State(contacts={}, domains=domains)
+
+    def test_plan_mirror(self, benchmark, make_client, registry, tmp_path):
+        """Benchmark planning from a mirror, in a single listing pass."""
+        client = make_client()
+        state = self._state(registry)
+        with Mirror(str(tmp_path / "mirror.sqlite3"), client=client) as m:
+            planner = Planner(client, mirror=m)
+            planner.plan(state)
+            plan = benchmark(planner.plan, state)
+        assert not plan
+        record_rate(benchmark, plan.unchanged, unit="domains")
+
+
+class TestExport(object):
+    """Benchmarks of registry snapshot throughput."""
+
+    @pytest.mark.parametrize("compression", ("none", "gzip", "zstd"))
+    def test_export(self, benchmark, make_client, registry, compression):
+        """Benchmark writing a full NDJSON snapshot."""
+        if compression == "zstd":
+            pytest.importorskip("zstandard")
+        client = make_client(stream=True)
+        count = len(registry.find("domains"))
+
+        def export():
+            stats = client.export(io.BytesIO(), compression=compression,
+                                  tables=("domains",))
+            return stats["domains"]["written"]
+        assert benchmark(export) == count
+        record_rate(benchmark, count)
+
+
+class TestRenewal(object):
+    """Benchmarks of finding domains due for renewal."""
+
+    def test_due(self, benchmark, make_client, tmp_path):
+        """Benchmark answering a renewal window from the expiry index."""
+        client = make_client()
+        with Mirror(str(tmp_path / "mirror.sqlite3"), client=client) as m:
+            m.sync(tables=("domains",))
+            scheduler = RenewalScheduler(client, m, clock=lambda: NOW)
+            due = benchmark(scheduler.due, datetime.timedelta(days=400))
+        assert due
+        record_rate(benchmark, len(due), unit="domains")
@@ -0,0 +1,72 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway transport benchmarks.
+
+Compares the built-in transports making concurrent lookups, as a pool of
+worker threads would, against a mock gateway with a small per-request
+latency. The "http2" transport multiplexes every lookup over a single
+connection to a mock gateway serving HTTP/2. Responses are compressed.
+"""
+
+import concurrent.futures
+
+from conftest import CREDENTIALS, record_rate
+
+from dnsgateway import DnsGatewayClient
+from dnsgateway.testing import MockGateway
+from dnsgateway.transport import Http2Transport
+
+import pytest
+
+LATENCY = 0.005
+LOOKUPS = 200
+WORKERS = 16
+
+
+@pytest.fixture(scope="module", params=("requests", "httpx", "http2"))
+def client(request, registry):
+    """Provide a client of a mock gateway using each transport."""
+    http2 = request.param == "http2"
+    with MockGateway(registry, latency=LATENCY, compress=True,
+                     credentials=CREDENTIALS, http2=http2) as gateway:
+        if http2:
+            transport = Http2Transport(auth=CREDENTIALS, http1=False)
+        else:
+            transport = request.param
+        with DnsGatewayClient(endpoint=gateway.endpoint,
+                              username=CREDENTIALS[0],
+                              password=CREDENTIALS[1], transport=transport,
+                              pool_maxsize=WORKERS) as client:
+            yield client
+
+
+class TestTransport(object):
+    """Benchmarks of request throughput by transport."""
+
+    def test_concurrent_lookups(self, benchmark, client):
+        """Benchmark looking domains up from a pool of threads."""
+        wids = range(1, LOOKUPS + 1)
+
+        def lookup():
+            with concurrent.futures.ThreadPoolExecutor(WORKERS) as pool:
+                return sum(1 for _ in pool.map(
+                    lambda wid: client.domain(wid=wid), wids
+                ))
+        count = benchmark(lookup)
+        assert count == LOOKUPS
+        record_rate(benchmark, count, unit="lookups")
+
+    def test_listing(self, benchmark, client, registry):
+        """Benchmark listing every domain, with compressed pages."""
+        count = benchmark(lambda: sum(1 for _ in client.query("domains")))
+        assert count == len(registry.find("domains"))
+        record_rate(benchmark, count)
@@ -11,11 +11,38 @@
 # the License.
 """dnsgateway package."""
 
+import importlib
 import logging
+import sys
 
 import dnsgateway.__meta__  # noqa
 
-from dnsgateway.client import DnsGatewayClient
-
 logging.getLogger(__name__).addHandler(logging.NullHandler())
-__all__ = [DnsGatewayClient.__name__]
+__all__ = ["DnsGatewayClient", "AsyncDnsGatewayClient"]
+
+# The clients are imported on first access, so that importing the package
+# (e.g. to run the CLI) does not load the client and its dependencies.
+_lazy_imports = {"DnsGatewayClient": "dnsgateway.client",
+                 "AsyncDnsGatewayClient": "dnsgateway.aio"}
+
+
+def __getattr__(name):
+    """Import the public clients on first access."""
+    try:
+        module = _lazy_imports[name]
+    except KeyError:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    """List the module attributes, including lazily imported ones."""
+    return sorted(set(globals()) | set(_lazy_imports))
+
+
+if sys.version_info < (3, 7):  # pragma: no cover
+    # Module __getattr__ (PEP 562) is not supported.
+    from dnsgateway.aio import AsyncDnsGatewayClient  # noqa: F401
+    from dnsgateway.client import DnsGatewayClient  # noqa: F401
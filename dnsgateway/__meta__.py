@@ -18,7 +18,7 @@ __author_email__ = "benm@workonline.africa"
 __licence__ = "MIT"
 __copyright__ = "Copyright (c) 2019 Workonline Communications (Pty) Ltd"
 __url__ = "https://github.com/wolcomm/py-dns-gateway"
-__python_requires__ = ">=3.6, <4.0"
+__python_requires__ = ">=3.7, <4.0"
 __classifiers__ = [
     'Development Status :: 3 - Alpha',
     'Environment :: Console',
@@ -29,6 +29,16 @@ __classifiers__ = [
     'Programming Language :: Python :: 3',
     'Topic :: Internet :: Name Service (DNS)',
 ]
+__extras_require__ = {
+    'async': ['httpx >= 0.20, < 1.0'],
+    'brotli': ['brotli >= 1.0'],
+    'http2': ['httpx[http2] >= 0.20, < 1.0'],
+    'orjson': ['orjson >= 3.0'],
+    'parquet': ['pyarrow >= 1.0'],
+    'stream': ['ijson >= 3.1'],
+    'yaml': ['PyYAML >= 5.1'],
+    'zstd': ['zstandard >= 0.15'],
+}
 __entry_points__ = {
     'console_scripts': [
         'dns-gateway=dnsgateway.cli:main',
@@ -0,0 +1,469 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway.aio module."""
+
+import asyncio
+import collections
+import contextvars
+import itertools
+import logging
+import time
+
+from dnsgateway.cache import ResponseCache
+from dnsgateway.client import (BaseClient,
+                               CHECK_BATCH_SIZE,
+                               PRODUCTION_ENDPOINT)
+from dnsgateway.coalesce import AsyncSingleFlight
+from dnsgateway.contact import Contact
+from dnsgateway.deadline import (DEFAULT_CONNECT_TIMEOUT,
+                                 DEFAULT_READ_TIMEOUT)
+from dnsgateway.domain import Domain
+from dnsgateway.metrics import path_template
+from dnsgateway.query import AsyncQuery
+from dnsgateway.trace import Redacted
+from dnsgateway.transport import HttpxAsyncTransport
+from dnsgateway.zone import Zone
+
+log = logging.getLogger(__name__)
+
+DEADLINES = contextvars.ContextVar("deadline")
+
+
+class AsyncObjectMixin(object):
+    """Asynchronous object operations.
+
+    Mixed into the object classes for use with `AsyncDnsGatewayClient`,
+    whose request methods must be awaited. Properties can't be fetched on
+    attribute access, so lazily hydrated objects must be refreshed
+    explicitly.
+    """
+
+    __slots__ = ()
+
+    lazy_hydration = False
+
+    def __setattr__(self, name, value):
+        """Stage changes, refusing implicit updates that cannot be awaited."""
+        if name in self._key_set and not getattr(self, "_staging", False):
+            err = AttributeError(f"cannot set '{name}' on an async object: "
+                                 f"use 'await obj.update({name}=...)' or "
+                                 f"'async with obj.batch()'")
+            log.error(err)
+            raise err
+        super().__setattr__(name, value)
+
+    async def refresh(self):
+        """Refresh the object properties."""
+        props = await self.client._get(path=self.path)
+        self._update_properties(**props)
+        self._lazy = False
+        return self
+
+    async def update(self, **kwargs):
+        """Update the object."""
+        data = {k: v for k, v in kwargs.items() if k in self._keys}
+        props = await self.client._put(path=self.path, data=data)
+        self._update_properties(**props)
+        return self
+
+    async def save(self):
+        """Send the staged changes in a single update.
+
+        See `BaseObject.save`.
+        """
+        changes = self.dirty
+        object.__setattr__(self, "_staging", False)
+        if changes:
+            log.debug("Saving changes to %s on %s", sorted(changes), self.path)
+            await self.update(**changes)
+        self.discard()
+        return self
+
+    async def delete(self):
+        """Delete the object."""
+        await self.client._delete(path=self.path)
+
+
+class AsyncDomain(AsyncObjectMixin, Domain):
+    """Asynchronous domain object implementation."""
+
+    async def renew(self, period=1, period_unit="y", charge=None):
+        """Renew the domain for `period` units, accepting `charge`."""
+        path, data = self._renewal(period, period_unit, charge)
+        props = await self.client._post(path=path, data=data)
+        self._update_properties(**props)
+        return self
+
+
+class AsyncContact(AsyncObjectMixin, Contact):
+    """Asynchronous contact object implementation."""
+
+
+class AsyncZone(AsyncObjectMixin, Zone):
+    """Asynchronous zone object implementation."""
+
+
+class AsyncDnsGatewayClient(BaseClient):
+    """Asynchronous DNS Gateway API client implementation.
+
+    Mirrors the `DnsGatewayClient` API, with request methods returning
+    coroutines and collections exposed as asynchronous iterators.
+    """
+
+    domain_class = AsyncDomain
+    contact_class = AsyncContact
+    zone_class = AsyncZone
+    query_class = AsyncQuery
+    single_flight_class = AsyncSingleFlight
+    deadlines = DEADLINES
+
+    def __init__(self, endpoint=PRODUCTION_ENDPOINT,
+                 username=None, password=None, transport=None, prefetch=0,
+                 retry=None, rate_limit=None, cache=None, hydrate="lazy",
+                 journal=None, metrics=None, coalesce=True,
+                 timeout=(DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT),
+                 max_connections=100, max_keepalive=20, http2=False):
+        """Initialise a new client instance.
+
+        Unless a `transport` is given, HTTP requests are made through a
+        pooled `httpx.AsyncClient`, over HTTP/2 if `http2` is set and the
+        endpoint supports it: see `HttpxAsyncTransport`.
+
+        Deadlines are entered with `async with client.deadline(seconds)`,
+        and apply to the tasks created in their context.
+        """
+        super().__init__(endpoint=endpoint,
+                         username=username, password=password,
+                         prefetch=prefetch, retry=retry, rate_limit=rate_limit,
+                         cache=cache, hydrate=hydrate, journal=journal,
+                         metrics=metrics, coalesce=coalesce, timeout=timeout)
+        if transport is None:
+            transport = HttpxAsyncTransport(auth=self.auth,
+                                            max_connections=max_connections,
+                                            max_keepalive=max_keepalive,
+                                            http2=http2)
+        self.transport = transport
+
+    async def __aenter__(self):
+        """Enter the client context."""
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Close the client on exiting the context."""
+        await self.close()
+
+    async def close(self):
+        """Close the transport and release pooled connections."""
+        await self.transport.close()
+
+    async def _send(self, method="GET", url=None, params=None, data=None,
+                    headers=None, idempotent=None):
+        attempt = 0
+        request_id = self._request_id() if self.metrics is not None else None
+        deadline = self._deadline()
+        operation = f"{method} {url}"
+        while True:
+            delay = self._limiter_delay()
+            options = self._request_options(deadline, operation, delay)
+            if delay:
+                await asyncio.sleep(delay)
+            log.debug("Trying HTTP %s to %s", method, url)
+            started = time.perf_counter()
+            try:
+                resp = await self._attempt(deadline, options, method, url,
+                                           params=params, json=data,
+                                           headers=headers)
+            except Exception as e:
+                if self.metrics is not None:
+                    self._record_request(request_id, method, url, params,
+                                         attempt, started, exc=e)
+                delay = self._exception_delay(deadline, operation, method,
+                                              attempt, e, idempotent)
+            else:
+                if self.metrics is not None:
+                    self._record_request(request_id, method, url, params,
+                                         attempt, started, resp=resp)
+                delay = self._response_delay(deadline, method, attempt, resp,
+                                             idempotent)
+                if delay is None:
+                    return resp
+            attempt += 1
+            if deadline is not None:
+                deadline.check(operation, delay)
+            await asyncio.sleep(delay)
+
+    async def _attempt(self, deadline, options, method, url, **kwargs):
+        """Make a request attempt with the transport `options`.
+
+        Under a deadline, the whole attempt (and not only each read) is
+        bounded by the read timeout, clipped to the time remaining.
+        """
+        request = self.transport.request(method, url, **kwargs, **options)
+        if deadline is not None:
+            request = asyncio.wait_for(request, options["timeout"][1])
+        return await request
+
+    async def _request(self, method="GET", path=None, params=None, data=None,
+                       idempotent=None):
+        url = self._url(path)
+        self._invalidate(method, url, idempotent)
+        entry = self._journal_begin(method, url, data, idempotent)
+        try:
+            resp = await self._send(method=method, url=url, params=params,
+                                    data=data, idempotent=idempotent)
+            result = self._handle_response(resp)
+        except Exception as e:
+            self._journal_end(entry, exc=e)
+            raise e
+        finally:
+            self._invalidate(method, url, idempotent)
+        self._journal_end(entry, result)
+        return result
+
+    async def _get(self, path=None, params=None):
+        if self.single_flight is None:
+            return await self._fetch(path=path, params=params)
+        key = ResponseCache.key(self._url(path), params)
+        deadline = self._deadline()
+        try:
+            data, joined = await self.single_flight.do(
+                key, lambda: self._fetch(path=path, params=params),
+                timeout=deadline and max(deadline.remaining(), 0)
+            )
+        except TimeoutError as e:
+            raise self._deadline_error(deadline, f"GET {key[0]}", e)
+        if joined:
+            self.stats.record_coalesced()
+        return data
+
+    async def _fetch(self, path=None, params=None):
+        """Get a resource, from the cache if possible."""
+        if self.cache is None:
+            return await self._request(method="GET", path=path, params=params)
+        url = self._url(path)
+        key = self.cache.key(url, params)
+        data, entry = self.cache.lookup(key)
+        if data is not None:
+            return data
+        resp = await self._send(method="GET", url=url, params=params,
+                                headers=entry and entry.validators)
+        return self._cache_response(key, entry, resp)
+
+    async def _post(self, path=None, data=None, idempotent=None):
+        return await self._request(method="POST", path=path, data=data,
+                                   idempotent=idempotent)
+
+    async def _put(self, path=None, data=None):
+        return await self._request(method="PUT", path=path, data=data)
+
+    async def _delete(self, path=None):
+        return await self._request(method="DELETE", path=path)
+
+    def _get_iter(self, path=None, params=None, prefetch=None):
+        pages = self._iter_pages(path=path, params=params, prefetch=prefetch)
+        if self.metrics is not None:
+            pages = self._record_pages(path, pages)
+        deadline = self._deadline()
+        if deadline is not None:
+            pages = self._count_pages(deadline, pages)
+        return pages
+
+    async def _record_pages(self, path, pages):
+        """Send each of `pages` to the metrics as it is iterated over."""
+        template = path_template(self._url(path), self.endpoint)
+        async for data in pages:
+            self.metrics.record_page(template)
+            yield data
+
+    async def _count_pages(self, deadline, pages):
+        """Count each of `pages` towards `deadline` as it is iterated over."""
+        async for data in pages:
+            deadline.record_page()
+            yield data
+
+    async def _iter_pages(self, path=None, params=None, prefetch=None):
+        if prefetch is None:
+            prefetch = self.prefetch
+        if prefetch:
+            async for data in self._get_iter_prefetch(path=path, params=params,
+                                                      depth=prefetch):
+                yield data
+            return
+        next = path
+        while next is not None:
+            data = await self._get(path=next, params=params)
+            log.debug("Got %d results, next page %s",
+                      len(data["results"]), data["next"])
+            # `next` links carry the query parameters
+            next, params = data["next"], None
+            yield data
+
+    async def _get_iter_prefetch(self, path=None, params=None, depth=1):
+        """Iterate over pages, fetching up to `depth` pages ahead."""
+        def fetch(url):
+            return asyncio.ensure_future(self._get(path=url))
+        data = await self._get(path=path, params=params)
+        log.debug("Got %d results, next page %s",
+                  len(data["results"]), data["next"])
+        urls = self._page_urls(data)
+        pending = collections.deque()
+        try:
+            if urls is not None:
+                log.debug("Fetching %s pages, %s at once", len(urls), depth)
+                urls = iter(urls)
+                pending.extend(fetch(url)
+                               for url in itertools.islice(urls, depth))
+                yield data
+                while pending:
+                    data = await pending.popleft()
+                    log.debug("Got %d results, next page %s",
+                              len(data["results"]), data["next"])
+                    pending.extend(fetch(url)
+                                   for url in itertools.islice(urls, 1))
+                    yield data
+            else:
+                while data["next"] is not None:
+                    pending.append(fetch(data["next"]))
+                    yield data
+                    data = await pending.popleft()
+                    log.debug("Got %d results, next page %s",
+                              len(data["results"]), data["next"])
+                yield data
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @property
+    def domains(self):
+        """Get a query over registered domains: see `AsyncQuery`."""
+        log.debug("Trying to get registered domains")
+        return self.query("domains")
+
+    async def domain(self, wid=None, name=None, hydrate=None):
+        """Get a domain by wid or name.
+
+        See `DnsGatewayClient.domain`. With lazy hydration, the domain may
+        need to be refreshed before its detail-only properties are used.
+        """
+        if wid and name:
+            log.debug("wid:%s name:%s", wid, name)
+            err = RuntimeError("specify only one of 'wid' or 'name'")
+            log.error(err)
+            raise err
+        if wid:
+            log.debug("Trying to get domain by wid '%s'", wid)
+            path = f"{Domain.base_path}/{wid}"
+            data = await self._get(path=path)
+            return self.domain_class(client=self, **data)
+        if name:
+            log.debug("Trying to get domain by name '%s'", name)
+            path = f"{Domain.base_path}/"
+            params = {"name": name}
+            data = await self._get(path=path, params=params)
+            result = self._single_result(data)
+            domain, refresh = self._lookup_object(self.domain_class, result,
+                                                  hydrate)
+            return await domain.refresh() if refresh else domain
+
+    async def check_domain(self, name=None, op="create"):
+        """Check domain name availability."""
+        log.debug("Checking availability of domain name %s for %s", name, op)
+        path = f"{Domain.base_path}/check/"
+        details = {"name": name}
+        log.debug("Check details: %s", details)
+        data = await self._post(path=path, data=details, idempotent=True)
+        log.debug("Result: %s", data)
+        return self._check_charge(data, op)
+
+    async def check_domains(self, names, op="create",
+                            batch_size=CHECK_BATCH_SIZE):
+        """Check the availability of many domain names.
+
+        See `DnsGatewayClient.check_domains`. Batches are checked
+        concurrently.
+        """
+        path = f"{Domain.base_path}/check/"
+
+        async def check(batch):
+            log.debug("Checking availability of %s domain names for %s",
+                      len(batch), op)
+            data = await self._post(path=path, data={"name": batch},
+                                    idempotent=True)
+            return self._check_charges(data, op, batch)
+        charges = {}
+        for batch_charges in await asyncio.gather(
+                *(check(batch) for batch in
+                  self._check_batches(names, batch_size=batch_size))):
+            charges.update(batch_charges)
+        return charges
+
+    async def create_domain(self, name=None, period=1, period_unit="y",
+                            autorenew=False, hosts=[], charge=None,
+                            admin=None, registrant=None,
+                            billing=None, tech=None):
+        """Create a domain."""
+        log.debug("Trying to create domain %s", name)
+        path = f"{Domain.base_path}/"
+        details = self._domain_details(name=name, period=period,
+                                       period_unit=period_unit,
+                                       autorenew=autorenew, hosts=hosts,
+                                       charge=charge, admin=admin,
+                                       registrant=registrant,
+                                       billing=billing, tech=tech)
+        log.debug("Domain details: %s", Redacted(details))
+        data = await self._post(path=path, data=details)
+        return self.domain_class(client=self, **data)
+
+    @property
+    def contacts(self):
+        """Get a query over registered contacts."""
+        log.debug("Trying to get registered contacts")
+        return self.query("contacts")
+
+    async def contact(self, id=None, hydrate=None):
+        """Get a contact by id.
+
+        See `DnsGatewayClient.contact` and `domain`.
+        """
+        if id:
+            log.debug("Trying to get contact by id '%s'", id)
+            path = f"{Contact.base_path}/"
+            params = {"id": id}
+            data = await self._get(path=path, params=params)
+            result = self._single_result(data)
+            contact, refresh = self._lookup_object(self.contact_class, result,
+                                                   hydrate)
+            return await contact.refresh() if refresh else contact
+
+    async def create_contact(self, id=None, name=None, org=None,
+                             email=None, phone=None, fax=None,
+                             address1=None, address2=None, address3=None,
+                             city=None, province=None, code=None,
+                             country=None):
+        """Create a contact."""
+        log.debug("Trying to create a new contact")
+        path = f"{Contact.base_path}/"
+        details = self._contact_details(id=id, name=name, org=org,
+                                        email=email, phone=phone, fax=fax,
+                                        address1=address1, address2=address2,
+                                        address3=address3, city=city,
+                                        province=province, code=code,
+                                        country=country)
+        log.debug("Contact details: %s", Redacted(details))
+        data = await self._post(path=path, data=details)
+        return self.contact_class(client=self, **data)
+
+    @property
+    def zones(self):
+        """Get a query over supported zones."""
+        log.debug("Trying to get supported zones")
+        return self.query("zones")
@@ -13,43 +13,242 @@
 
 import json
 import logging
+import sys
 
 log = logging.getLogger(__name__)
 
 
-class BaseObject(object):
+def intern_value(value):
+    """Intern the strings in a property value.
+
+    Handles strings, and lists of strings or of flat dictionaries, such as
+    status lists.
+    """
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return [intern_value(item) for item in value]
+    if isinstance(value, dict):
+        return {k: sys.intern(v) if isinstance(v, str) else v
+                for k, v in value.items()}
+    return value
+
+
+class Batch(object):
+    """Change-set context for an object.
+
+    Within the context, setting properties stages them on the object.
+    On leaving the context the staged changes are saved in a single
+    update, or discarded if an exception was raised. Usable with `with`
+    for synchronous objects and `async with` for asynchronous ones.
+    """
+
+    def __init__(self, obj):
+        """Initialise a new batch."""
+        self.obj = obj
+
+    def __enter__(self):
+        """Start staging changes."""
+        self.obj.stage()
+        return self.obj
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Save or discard the staged changes."""
+        if exc_type is None:
+            self.obj.save()
+        else:
+            self.obj.discard()
+
+    async def __aenter__(self):
+        """Start staging changes."""
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """Save or discard the staged changes."""
+        if exc_type is None:
+            await self.obj.save()
+        else:
+            self.obj.discard()
+
+
+class ObjectMeta(type):
+    """Metaclass generating compact object classes.
+
+    Each property named in `_keys` is stored in a slot, so that objects
+    carry no per-instance dictionary and property reads are plain
+    attribute lookups.
+    """
+
+    def __new__(mcs, name, bases, namespace):
+        """Create a new object class with slots for its properties."""
+        keys = namespace.get("_keys")
+        if keys is None:
+            keys = next((b._keys for b in bases if hasattr(b, "_keys")), ())
+        slotted = set()
+        for base in bases:
+            for cls in base.__mro__:
+                slotted.update(getattr(cls, "__slots__", ()))
+        slots = tuple(namespace.get("__slots__", ()))
+        namespace["__slots__"] = slots + tuple(k for k in keys
+                                               if k not in slotted
+                                               and k not in slots)
+        namespace["_key_set"] = frozenset(keys)
+        cls = super().__new__(mcs, name, bases, namespace)
+        cls._setters = {k: getattr(cls, k).__set__ for k in keys}
+        return cls
+
+
+class BaseObject(object, metaclass=ObjectMeta):
     """Base object implementation."""
 
+    __slots__ = ("client", "_lazy", "_staged", "_staging")
+
     base_path = "registry"
 
     _keys = ()
 
-    _properties = {}
+    _detail_keys = ()
+
+    _intern_keys = ()
+
+    # properties by which the API filters collections
+    _filter_keys = ()
+
+    intern_strings = False
 
-    def __init__(self, client=None, **kwargs):
-        """Initialise a new instance."""
-        self.client = client
-        self._update_properties(**kwargs)
+    lazy_hydration = True
+
+    def __init__(self, client=None, lazy=False, **kwargs):
+        """Initialise a new instance.
+
+        If `lazy` is set, the properties are known to be incomplete, and
+        are refreshed from the API on first access to a missing property.
+        """
+        object.__setattr__(self, "client", client)
+        object.__setattr__(self, "_lazy", lazy)
+        self._set_properties(kwargs)
+
+    @classmethod
+    def _is_detailed(cls, props):
+        """Check whether `props` include the detail-only properties."""
+        return all(k in props for k in cls._detail_keys)
+
+    def _set_properties(self, props):
+        setters = self._setters
+        for k, v in props.items():
+            setter = setters.get(k)
+            if setter is not None:
+                setter(self, v)
+        if self.intern_strings:
+            for k in self._intern_keys:
+                if k in props:
+                    setters[k](self, intern_value(props[k]))
 
     def _update_properties(self, **kwargs):
-        """Replace the internal attr dictionary with kwargs."""
-        self._properties = {k: v for k, v in kwargs.items() if k in self._keys}
+        """Replace the object properties with kwargs."""
+        for k in self._keys:
+            if k not in kwargs:
+                try:
+                    object.__delattr__(self, k)
+                except AttributeError:
+                    pass
+        self._set_properties(kwargs)
+
+    @property
+    def _properties(self):
+        """Get a dictionary of the object properties."""
+        props = {}
+        for k in self._keys:
+            try:
+                props[k] = object.__getattribute__(self, k)
+            except AttributeError:
+                pass
+        return props
 
     def __getattr__(self, name):
-        """Return value from internal attribute dictionary."""
-        try:
-            return self._properties[name]
-        except KeyError as e:
-            log.error(e)
-            raise AttributeError(e)
+        """Handle access to a property that is not set.
+
+        Lazily hydrated objects are refreshed from the API, unless the
+        missing property is the `wid` needed to do so. Otherwise, or if the
+        property is still missing, raise `AttributeError`.
+        """
+        if name in self._key_set and self._lazy and name != "wid":
+            log.debug("Hydrating %s on access to '%s'", self.path, name)
+            self.refresh()
+            return object.__getattribute__(self, name)
+        raise AttributeError(f"'{type(self).__name__}' object "
+                             f"has no attribute '{name}'")
 
     def __setattr__(self, name, value):
-        """Set the requested value on the internal attr dictionary."""
-        if name in self._keys:
-            self.update(**{name: value})
+        """Update the object when a property is set.
+
+        If changes are being staged, the property is staged instead.
+        """
+        if name in self._key_set:
+            if getattr(self, "_staging", False):
+                self._staged[name] = value
+            else:
+                self.update(**{name: value})
         else:
             super().__setattr__(name, value)
 
+    def batch(self):
+        """Get a context in which property changes are saved together.
+
+        For example:
+
+            with domain.batch():
+                domain.autorenew = True
+                domain.period = 2
+        """
+        return Batch(self)
+
+    def stage(self, **kwargs):
+        """Stage property changes, to be sent by `save()`.
+
+        Until the changes are saved or discarded, setting a property also
+        stages it. Staged values are not visible as properties until saved.
+        """
+        if getattr(self, "_staged", None) is None:
+            object.__setattr__(self, "_staged", {})
+        object.__setattr__(self, "_staging", True)
+        for k, v in kwargs.items():
+            if k not in self._key_set:
+                raise AttributeError(f"'{type(self).__name__}' object "
+                                     f"has no property '{k}'")
+            self._staged[k] = v
+        return self
+
+    @property
+    def dirty(self):
+        """Get the staged changes that differ from the current values."""
+        staged = getattr(self, "_staged", None) or {}
+        current = self._properties
+        return {k: v for k, v in staged.items()
+                if k not in current or current[k] != v}
+
+    def discard(self):
+        """Discard staged changes."""
+        object.__setattr__(self, "_staged", None)
+        object.__setattr__(self, "_staging", False)
+        return self
+
+    def save(self):
+        """Send the staged changes in a single update.
+
+        If no staged value differs from the current one, no request is
+        made. Staging stops before the update is sent: if it fails, the
+        changes remain `dirty`, to be saved again or discarded, and later
+        property assignments are sent immediately.
+        """
+        changes = self.dirty
+        object.__setattr__(self, "_staging", False)
+        if changes:
+            log.debug("Saving changes to %s on %s", sorted(changes), self.path)
+            self.update(**changes)
+        self.discard()
+        return self
+
     def __repr__(self):
         """Serialise object to json."""
         return json.dumps(self._properties, indent=4)
@@ -63,11 +262,12 @@ class BaseObject(object):
         """Refresh the object properties."""
         props = self.client._get(path=self.path)
         self._update_properties(**props)
+        self._lazy = False
         return self
 
     def update(self, **kwargs):
         """Update the object."""
-        data = {k: v for k, v in kwargs.items() if k in self._keys}
+        data = {k: v for k, v in kwargs.items() if k in self._key_set}
         props = self.client._put(path=self.path, data=data)
         self._update_properties(**props)
         return self
@@ -0,0 +1,133 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway.bulk module."""
+
+import csv
+import decimal
+import json
+import logging
+import os
+import threading
+
+from dnsgateway.helpers import load_yaml
+
+log = logging.getLogger(__name__)
+
+BULK_WORKERS = 4
+
+FORMATS = ("csv", "ndjson", "yaml")
+EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson",
+              ".yaml": "yaml", ".yml": "yaml"}
+
+DOMAIN_FIELDS = ("name", "period", "period_unit", "autorenew", "hosts",
+                 "admin", "registrant", "billing", "tech")
+
+CREATED = "created"
+UNAVAILABLE = "unavailable"
+REJECTED = "rejected"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+def guess_format(filename):
+    """Guess the format of a rows file from its name."""
+    ext = os.path.splitext(filename or "")[1].lower()
+    try:
+        return EXTENSIONS[ext]
+    except KeyError:
+        raise ValueError(f"cannot guess format of '{filename}': "
+                         f"specify one of {', '.join(FORMATS)}")
+
+
+def read_rows(fp, format):
+    """Read domain rows from the open file `fp`.
+
+    CSV and NDJSON rows are read lazily, so that large files need not fit in
+    memory. YAML files must hold a list of mappings, or a stream of mapping
+    documents, and require the optional PyYAML dependency. Rows are yielded
+    as read: see `domain_row` for their normalisation.
+    """
+    if format == "csv":
+        return (row for row in csv.DictReader(fp)
+                if any(v and v.strip() for v in row.values()))
+    if format == "ndjson":
+        return (json.loads(line) for line in fp if line.strip())
+    if format == "yaml":
+        return _read_yaml(fp)
+    raise ValueError(f"unknown rows format '{format}'")
+
+
+def _read_yaml(fp):
+    for document in load_yaml(fp):
+        if isinstance(document, list):
+            yield from document
+        elif document is not None:
+            yield document
+
+
+def domain_row(row, **defaults):
+    """Normalise a row into keyword arguments for `create_domain`.
+
+    Fields missing from `row` are taken from `defaults`. Text values, as
+    read from CSV files, are converted to the expected types: `hosts` may
+    be separated by whitespace or commas.
+    """
+    unknown = set(row) - set(DOMAIN_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+    values = {k: v for k, v in defaults.items() if v is not None}
+    values.update((k, v) for k, v in row.items() if v not in (None, ""))
+    if not values.get("name"):
+        raise ValueError("row has no domain name")
+    if "period" in values:
+        values["period"] = int(values["period"])
+    if isinstance(values.get("autorenew"), str):
+        values["autorenew"] = values["autorenew"].strip().lower() in \
+            ("1", "true", "yes", "y")
+    if isinstance(values.get("hosts"), str):
+        values["hosts"] = values["hosts"].replace(",", " ").split()
+    return values
+
+
+class ChargeCeiling(object):
+    """Thread-safe limits on the charges accepted for bulk operations.
+
+    A charge is accepted if it is at most `max_charge`, and if the total of
+    accepted charges stays within `max_total`. Either limit may be `None`.
+    """
+
+    def __init__(self, max_charge=None, max_total=None):
+        """Initialise a new ceiling instance."""
+        self.max_charge = None if max_charge is None \
+            else decimal.Decimal(str(max_charge))
+        self.max_total = None if max_total is None \
+            else decimal.Decimal(str(max_total))
+        self.total = decimal.Decimal(0)
+        self._lock = threading.Lock()
+
+    def reserve(self, charge):
+        """Accept `charge`, returning the reason if it is refused."""
+        charge = decimal.Decimal(str(charge))
+        if self.max_charge is not None and charge > self.max_charge:
+            return f"charge {charge} exceeds maximum {self.max_charge}"
+        with self._lock:
+            if self.max_total is not None and \
+                    self.total + charge > self.max_total:
+                return f"charge {charge} exceeds remaining budget " \
+                       f"{self.max_total - self.total}"
+            self.total += charge
+        return None
+
+    def release(self, charge):
+        """Return an accepted `charge` that was not incurred."""
+        with self._lock:
+            self.total -= decimal.Decimal(str(charge))
@@ -0,0 +1,206 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway.cache module."""
+
+import collections
+import json
+import logging
+import threading
+import time
+import urllib.parse
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TTLS = {
+    "registry/zones": 6 * 60 * 60,
+    "registry/contacts": 30,
+    "registry/domains": 5,
+}
+
+
+class CacheEntry(object):
+    """Cached response implementation."""
+
+    __slots__ = ("body", "path", "expires", "etag", "last_modified")
+
+    def __init__(self, body, path, expires, etag=None, last_modified=None):
+        """Initialise a new entry."""
+        self.body = body
+        self.path = path
+        self.expires = expires
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def size(self):
+        """Get the size of the cached body, in bytes."""
+        return len(self.body)
+
+    @property
+    def validators(self):
+        """Get the headers for a conditional request, if any."""
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers or None
+
+
+class ResponseCache(object):
+    """Thread-safe read-through cache of GET responses.
+
+    Responses are cached for the TTL of the longest prefix in `ttls`
+    matching the request path, or `default_ttl` seconds (zero disables
+    caching). The cache is bounded to `max_entries` entries and `max_bytes`
+    of serialised response data, evicting the least recently used entries.
+
+    Expired entries with an `ETag` or `Last-Modified` validator are kept,
+    and revalidated by a conditional request rather than fetched again.
+    Bodies are stored serialised, so callers never share mutable data.
+    """
+
+    def __init__(self, ttls=DEFAULT_TTLS, default_ttl=0,
+                 max_entries=1024, max_bytes=16 * 1024 * 1024,
+                 clock=time.monotonic):
+        """Initialise a new cache instance."""
+        self.ttls = sorted(ttls.items(), key=lambda item: -len(item[0]))
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    def __len__(self):
+        """Get the number of cached entries."""
+        return len(self._entries)
+
+    @property
+    def size(self):
+        """Get the total size of cached response data, in bytes."""
+        return self._bytes
+
+    @staticmethod
+    def key(url, params=None):
+        """Get the cache key for a request.
+
+        Parameters are keyed on their encoding in the query string, so that
+        values may be lists or tuples of values.
+        """
+        query = urllib.parse.urlencode(sorted((params or {}).items()),
+                                       doseq=True)
+        return (url, query)
+
+    def ttl(self, path):
+        """Get the TTL for responses to `path`."""
+        for prefix, ttl in self.ttls:
+            if f"/{prefix}" in path:
+                return ttl
+        return self.default_ttl
+
+    def lookup(self, key):
+        """Get the data and entry cached for `key`.
+
+        Returns `(data, None)` for a fresh entry, `(None, entry)` for an
+        entry that must be revalidated, and `(None, None)` on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, None
+            self._entries.move_to_end(key)
+            if entry.expires > self._clock():
+                self.hits += 1
+                return json.loads(entry.body), None
+            if entry.validators is None:
+                self._remove(key)
+                self.misses += 1
+                return None, None
+            return None, entry
+
+    def revalidated(self, key, entry):
+        """Renew an entry confirmed unchanged by the gateway."""
+        with self._lock:
+            self.revalidations += 1
+            entry.expires = self._clock() + self.ttl(entry.path)
+            return json.loads(entry.body)
+
+    def store(self, key, data, headers=None):
+        """Cache the data from a response."""
+        path = urllib.parse.urlsplit(key[0]).path
+        ttl = self.ttl(path)
+        headers = headers or {}
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if ttl <= 0 and etag is None and last_modified is None:
+            return
+        entry = CacheEntry(json.dumps(data).encode(), path,
+                           self._clock() + ttl,
+                           etag=etag, last_modified=last_modified)
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while (len(self._entries) > self.max_entries
+                   or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    @staticmethod
+    def stale_paths(path):
+        """Get the paths made stale by a change to the resource at `path`.
+
+        These are the resource itself and each object and collection it is
+        nested in: a change to `registry/domains/1/renew/` changes the
+        domain at `registry/domains/1`, and the pages of
+        `registry/domains/` listing it.
+        """
+        paths = {path}
+        parts = path.rstrip("/").split("/")
+        for i in range(len(parts) - 1, 0, -1):
+            parent = "/".join(parts[:i])
+            paths.update((parent, parent + "/"))
+        return paths
+
+    def invalidate(self, url):
+        """Drop entries made stale by a change to the resource at `url`.
+
+        This removes the entries for the resource itself, for the objects
+        it is a sub-resource of, and for every page of their collections.
+        """
+        path = urllib.parse.urlsplit(url).path
+        paths = self.stale_paths(path)
+        with self._lock:
+            stale = [key for key, entry in self._entries.items()
+                     if entry.path in paths]
+            for key in stale:
+                self._remove(key)
+        if stale:
+            log.debug("Invalidated %s cache entries for %s", len(stale), path)
+
+    def clear(self):
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
@@ -11,16 +11,32 @@
 # the License.
 """dnsgateway.cli module."""
 
+import collections
+import json
 import logging
+import os
 
 import click
 
-from dnsgateway.client import (DEVELOPMENT_ENDPOINT,
-                               DnsGatewayClient,
-                               PRODUCTION_ENDPOINT)
+from dnsgateway import bulk
+from dnsgateway.__meta__ import __version__
+from dnsgateway.deadline import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+from dnsgateway.endpoints import DEVELOPMENT_ENDPOINT, PRODUCTION_ENDPOINT
+from dnsgateway.output import FORMATS, RecordWriter, parse_fields
+from dnsgateway.query import parse_filter_option
+from dnsgateway.transport import TRANSPORTS
+
+# The client, mirror and journal are imported by the commands using them,
+# and the client is built on first use (see `ClientFactory`), so that the
+# CLI starts quickly. See tests/test_startup.py.
 
 log = logging.getLogger(__name__)
 
+MIRROR_TABLES = ("zones", "contacts", "domains")
+STATE_FORMATS = ("json", "yaml")
+EXPORT_FORMATS = ("ndjson", "parquet")
+EXPORT_COMPRESSIONS = ("gzip", "zstd", "none")
+
 
 def loglevel(verbosity=0):
     """Set logging verbosity."""
@@ -29,6 +45,218 @@ def loglevel(verbosity=0):
     return
 
 
+def output_options(func):
+    """Add output format options to a list command."""
+    func = click.option("--fields", help="Comma separated fields to output "
+                                         "(default: all)")(func)
+    func = click.option("--output", "-o", "output_format", default="pretty",
+                        show_default=True, type=click.Choice(FORMATS),
+                        help="Output format")(func)
+    func = click.option("--page-size", type=click.IntRange(min=1),
+                        help="Number of objects to fetch per request")(func)
+    func = click.option("--filter", "-f", "filters", multiple=True,
+                        metavar="FIELD[__LOOKUP]=VALUE",
+                        help="Filter by a field, e.g. 'zone=co.za' or "
+                             "'curExpDate__lt=2020-02-01'")(func)
+    return func
+
+
+def default_mirror_database():
+    """Get the default path to the mirror database."""
+    return os.path.join(click.get_app_dir("dnsgateway"), "mirror.sqlite3")
+
+
+def renewal_options(func):
+    """Add renewal window and mirror options to a renewal command."""
+    func = click.option("--mirror", "database", envvar="DNS_GATEWAY_MIRROR",
+                        show_envvar=True, type=click.Path(dir_okay=False),
+                        default=default_mirror_database,
+                        help="Path to the mirror database indexing "
+                             "expiry dates")(func)
+    func = click.option("--within", default="30d", show_default=True,
+                        help="Renewal window, e.g. '30d', '2w' or "
+                             "'12h'")(func)
+    return func
+
+
+def renewal_scheduler(ctx, database, within):
+    """Get a renewal scheduler and window for a renewal command."""
+    from dnsgateway.mirror import Mirror
+    from dnsgateway.renewal import RenewalScheduler, parse_duration
+    try:
+        within = parse_duration(within)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+    client = get_client(ctx)
+    mirror = Mirror(database, client=client)
+    ctx.call_on_close(mirror.close)
+    return RenewalScheduler(client, mirror), within
+
+
+def state_options(func):
+    """Add state file options to a plan or apply command."""
+    func = click.option("--workers", default=bulk.BULK_WORKERS,
+                        show_default=True,
+                        help="Number of concurrent workers")(func)
+    func = click.option("--mirror", "database",
+                        type=click.Path(dir_okay=False),
+                        help="Path to a mirror database to read the current "
+                             "state from")(func)
+    func = click.option("--prune", is_flag=True,
+                        help="Delete domains and contacts missing from the "
+                             "state")(func)
+    func = click.option("--format", "state_format",
+                        type=click.Choice(STATE_FORMATS),
+                        help="Format of the state file "
+                             "(default: from its extension)")(func)
+    func = click.argument("state_file", type=click.File())(func)
+    return func
+
+
+def make_plan(ctx, state_file, state_format, prune, database, workers):
+    """Plan the changes reaching the state in `state_file`."""
+    from dnsgateway.mirror import Mirror
+    from dnsgateway.plan import Planner, guess_format, load_state
+    try:
+        state_format = state_format or guess_format(state_file.name)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    client = get_client(ctx)
+    mirror = None
+    if database is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+        mirror = Mirror(database, client=client)
+        ctx.call_on_close(mirror.close)
+    log.debug(f"Planning changes from {state_format} state")
+    planner = Planner(client, mirror=mirror, workers=workers)
+    return planner, planner.plan(load_state(state_file, state_format),
+                                 prune=prune)
+
+
+def echo_plan(plan, err=False):
+    """Print the changes of `plan`, and its summary."""
+    for line in plan.describe():
+        click.echo(line, err=err)
+    click.echo(plan.summary(), err=err)
+
+
+def write_results(results, output, ceiling):
+    """Write NDJSON `results` to `output` as they complete.
+
+    Prints the number of results of each status, and the total of charges
+    accepted by `ceiling`. Returns the numbers by status.
+    """
+    statuses = collections.Counter()
+    try:
+        for result in results:
+            statuses[result["status"]] += 1
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+    except Exception as e:
+        log.error(e)
+        raise click.Abort
+    click.echo(", ".join(f"{v} {k}" for k, v in sorted(statuses.items())) +
+               f" (total charge {ceiling.total})", err=True)
+    return statuses
+
+
+def echo_pages(ctx, collection, output_format="pretty", fields=None,
+               filters=(), page_size=None):
+    """Write the pages of a collection, flushing each page."""
+    client = get_client(ctx)
+    query = {}
+    try:
+        query.update(parse_filter_option(f) for f in filters)
+        if page_size is not None:
+            query["page_size"] = page_size
+        pages = client.pages(collection, **query)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    fields = parse_fields(fields)
+    if fields is not None:
+        keys = client._collection_class(collection)._keys
+        unknown = [f for f in fields if f not in keys]
+        if unknown:
+            raise click.UsageError(f"unknown {collection} fields: "
+                                   f"{', '.join(unknown)}")
+    writer = RecordWriter(format=output_format, fields=fields)
+    try:
+        for chunk in writer.write(pages):
+            click.echo(chunk, nl=False)
+    except Exception as e:
+        log.error(e)
+        raise click.Abort
+
+
+class ClientFactory(object):
+    """Build the API client of a command on first use.
+
+    The client and its transport are only imported once a command needs
+    them, so that e.g. `dnsgateway domain list --help` starts quickly.
+    Resources opened with the client are closed with the context `ctx`.
+    """
+
+    def __init__(self, ctx, retries=3, deadline=None, journal_path=None,
+                 metrics_file=None, trace_file=None, **options):
+        """Initialise a new client factory."""
+        self.ctx = ctx
+        self.retries = retries
+        self.deadline = deadline
+        self.journal_path = journal_path
+        self.metrics_file = metrics_file
+        self.trace_file = trace_file
+        self.options = options
+        self.client = None
+
+    def __call__(self):
+        """Get the client, building it if required."""
+        if self.client is None:
+            self.client = self._build()
+        return self.client
+
+    def _build(self):
+        from dnsgateway.client import DnsGatewayClient
+        from dnsgateway.journal import Journal
+        from dnsgateway.retry import RetryPolicy
+        log.debug("Setting up client instance")
+        journal = None
+        if self.journal_path is not None:
+            journal = Journal(self.journal_path)
+            self.ctx.call_on_close(journal.close)
+        client = DnsGatewayClient(retry=RetryPolicy(total=self.retries),
+                                  journal=journal,
+                                  metrics=self._sinks() or None,
+                                  **self.options)
+        self.ctx.call_on_close(client.close)
+        if self.deadline is not None:
+            scope = client.deadline(self.deadline)
+            scope.__enter__()
+            self.ctx.call_on_close(scope.__exit__)
+        return client
+
+    def _sinks(self):
+        from dnsgateway.metrics import PrometheusMetrics
+        from dnsgateway.trace import TraceSink
+        sinks = []
+        if self.metrics_file is not None:
+            metrics = PrometheusMetrics()
+            sinks.append(metrics)
+            self.ctx.call_on_close(lambda: metrics.write(self.metrics_file))
+        if self.trace_file == "-":
+            sinks.append(TraceSink())
+        elif self.trace_file is not None:
+            trace = open(self.trace_file, "a")
+            self.ctx.call_on_close(trace.close)
+            sinks.append(TraceSink(stream=trace))
+        return sinks
+
+
+def get_client(ctx):
+    """Get the API client of the command invoked in `ctx`."""
+    return ctx.find_object(ClientFactory)()
+
+
 @click.group()
 @click.option("-u", "--username",
               envvar="DNS_GATEWAY_USERNAME", show_envvar=True,
@@ -42,18 +270,50 @@ def loglevel(verbosity=0):
               default=True)
 @click.option("--dev", "endpoint_url", flag_value=DEVELOPMENT_ENDPOINT,
               help=f"Shorthand for '--endpoint-url={DEVELOPMENT_ENDPOINT}'")
+@click.option("--prefetch", default=0, show_default=True,
+              help="Number of pages to fetch ahead when listing")
+@click.option("--retries", default=3, show_default=True,
+              help="Number of times to retry failed requests")
+@click.option("--rate-limit", type=float,
+              help="Maximum number of requests per second")
+@click.option("--connect-timeout", default=DEFAULT_CONNECT_TIMEOUT,
+              show_default=True,
+              help="Seconds to wait for a connection to the API")
+@click.option("--timeout", "read_timeout", default=DEFAULT_READ_TIMEOUT,
+              show_default=True, help="Seconds to wait for each response")
+@click.option("--deadline", type=float,
+              help="Seconds allowed for the whole command to complete")
+@click.option("--transport", type=click.Choice(TRANSPORTS),
+              default="requests", show_default=True,
+              help="HTTP transport to make requests with")
+@click.option("--stream/--no-stream", default=False, show_default=True,
+              help="Decode list responses as they are received")
+@click.option("--journal", "journal_path", envvar="DNS_GATEWAY_JOURNAL",
+              show_envvar=True, type=click.Path(dir_okay=False),
+              help="Path to a journal database of changes made")
+@click.option("--metrics-file", type=click.Path(dir_okay=False),
+              help="Path to write Prometheus request metrics to on exit")
+@click.option("--trace", "trace_file", type=click.Path(dir_okay=False),
+              help="Path to append JSON request trace events to "
+                   "('-' for stderr)")
 @click.option("-v", "verbosity", count=True, help="Increase logging verbosity")
-@click.version_option()
+@click.version_option(version=__version__)
 @click.pass_context
-def main(ctx, username, password, endpoint_url, verbosity):
+def main(ctx, username, password, endpoint_url, prefetch, retries, rate_limit,
+         connect_timeout, read_timeout, deadline, transport, stream,
+         journal_path, metrics_file, trace_file, verbosity):
     """Manage domain registrations via the DNS Gateway API.
 
     See https://postman.gateway.africa/ for details.
     """
     loglevel(verbosity=verbosity)
-    log.debug("Setting up client instance")
-    ctx.obj = DnsGatewayClient(endpoint=endpoint_url,
-                               username=username, password=password)
+    ctx.obj = ClientFactory(ctx, endpoint=endpoint_url, username=username,
+                            password=password, prefetch=prefetch,
+                            retries=retries, rate_limit=rate_limit,
+                            transport=transport, stream=stream,
+                            timeout=(connect_timeout, read_timeout),
+                            deadline=deadline, journal_path=journal_path,
+                            metrics_file=metrics_file, trace_file=trace_file)
 
 
 @main.group(help="Manage domains")
@@ -64,16 +324,13 @@ def domain(ctx):
 
 
 @domain.command(name="list", help="List domains")
+@output_options
 @click.pass_context
-def list_domains(ctx):
+def list_domains(ctx, output_format, fields, filters, page_size):
     """List registered domains."""
     log.debug("Listing domains")
-    try:
-        for domain in ctx.obj.domains:
-            click.echo(domain)
-    except Exception as e:
-        log.error(e)
-        raise click.Abort
+    echo_pages(ctx, "domains", output_format=output_format, fields=fields,
+               filters=filters, page_size=page_size)
 
 
 @domain.command(name="show", help="Show domain details")
@@ -83,7 +340,7 @@ def show_domain(ctx, domain_name):
     """Show domain details."""
     log.debug(f"Getting details for domain '{domain_name}'")
     try:
-        domain = ctx.obj.domain(name=domain_name)
+        domain = get_client(ctx).domain(name=domain_name, hydrate="eager")
         click.echo(domain)
     except Exception as e:
         log.error(e)
@@ -91,15 +348,32 @@ def show_domain(ctx, domain_name):
 
 
 @domain.command(name="check", help="Check domain name availability")
-@click.argument("domain_name")
+@click.argument("domain_name", required=False)
 @click.option("--operation", default="create", help="Domain operation",
               type=click.Choice(("transfer", "create", "renew", "restore")))
+@click.option("--file", "-f", "names_file", type=click.File(),
+              help="Check names read one per line from a file ('-' for stdin)")
 @click.pass_context
-def check_domain(ctx, domain_name, operation):
+def check_domain(ctx, domain_name, operation, names_file):
     """Check domain availability."""
+    if names_file is not None:
+        names = (line.strip() for line in names_file)
+        names = (name for name in names
+                 if name and not name.startswith("#"))
+        log.debug("Checking availability of domains from file")
+        try:
+            charges = get_client(ctx).check_domains(names, op=operation)
+            for name, charge in charges.items():
+                click.echo(f"{name}\t{charge}")
+        except Exception as e:
+            log.error(e)
+            raise click.Abort
+        return
+    if domain_name is None:
+        raise click.UsageError("specify a domain name or '--file'")
     log.debug(f"Checking availability of domain {domain_name}")
     try:
-        charge = ctx.obj.check_domain(name=domain_name, op=operation)
+        charge = get_client(ctx).check_domain(name=domain_name, op=operation)
         click.echo(charge)
     except Exception as e:
         log.error(e)
@@ -122,7 +396,7 @@ def create_domain(ctx, **kwargs):
     """Create a new domain."""
     log.debug(f"Checking availability of domain {kwargs['name']}")
     try:
-        charge = ctx.obj.check_domain(name=kwargs["name"], op="create")
+        charge = get_client(ctx).check_domain(name=kwargs["name"], op="create")
     except Exception as e:
         log.error(e)
         raise click.Abort
@@ -137,13 +411,122 @@ def create_domain(ctx, **kwargs):
     log.debug("Creating new domain")
     log.debug(kwargs)
     try:
-        domain = ctx.obj.create_domain(**kwargs, charge=charge)
+        domain = get_client(ctx).create_domain(**kwargs, charge=charge)
         click.echo(domain)
     except Exception as e:
         log.error(e)
         raise click.Abort
 
 
+@domain.command(name="bulk-create", help="Create domains listed in a file")
+@click.argument("rows_file", type=click.File())
+@click.option("--format", "rows_format", type=click.Choice(bulk.FORMATS),
+              help="Format of the rows file (default: from its extension)")
+@click.option("--output", "-o", type=click.File("w"), default="-",
+              help="File to write NDJSON results to ('-' for stdout)")
+@click.option("--workers", default=bulk.BULK_WORKERS, show_default=True,
+              help="Number of concurrent workers")
+@click.option("--max-charge", type=float,
+              help="Maximum charge accepted for a single domain")
+@click.option("--max-total", type=float,
+              help="Maximum total of charges accepted")
+@click.option("--accept-charge", "-y", "accept", is_flag=True,
+              help="Accept any charge if no maximum is given")
+@click.option("--resume", is_flag=True,
+              help="Skip domains created by an earlier run, per '--journal'")
+@click.option("--period", type=int, help="Default registration period")
+@click.option("--autorenew", is_flag=True, default=None,
+              help="Enable autorenewal by default")
+@click.option("--host", "-h", "hosts", multiple=True,
+              help="Default nameserver host")
+@click.option("--admin", help="Default administrative contact id")
+@click.option("--registrant", help="Default registrant contact id")
+@click.option("--billing", help="Default billing contact id")
+@click.option("--tech", help="Default technical contact id")
+@click.pass_context
+def bulk_create_domains(ctx, rows_file, rows_format, output, workers,
+                        max_charge, max_total, accept, resume, **defaults):
+    """Create domains in bulk."""
+    if max_charge is None and max_total is None and not accept:
+        raise click.UsageError("specify '--max-charge' or '--max-total', "
+                               "or '--accept-charge'")
+    client = get_client(ctx)
+    if resume and client.journal is None:
+        raise click.UsageError("'--resume' requires '--journal'")
+    try:
+        rows_format = rows_format or bulk.guess_format(rows_file.name)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    defaults["hosts"] = list(defaults["hosts"]) or None
+    ceiling = bulk.ChargeCeiling(max_charge=max_charge, max_total=max_total)
+    log.debug(f"Creating domains from {rows_format} rows")
+    rows = bulk.read_rows(rows_file, rows_format)
+    statuses = write_results(client.create_domains(rows, workers=workers,
+                                                   ceiling=ceiling,
+                                                   resume=resume, **defaults),
+                             output, ceiling)
+    if statuses[bulk.FAILED]:
+        ctx.exit(1)
+
+
+@domain.command(name="due", help="List domains due for renewal")
+@renewal_options
+@click.option("--refresh", is_flag=True,
+              help="Refresh the due domains from the registry first")
+@click.option("--output", "-o", "output_format", default="table",
+              show_default=True, type=click.Choice(FORMATS),
+              help="Output format")
+@click.option("--fields", default="name,curExpDate,autorenew",
+              show_default=True, help="Comma separated fields to output")
+@click.pass_context
+def due_domains(ctx, database, within, refresh, output_format, fields):
+    """List domains due for renewal."""
+    scheduler, within = renewal_scheduler(ctx, database, within)
+    log.debug(f"Listing domains due within {within}")
+    try:
+        domains = scheduler.refresh(within) if refresh \
+            else scheduler.due(within)
+        writer = RecordWriter(format=output_format,
+                              fields=parse_fields(fields))
+        for chunk in writer.write([domains]):
+            click.echo(chunk, nl=False)
+    except Exception as e:
+        log.error(e)
+        raise click.Abort
+
+
+@domain.command(name="renew-due", help="Renew domains due for renewal")
+@renewal_options
+@click.option("--period", default=1, show_default=True,
+              help="Renewal period, in years")
+@click.option("--include-autorenew", "autorenew", is_flag=True,
+              help="Also renew domains set to renew automatically")
+@click.option("--output", "-o", type=click.File("w"), default="-",
+              help="File to write NDJSON results to ('-' for stdout)")
+@click.option("--max-charge", type=float,
+              help="Maximum charge accepted for a single domain")
+@click.option("--max-total", type=float,
+              help="Maximum total of charges accepted")
+@click.option("--accept-charge", "-y", "accept", is_flag=True,
+              help="Accept any charge if no maximum is given")
+@click.pass_context
+def renew_due_domains(ctx, database, within, period, autorenew, output,
+                      max_charge, max_total, accept):
+    """Renew domains due for renewal."""
+    if max_charge is None and max_total is None and not accept:
+        raise click.UsageError("specify '--max-charge' or '--max-total', "
+                               "or '--accept-charge'")
+    scheduler, within = renewal_scheduler(ctx, database, within)
+    ceiling = bulk.ChargeCeiling(max_charge=max_charge, max_total=max_total)
+    log.debug(f"Renewing domains due within {within}")
+    statuses = write_results(scheduler.renew(within, period=period,
+                                             ceiling=ceiling,
+                                             autorenew=autorenew),
+                             output, ceiling)
+    if statuses[bulk.FAILED]:
+        ctx.exit(1)
+
+
 @domain.command(name="delete", help="Delete domain")
 @click.argument("domain_name")
 @click.pass_context
@@ -151,7 +534,7 @@ def delete_domain(ctx, domain_name):
     """Delete domain."""
     log.debug(f"Deleting domain '{domain_name}'")
     try:
-        domain = ctx.obj.domain(name=domain_name)
+        domain = get_client(ctx).domain(name=domain_name)
         domain.delete()
         click.echo(f"Domain {domain_name} deleted")
     except Exception as e:
@@ -167,16 +550,13 @@ def contact(ctx):
 
 
 @contact.command(name="list", help="List contacts")
+@output_options
 @click.pass_context
-def list_contacts(ctx):
+def list_contacts(ctx, output_format, fields, filters, page_size):
     """List registered contacts."""
     log.debug("Listing contacts")
-    try:
-        for contact in ctx.obj.contacts:
-            click.echo(contact)
-    except Exception as e:
-        log.error(e)
-        raise click.Abort
+    echo_pages(ctx, "contacts", output_format=output_format, fields=fields,
+               filters=filters, page_size=page_size)
 
 
 @contact.command(name="show", help="Show contact details")
@@ -186,7 +566,7 @@ def show_contact(ctx, contact_id):
     """Show contact details."""
     log.debug(f"Getting details for contact '{contact_id}'")
     try:
-        contact = ctx.obj.contact(id=contact_id)
+        contact = get_client(ctx).contact(id=contact_id, hydrate="eager")
         click.echo(contact)
     except Exception as e:
         log.error(e)
@@ -213,7 +593,7 @@ def create_contact(ctx, **kwargs):
     log.debug("Creating new contact")
     log.debug(kwargs)
     try:
-        contact = ctx.obj.create_contact(**kwargs)
+        contact = get_client(ctx).create_contact(**kwargs)
         click.echo(contact)
     except Exception as e:
         log.error(e)
@@ -227,7 +607,7 @@ def delete_contact(ctx, contact_id):
     """Delete contact."""
     log.debug(f"Deleting contact '{contact_id}'")
     try:
-        contact = ctx.obj.contact(id=contact_id)
+        contact = get_client(ctx).contact(id=contact_id)
         contact.delete()
         click.echo(f"Contact {contact_id} deleted")
     except Exception as e:
@@ -243,13 +623,143 @@ def zone(ctx):
 
 
 @zone.command(name="list", help="List zones")
+@output_options
 @click.pass_context
-def list_zones(ctx):
+def list_zones(ctx, output_format, fields, filters, page_size):
     """List available zones."""
     log.debug("Listing zones")
+    echo_pages(ctx, "zones", output_format=output_format, fields=fields,
+               filters=filters, page_size=page_size)
+
+
+@main.group(help="Manage the local registry mirror")
+@click.option("--database", "-d", envvar="DNS_GATEWAY_MIRROR",
+              show_envvar=True, type=click.Path(dir_okay=False),
+              default=default_mirror_database,
+              help="Path to the mirror database")
+@click.pass_context
+def mirror(ctx, database):
+    """Mirror management command group."""
+    ctx.meta["mirror_database"] = database
+
+
+@mirror.command(name="sync", help="Synchronise the mirror with the registry")
+@click.option("--table", "tables", multiple=True,
+              type=click.Choice(MIRROR_TABLES),
+              help="Synchronise only the given tables")
+@click.option("--detail", is_flag=True,
+              help="Fetch full details of changed records")
+@click.pass_context
+def sync_mirror(ctx, tables, detail):
+    """Synchronise the local mirror."""
+    from dnsgateway.mirror import Mirror
+    database = ctx.meta["mirror_database"]
+    log.debug(f"Synchronising mirror '{database}'")
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+        with Mirror(database, client=get_client(ctx)) as m:
+            stats = m.sync(tables=tables or None, detail=detail)
+        for table, counts in stats.items():
+            click.echo(f"{table}: " + ", ".join(f"{v} {k}"
+                                                for k, v in counts.items()))
+    except Exception as e:
+        log.error(e)
+        raise click.Abort
+
+
+@main.command(name="export", help="Write a snapshot of the registry")
+@click.argument("snapshot_file", type=click.File("wb", lazy=False))
+@click.option("--format", "snapshot_format",
+              type=click.Choice(EXPORT_FORMATS),
+              help="Snapshot format (default: from its extension)")
+@click.option("--compression", type=click.Choice(EXPORT_COMPRESSIONS),
+              help="Snapshot compression (default: from its extension)")
+@click.option("--table", "tables", multiple=True,
+              type=click.Choice(MIRROR_TABLES),
+              help="Export only the given tables")
+@click.option("--since", "previous", multiple=True, type=click.File("rb"),
+              help="Write only changes since a snapshot: give the last full "
+                   "snapshot, then any deltas taken since, in order")
+@click.option("--page-size", type=click.IntRange(min=1),
+              help="Number of objects to fetch per request")
+@click.pass_context
+def export(ctx, snapshot_file, snapshot_format, compression, tables,
+           previous, page_size):
+    """Export a registry snapshot."""
+    from dnsgateway.export import guess_format, snapshot_hashes
+    if snapshot_format is None or compression is None:
+        try:
+            guess = guess_format(snapshot_file.name)
+        except ValueError as e:
+            if snapshot_format is None:
+                raise click.UsageError(str(e))
+            guess = (snapshot_format, "gzip")
+        snapshot_format = snapshot_format or guess[0]
+        compression = compression or guess[1]
+    try:
+        since = snapshot_hashes(previous) if previous else None
+        stats = get_client(ctx).export(snapshot_file,
+                                       format=snapshot_format,
+                                       compression=compression,
+                                       tables=tables or None, since=since,
+                                       page_size=page_size)
+        for table, counts in stats.items():
+            click.echo(f"{table}: " + ", ".join(f"{v} {k}"
+                                                for k, v in counts.items()),
+                       err=True)
+    except Exception as e:
+        log.error(e)
+        raise click.Abort
+
+
+@main.command(name="plan", help="Show the changes reaching a desired state")
+@state_options
+@click.pass_context
+def plan_state(ctx, **kwargs):
+    """Plan changes to the registry."""
+    try:
+        _, plan = make_plan(ctx, **kwargs)
+        echo_plan(plan)
+    except Exception as e:
+        log.error(e)
+        raise click.Abort
+
+
+@main.command(name="apply", help="Make the changes reaching a desired state")
+@state_options
+@click.option("--output", "-o", type=click.File("w"), default="-",
+              help="File to write NDJSON results to ('-' for stdout)")
+@click.option("--max-charge", type=float,
+              help="Maximum charge accepted for a single domain")
+@click.option("--max-total", type=float,
+              help="Maximum total of charges accepted")
+@click.option("--accept-charge", "accept", is_flag=True,
+              help="Accept any charge if no maximum is given")
+@click.option("--yes", "approve", is_flag=True,
+              help="Apply the changes without asking for confirmation")
+@click.pass_context
+def apply_state(ctx, output, max_charge, max_total, accept, approve,
+                **kwargs):
+    """Apply changes to the registry."""
+    from dnsgateway.plan import CREATE, DELETED, DOMAIN, UPDATED
     try:
-        for zone in ctx.obj.zones:
-            click.echo(zone)
+        planner, plan = make_plan(ctx, **kwargs)
     except Exception as e:
         log.error(e)
         raise click.Abort
+    echo_plan(plan, err=True)
+    if not plan:
+        return
+    if max_charge is None and max_total is None and not accept and \
+            any(c.kind == DOMAIN and c.action == CREATE for c in plan):
+        raise click.UsageError("the plan creates domains: specify "
+                               "'--max-charge' or '--max-total', or "
+                               "'--accept-charge'")
+    if not approve:
+        click.confirm("Apply these changes?", abort=True, err=True)
+    ceiling = bulk.ChargeCeiling(max_charge=max_charge, max_total=max_total)
+    statuses = write_results(planner.apply(plan, ceiling=ceiling), output,
+                             ceiling)
+    # Changes not made leave the registry short of the state
+    if set(statuses) - {bulk.CREATED, UPDATED, DELETED}:
+        ctx.exit(1)
@@ -11,46 +11,314 @@
 # the License.
 """dnsgateway.client module."""
 
+import collections
+import concurrent.futures
+import itertools
 import logging
+import time
+import urllib.parse
+import uuid
 
+from dnsgateway.bulk import (BULK_WORKERS, CREATED, ChargeCeiling, FAILED,
+                             REJECTED, SKIPPED, UNAVAILABLE, domain_row)
+from dnsgateway.cache import ResponseCache
+from dnsgateway.coalesce import SingleFlight
 from dnsgateway.contact import Contact
+from dnsgateway.deadline import (DEADLINES, DEFAULT_CONNECT_TIMEOUT,
+                                 DEFAULT_READ_TIMEOUT, Deadline,
+                                 DeadlineExceeded, DeadlineScope,
+                                 normalise_timeout)
 from dnsgateway.domain import Domain
+from dnsgateway.endpoints import (DEVELOPMENT_ENDPOINT,  # noqa: F401
+                                  PRODUCTION_ENDPOINT)
+from dnsgateway.export import write_snapshot
 from dnsgateway.helpers import gen_authinfo
+from dnsgateway.journal import DONE, FAILED as JOURNAL_FAILED
+from dnsgateway.metrics import (MultiSink, RequestEvent, path_template,
+                                request_size, response_size)
+from dnsgateway.query import Query
+from dnsgateway.retry import RequestStats, TokenBucket
+from dnsgateway.stream import STREAM_CHUNK_SIZE, StreamedPage
+from dnsgateway.trace import Redacted
+from dnsgateway.transport import (DEFAULT_POOL_CONNECTIONS,
+                                  DEFAULT_POOL_MAXSIZE, Http2Transport,
+                                  HttpxTransport, RequestsTransport,
+                                  TRANSPORTS)
 from dnsgateway.zone import Zone
 
-import requests
-
 log = logging.getLogger(__name__)
 
-PRODUCTION_ENDPOINT = "https://gateway-epp.dns.net.za/api"
-DEVELOPMENT_ENDPOINT = "https://gateway-otande.dns.net.za:8443/api"
+CHECK_BATCH_SIZE = 10
 
+HYDRATE_MODES = ("eager", "lazy")
 
-class DnsGatewayClient(object):
-    """DNS Gateway API client implementation."""
+
+class BaseClient(object):
+    """Base DNS Gateway API client implementation.
+
+    Holds the logic shared by the synchronous and asynchronous clients:
+    URL construction, response handling and request payloads. Subclasses
+    provide the I/O by way of a transport.
+    """
+
+    domain_class = Domain
+    contact_class = Contact
+    zone_class = Zone
+    query_class = Query
+    single_flight_class = SingleFlight
+    deadlines = DEADLINES
 
     def __init__(self, endpoint=PRODUCTION_ENDPOINT,
-                 username=None, password=None):
-        """Initialise a new client instance."""
+                 username=None, password=None, transport=None, prefetch=0,
+                 retry=None, rate_limit=None, cache=None, hydrate="lazy",
+                 journal=None, metrics=None, coalesce=True,
+                 timeout=(DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT)):
+        """Initialise a new client instance.
+
+        `prefetch` sets the default number of pages that collection
+        iterators fetch ahead of the caller. See `_page_urls`.
+
+        `retry` is a `RetryPolicy` applied to failed requests, and
+        `rate_limit` a `TokenBucket` (or a rate in requests per second)
+        shared by all requests made by the client. Retries and limiter waits
+        are counted in `stats`.
+
+        `cache` is a `ResponseCache` for GET responses, or `True` to use one
+        with the default TTLs. Entries are invalidated by changes made
+        through the client.
+
+        If `coalesce` is set, concurrent GET requests for the same URL and
+        parameters are coalesced into a single request, whose response
+        data is copied to each caller. Coalesced reads are counted in
+        `stats`. Reads are not coalesced with reads started before a change
+        made through the client.
+
+        `hydrate` sets the default hydration mode for lookups: see
+        `_lookup_object`.
+
+        `journal` is a `Journal` recording every mutating request made by
+        the client, so that interrupted jobs can be resumed.
+
+        `metrics` is a `MetricsSink` (or a list of sinks) receiving an event
+        for each request attempt and each collection page: see
+        `PrometheusMetrics`.
+
+        `timeout` is the (connect, read) timeout of each request attempt in
+        seconds, a single number for both, or `None` to wait forever. See
+        `deadline` to bound the time taken by a sequence of calls.
+        """
         log.debug(f"Setting endpoint: {endpoint}")
         self.endpoint = endpoint
         log.debug(f"Setting authentication username: {username}")
         self.auth = (username, password)
+        self.transport = transport
+        self.prefetch = prefetch
+        self.retry = retry
+        if rate_limit is not None and not isinstance(rate_limit, TokenBucket):
+            rate_limit = TokenBucket(rate_limit)
+        self.rate_limit = rate_limit
+        self.stats = RequestStats()
+        if cache is True:
+            cache = ResponseCache()
+        self.cache = cache
+        self.single_flight = self.single_flight_class() if coalesce else None
+        self.hydrate = hydrate
+        self.journal = journal
+        if isinstance(metrics, (list, tuple)):
+            metrics = MultiSink(*metrics)
+        self.metrics = metrics
+        self.timeout = normalise_timeout(timeout)
+
+    def deadline(self, seconds):
+        """Get a context in which calls must complete within `seconds`.
+
+        The deadline covers every request made in the context, including
+        pagination, retries, rate limiter waits and the requests of
+        multi-step operations, e.g.::
+
+            with client.deadline(5):
+                domain = client.domain(name="example.co.za").refresh()
+
+        Request timeouts are clipped to the time remaining, and a call that
+        runs out of time raises `DeadlineExceeded`, saying how many
+        responses and pages were received. Nested deadlines can only
+        shorten the time allowed. The context yields the `Deadline` in
+        effect.
+        """
+        return DeadlineScope(Deadline(seconds), self.deadlines)
+
+    def _deadline(self):
+        """Get the deadline in effect, or `None`."""
+        return self.deadlines.get(None)
+
+    def _request_options(self, deadline, operation, delay=0, stream=False):
+        """Get the transport options of a request attempt.
+
+        Raises `DeadlineExceeded` unless `deadline` leaves time to wait
+        `delay` seconds before the attempt.
+        """
+        options = {"stream": True} if stream else {}
+        timeout = self.timeout
+        if deadline is not None:
+            deadline.check(operation, delay)
+            timeout = deadline.timeout(timeout)
+        if timeout is not None:
+            options["timeout"] = timeout
+        return options
+
+    @staticmethod
+    def _deadline_error(deadline, operation, exc):
+        """Get the error to raise for a failed request attempt."""
+        if deadline is None or isinstance(exc, DeadlineExceeded) or \
+                not deadline.expired:
+            return exc
+        return deadline.exceeded(operation)
+
+    def _exception_delay(self, deadline, operation, method, attempt, exc,
+                         idempotent=None):
+        """Get the delay before retrying after `exc`, or raise the error.
+
+        The error raised is `DeadlineExceeded` if `deadline` has passed.
+        """
+        exc = self._deadline_error(deadline, operation, exc)
+        delay = None
+        if isinstance(exc, self.transport.retryable_exceptions):
+            delay = self._retry_delay(method, attempt, exc=exc,
+                                      idempotent=idempotent)
+        if delay is None:
+            log.error(exc)
+            raise exc
+        return delay
+
+    def _response_delay(self, deadline, method, attempt, resp,
+                        idempotent=None):
+        """Get the delay before retrying after `resp`, or `None` if final.
+
+        The response is counted towards `deadline`.
+        """
+        if deadline is not None:
+            deadline.record_response()
+        return self._retry_delay(method, attempt, resp=resp,
+                                 idempotent=idempotent)
 
-    def _request(self, method="GET", path=None, params=None, data=None):
-        if path.startswith("https://"):
-            url = path
+    def _url(self, path):
+        if path.startswith(("https://", "http://")):
+            return path
+        return f"{self.endpoint}/{path}"
+
+    def _limiter_delay(self):
+        """Count a request attempt and get its rate limiter delay."""
+        self.stats.record_request()
+        if self.rate_limit is None:
+            return 0
+        delay = self.rate_limit.reserve()
+        self.stats.record_wait(delay)
+        return delay
+
+    def _retry_delay(self, method, attempt,
+                     resp=None, exc=None, idempotent=None):
+        """Get the delay before retrying a request, or `None` if final."""
+        if self.retry is None:
+            return None
+        if exc is None:
+            if resp.status_code < 400:
+                return None
+            status, headers, reason = resp.status_code, resp.headers, \
+                resp.status_code
         else:
-            url = f"{self.endpoint}/{path}"
-        log.debug(f"Trying HTTP {method} to {url}")
-        try:
-            resp = requests.request(method, url, auth=self.auth,
-                                    params=params, json=data)
-        except Exception as e:
-            log.error(e)
-            raise e
-        log.debug(f"Got response {resp.status_code}: {resp.reason}")
-        log.debug(f"Response headers: {resp.headers}")
+            status, headers, reason = None, None, type(exc).__name__
+        if not self.retry.is_retryable(method, attempt, status=status,
+                                       idempotent=idempotent):
+            return None
+        delay = self.retry.backoff(attempt, headers=headers)
+        log.warning(f"Retrying HTTP {method} after {reason} in {delay:.2f}s "
+                    f"(retry {attempt + 1} of {self.retry.total})")
+        self.stats.record_retry(reason)
+        return delay
+
+    @staticmethod
+    def _request_id():
+        """Generate an id for a request, shared by its attempts."""
+        return uuid.uuid4().hex[:16]
+
+    def _record_request(self, request_id, method, url, params, attempt,
+                        started, resp=None, exc=None, stream=False):
+        """Send a request attempt started at `started` to the metrics."""
+        duration = time.perf_counter() - started
+        if params:
+            url = f"{url}{'&' if '?' in url else '?'}" \
+                  f"{urllib.parse.urlencode(params, doseq=True)}"
+        if resp is None:
+            status, sent, received = None, 0, 0
+        else:
+            status, sent, received = resp.status_code, request_size(resp), \
+                response_size(resp, stream=stream)
+        self.metrics.record_request(RequestEvent(
+            request_id=request_id, method=method, url=url,
+            path=path_template(url, self.endpoint), attempt=attempt,
+            status=status, error=exc, request_bytes=sent,
+            response_bytes=received, duration=duration
+        ))
+
+    def _record_pages(self, path, pages):
+        """Send each of `pages` to the metrics as it is iterated over."""
+        template = path_template(self._url(path), self.endpoint)
+        for data in pages:
+            self.metrics.record_page(template)
+            yield data
+
+    def _count_pages(self, deadline, pages):
+        """Count each of `pages` towards `deadline` as it is iterated over."""
+        for data in pages:
+            deadline.record_page()
+            yield data
+
+    def _invalidate(self, method, url, idempotent=None):
+        """Invalidate cached and in-flight reads affected by a request.
+
+        This is done both before a write is sent and once it completes or
+        fails, dropping any stale data cached by reads that raced it.
+        """
+        if method == "GET" or idempotent:
+            return
+        if self.cache is not None:
+            self.cache.invalidate(url)
+        if self.single_flight is not None:
+            self.single_flight.forget()
+
+    def _journal_begin(self, method, url, data=None, idempotent=None):
+        """Journal a mutating request, returning its entry id."""
+        if self.journal is None or method == "GET" or idempotent:
+            return None
+        return self.journal.begin(method, url, data)
+
+    def _journal_end(self, entry, result=None, exc=None):
+        """Journal the outcome of a request."""
+        if entry is None:
+            return
+        if exc is None:
+            wid = result.get("wid") if isinstance(result, dict) else None
+            self.journal.finish(entry, DONE, wid=wid)
+            return
+        response = getattr(exc, "response", None)
+        if response is not None and response.status_code < 500:
+            self.journal.finish(entry, JOURNAL_FAILED, error=str(exc))
+        else:
+            log.warning(f"Outcome of journalled request {entry} unknown: "
+                        f"{exc}")
+
+    def _cache_response(self, key, entry, resp):
+        """Handle a response to a cacheable request."""
+        if entry is not None and resp.status_code == 304:
+            log.debug("Cached response for %s revalidated", key[0])
+            return self.cache.revalidated(key, entry)
+        data = self._handle_response(resp)
+        self.cache.store(key, data, resp.headers)
+        return data
+
+    def _handle_response(self, resp):
+        log.debug("Got response %s", resp.status_code)
+        log.debug("Response headers: %s", resp.headers)
         try:
             resp.raise_for_status()
         except Exception as e:
@@ -67,11 +335,335 @@ class DnsGatewayClient(object):
             raise e
         return data
 
+    @staticmethod
+    def _page_urls(data):
+        """Get the URLs of all remaining pages of a paginated collection.
+
+        When the first page's `next` link paginates by `offset` or `page`,
+        the remaining pages can be computed from `count` and requested in
+        parallel. Otherwise `None` is returned, and the `next` links must be
+        followed one at a time.
+        """
+        next_url = data.get("next")
+        count = data.get("count")
+        page_size = len(data.get("results") or ())
+        if next_url is None or not isinstance(count, int) or not page_size:
+            return None
+        parts = urllib.parse.urlsplit(next_url)
+        query = urllib.parse.parse_qs(parts.query, keep_blank_values=True)
+        try:
+            if "offset" in query:
+                limit = int(query.get("limit", [page_size])[0])
+                start = int(query["offset"][0])
+                key, values = "offset", range(start, count, limit)
+            elif "page" in query:
+                start = int(query["page"][0])
+                key, values = "page", range(start, -(-count // page_size) + 1)
+            else:
+                return None
+        except ValueError:
+            return None
+        urls = []
+        for value in values:
+            query[key] = [str(value)]
+            urls.append(urllib.parse.urlunsplit(
+                parts._replace(query=urllib.parse.urlencode(query, doseq=True))
+            ))
+        return urls
+
+    def _collection_class(self, collection):
+        """Get the model class of the objects in `collection`."""
+        classes = {"domains": self.domain_class,
+                   "contacts": self.contact_class,
+                   "zones": self.zone_class}
+        try:
+            return classes[collection]
+        except KeyError:
+            err = ValueError(f"unknown collection '{collection}'")
+            log.error(err)
+            raise err
+
+    def query(self, collection):
+        """Get a query over `collection`: see `Query`."""
+        return self.query_class(self, collection)
+
+    @staticmethod
+    def _single_result(data):
+        if data["count"] != 1:
+            err = RuntimeError(f"got {data['count']} results")
+            log.error(err)
+            raise err
+        return data["results"][0]
+
+    def _lookup_object(self, cls, result, hydrate=None):
+        """Build an object from a filtered list result.
+
+        If `result` already carries the detail-only properties of `cls`,
+        the object is complete. Otherwise, with "eager" hydration the
+        object must be refreshed before use, and with "lazy" hydration it is
+        refreshed on first access to a missing property.
+
+        Returns the object and whether it must be refreshed.
+        """
+        hydrate = hydrate or self.hydrate
+        if hydrate not in HYDRATE_MODES:
+            err = ValueError(f"hydrate must be one of {HYDRATE_MODES}")
+            log.error(err)
+            raise err
+        if cls._is_detailed(result):
+            return cls(client=self, **result), False
+        lazy = hydrate == "lazy" and cls.lazy_hydration
+        return cls(client=self, lazy=lazy, **result), hydrate == "eager"
+
+    @staticmethod
+    def _check_charge(data, op, result=None):
+        if result is None:
+            result = data["results"][0]
+        charge = result.get("charge", data.get("charge"))
+        # Only creates need the name to be available: other operations
+        # apply to registered names, and are charged if the zone allows them
+        if not int(result["avail"]) and (op == "create" or charge is None):
+            return False
+        try:
+            return charge["action"][op]
+        except (KeyError, TypeError) as e:
+            log.error(e)
+            raise KeyError(op) from e
+
+    @classmethod
+    def _check_charges(cls, data, op, names):
+        charges = {}
+        for name, result in zip(names, data["results"]):
+            charges[result.get("name", name)] = cls._check_charge(data, op,
+                                                                  result)
+        return charges
+
+    @staticmethod
+    def _check_batches(names, batch_size=CHECK_BATCH_SIZE):
+        names = iter(names)
+        while True:
+            batch = list(itertools.islice(names, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    @staticmethod
+    def _domain_details(name=None, period=1, period_unit="y",
+                        autorenew=False, hosts=[], charge=None,
+                        admin=None, registrant=None, billing=None, tech=None):
+        kwargs = locals()
+        details = {
+            "name": name,
+            "period": period,
+            "period_unit": period_unit,
+            "autorenew": autorenew,
+            "authinfo": gen_authinfo(name),
+            "hosts": [{"hostname": host} for host in hosts],
+            "contacts": [{"type": t, "contact": {"id": kwargs[t]}}
+                         for t in ("registrant", "admin", "billing", "tech")]
+        }
+        if charge is not None:
+            details["charge"] = {"price": charge}
+        return details
+
+    @staticmethod
+    def _contact_details(id=None, name=None, org=None,
+                         email=None, phone=None, fax=None,
+                         address1=None, address2=None, address3=None,
+                         city=None, province=None, code=None, country=None):
+        return {
+            "id": id,
+            "phone": phone,
+            "fax": fax,
+            "email": email,
+            "contact_address": [
+                {
+                    "real_name": name,
+                    "org": org,
+                    "address1": address1,
+                    "address2": address2,
+                    "address3": address3,
+                    "city": city,
+                    "province": province,
+                    "code": code,
+                    "country": country,
+                    "type": type
+                } for type in ("loc", "int")
+            ]
+        }
+
+
+class DnsGatewayClient(BaseClient):
+    """DNS Gateway API client implementation."""
+
+    def __init__(self, endpoint=PRODUCTION_ENDPOINT,
+                 username=None, password=None, transport=None, prefetch=0,
+                 retry=None, rate_limit=None, cache=None, hydrate="lazy",
+                 journal=None, metrics=None, coalesce=True,
+                 timeout=(DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT),
+                 pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False,
+                 stream=False):
+        """Initialise a new client instance.
+
+        `transport` is a `Transport`, or the name of one of the built-in
+        transports: "requests" (the default), "httpx" or "http2". By
+        default, HTTP requests are made through a pooled keep-alive
+        `requests` session: see `RequestsTransport` for the meaning of the
+        `pool_*` arguments. `prefetch` pages are fetched concurrently, so
+        should not exceed `pool_maxsize`.
+
+        The "http2" transport multiplexes concurrent requests over a single
+        HTTP/2 connection, if the endpoint supports it: see
+        `Http2Transport`.
+
+        If `stream` is set, collection pages are decoded as they are read
+        (see `StreamedPage`), rather than buffered, so that results are
+        yielded as soon as they arrive. Streamed pages are fetched one at a
+        time, and are not cached.
+        """
+        super().__init__(endpoint=endpoint,
+                         username=username, password=password,
+                         prefetch=prefetch, retry=retry, rate_limit=rate_limit,
+                         cache=cache, hydrate=hydrate, journal=journal,
+                         metrics=metrics, coalesce=coalesce, timeout=timeout)
+        self.stream = stream
+        if transport is None:
+            transport = "requests"
+        if isinstance(transport, str):
+            transport = self._new_transport(transport,
+                                            pool_connections=pool_connections,
+                                            pool_maxsize=pool_maxsize,
+                                            pool_block=pool_block)
+        self.transport = transport
+
+    def _new_transport(self, name, pool_connections=DEFAULT_POOL_CONNECTIONS,
+                       pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False):
+        """Create the built-in transport called `name`."""
+        if name not in TRANSPORTS:
+            err = ValueError(f"unknown transport '{name}': use one of "
+                             f"{', '.join(TRANSPORTS)}")
+            log.error(err)
+            raise err
+        if name in ("httpx", "http2"):
+            cls = HttpxTransport if name == "httpx" else Http2Transport
+            return cls(auth=self.auth,
+                       max_connections=pool_maxsize if pool_block else None,
+                       max_keepalive=pool_maxsize)
+        return RequestsTransport(auth=self.auth,
+                                 pool_connections=pool_connections,
+                                 pool_maxsize=pool_maxsize,
+                                 pool_block=pool_block)
+
+    def __enter__(self):
+        """Enter the client context."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close the client on exiting the context."""
+        self.close()
+
+    def close(self):
+        """Close the transport and release pooled connections."""
+        self.transport.close()
+
+    def _send(self, method="GET", url=None, params=None, data=None,
+              headers=None, idempotent=None, stream=False):
+        attempt = 0
+        request_id = self._request_id() if self.metrics is not None else None
+        deadline = self._deadline()
+        operation = f"{method} {url}"
+        while True:
+            delay = self._limiter_delay()
+            options = self._request_options(deadline, operation, delay,
+                                            stream=stream)
+            if delay:
+                time.sleep(delay)
+            log.debug("Trying HTTP %s to %s", method, url)
+            started = time.perf_counter()
+            try:
+                resp = self.transport.request(method, url, params=params,
+                                              json=data, headers=headers,
+                                              **options)
+            except Exception as e:
+                if self.metrics is not None:
+                    self._record_request(request_id, method, url, params,
+                                         attempt, started, exc=e)
+                delay = self._exception_delay(deadline, operation, method,
+                                              attempt, e, idempotent)
+            else:
+                if self.metrics is not None:
+                    self._record_request(request_id, method, url, params,
+                                         attempt, started, resp=resp,
+                                         stream=stream)
+                delay = self._response_delay(deadline, method, attempt, resp,
+                                             idempotent)
+                if delay is None:
+                    return resp
+            attempt += 1
+            if deadline is not None:
+                deadline.check(operation, delay)
+            time.sleep(delay)
+
+    def _request(self, method="GET", path=None, params=None, data=None,
+                 idempotent=None):
+        url = self._url(path)
+        self._invalidate(method, url, idempotent)
+        entry = self._journal_begin(method, url, data, idempotent)
+        try:
+            resp = self._send(method=method, url=url, params=params,
+                              data=data, idempotent=idempotent)
+            result = self._handle_response(resp)
+        except Exception as e:
+            self._journal_end(entry, exc=e)
+            raise e
+        finally:
+            self._invalidate(method, url, idempotent)
+        self._journal_end(entry, result)
+        return result
+
     def _get(self, path=None, params=None):
-        return self._request(method="GET", path=path, params=params)
+        if self.single_flight is None:
+            return self._fetch(path=path, params=params)
+        key = ResponseCache.key(self._url(path), params)
+        deadline = self._deadline()
+        try:
+            data, joined = self.single_flight.do(
+                key, lambda: self._fetch(path=path, params=params),
+                timeout=deadline and max(deadline.remaining(), 0)
+            )
+        except TimeoutError as e:
+            raise self._deadline_error(deadline, f"GET {key[0]}", e)
+        if joined:
+            self.stats.record_coalesced()
+        return data
+
+    def _fetch(self, path=None, params=None):
+        """Get a resource, from the cache if possible."""
+        if self.cache is None:
+            return self._request(method="GET", path=path, params=params)
+        url = self._url(path)
+        key = self.cache.key(url, params)
+        data, entry = self.cache.lookup(key)
+        if data is not None:
+            return data
+        resp = self._send(method="GET", url=url, params=params,
+                          headers=entry and entry.validators)
+        return self._cache_response(key, entry, resp)
+
+    def _get_stream(self, path=None, params=None):
+        """Get a collection page, decoding it as it is read."""
+        resp = self._send(method="GET", url=self._url(path), params=params,
+                          stream=True)
+        if resp.status_code >= 400:
+            return self._handle_response(resp)
+        log.debug("Streaming response %s", resp.status_code)
+        return StreamedPage(resp.iter_content(chunk_size=STREAM_CHUNK_SIZE),
+                            close=resp.close)
 
-    def _post(self, path=None, data=None):
-        return self._request(method="POST", path=path, data=data)
+    def _post(self, path=None, data=None, idempotent=None):
+        return self._request(method="POST", path=path, data=data,
+                             idempotent=idempotent)
 
     def _put(self, path=None, data=None):
         return self._request(method="PUT", path=path, data=data)
@@ -79,107 +671,286 @@ class DnsGatewayClient(object):
     def _delete(self, path=None):
         return self._request(method="DELETE", path=path)
 
-    def _get_iter(self, path=None, params=None):
+    def _get_iter(self, path=None, params=None, prefetch=None):
+        pages = self._iter_pages(path=path, params=params, prefetch=prefetch)
+        if self.metrics is not None:
+            pages = self._record_pages(path, pages)
+        deadline = self._deadline()
+        if deadline is not None:
+            pages = self._count_pages(deadline, pages)
+        return pages
+
+    def _iter_pages(self, path=None, params=None, prefetch=None):
+        if self.stream:
+            yield from self._get_iter_stream(path=path, params=params)
+            return
+        if prefetch is None:
+            prefetch = self.prefetch
+        if prefetch:
+            yield from self._get_iter_prefetch(path=path, params=params,
+                                               depth=prefetch)
+            return
         next = path
         while next is not None:
             data = self._get(path=next, params=params)
-            log.debug(f"Got data: {data}")
-            next = data["next"]
+            log.debug("Got %d results, next page %s",
+                      len(data["results"]), data["next"])
+            # `next` links carry the query parameters
+            next, params = data["next"], None
             yield data
 
+    def pages(self, collection, page_size=None, **filters):
+        """Get the pages of a collection, each an iterator of objects.
+
+        `collection` is one of "domains", "contacts" or "zones", and is
+        filtered by `filters` (see `Query`). Each page should be consumed
+        before the next is requested.
+        """
+        query = self.query(collection).filter(**filters)
+        return query.page_size(page_size).pages()
+
+    def _get_iter_stream(self, path=None, params=None):
+        """Iterate over streamed pages, following `next` links."""
+        next = path
+        while next is not None:
+            data = self._get_stream(path=next, params=params)
+            params = None
+            try:
+                yield data
+                next = data.get("next")
+            finally:
+                data.close()
+
+    def _get_iter_prefetch(self, path=None, params=None, depth=1):
+        """Iterate over pages, fetching up to `depth` pages ahead."""
+        data = self._get(path=path, params=params)
+        log.debug("Got %d results, next page %s",
+                  len(data["results"]), data["next"])
+        urls = self._page_urls(data)
+        pending = collections.deque()
+        get = self.deadlines.bind(self._get)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=depth) as pool:
+            try:
+                if urls is not None:
+                    log.debug("Fetching %s pages, %s at once",
+                              len(urls), depth)
+                    urls = iter(urls)
+                    for url in itertools.islice(urls, depth):
+                        pending.append(pool.submit(get, path=url))
+                    yield data
+                    while pending:
+                        data = pending.popleft().result()
+                        log.debug("Got %d results, next page %s",
+                                  len(data["results"]), data["next"])
+                        for url in itertools.islice(urls, 1):
+                            pending.append(pool.submit(get, path=url))
+                        yield data
+                else:
+                    while data["next"] is not None:
+                        pending.append(pool.submit(get, path=data["next"]))
+                        yield data
+                        data = pending.popleft().result()
+                        log.debug("Got %d results, next page %s",
+                                  len(data["results"]), data["next"])
+                    yield data
+            finally:
+                for future in pending:
+                    future.cancel()
+
     @property
     def domains(self):
-        """Get a list of registered domains."""
+        """Get a query over registered domains.
+
+        Iterate over the query for all domains, or narrow it with e.g.
+        `client.domains.filter(zone="co.za").page_size(500)`.
+        """
         log.debug("Trying to get registered domains")
-        path = f"{Domain.base_path}/"
-        for data in self._get_iter(path=path):
-            for result in data["results"]:
-                yield Domain(client=self, **result)
+        return self.query("domains")
+
+    def domain(self, wid=None, name=None, hydrate=None):
+        """Get a domain by wid or name.
 
-    def domain(self, wid=None, name=None):
-        """Get a domain by wid or name."""
+        A lookup by name takes a single request if the list result carries
+        the domain's details. Otherwise `hydrate` (by default the client's
+        `hydrate` setting) selects whether the details are fetched at once
+        ("eager") or on first access ("lazy").
+        """
         if wid and name:
-            log.debug(f"wid:{wid} name:{name}")
+            log.debug("wid:%s name:%s", wid, name)
             err = RuntimeError("specify only one of 'wid' or 'name'")
             log.error(err)
             raise err
         if wid:
-            log.debug(f"Trying to get domain by wid '{wid}'")
+            log.debug("Trying to get domain by wid '%s'", wid)
             path = f"{Domain.base_path}/{wid}"
             data = self._get(path=path)
-            return Domain(client=self, **data)
+            return self.domain_class(client=self, **data)
         if name:
-            log.debug(f"Trying to get domain by name '{name}'")
+            log.debug("Trying to get domain by name '%s'", name)
             path = f"{Domain.base_path}/"
             params = {"name": name}
             data = self._get(path=path, params=params)
-            if data["count"] != 1:
-                err = RuntimeError(f"got {data['count']} results")
-                log.error(err)
-                raise err
-            return Domain(client=self, **data["results"][0]).refresh()
+            result = self._single_result(data)
+            domain, refresh = self._lookup_object(self.domain_class, result,
+                                                  hydrate)
+            return domain.refresh() if refresh else domain
 
     def check_domain(self, name=None, op="create"):
         """Check domain name availability."""
-        log.debug(f"Checking availability of domain name {name} for {op}")
+        log.debug("Checking availability of domain name %s for %s", name, op)
         path = f"{Domain.base_path}/check/"
         details = {"name": name}
-        log.debug(f"Check details: {details}")
-        data = self._post(path=path, data=details)
-        log.debug(f"Result: {data}")
-        if int(data["results"][0]["avail"]):
-            try:
-                return data["charge"]["action"][op]
-            except KeyError as e:
-                log.error(e)
-                raise e
-        else:
-            return False
+        log.debug("Check details: %s", details)
+        data = self._post(path=path, data=details, idempotent=True)
+        log.debug("Result: %s", data)
+        return self._check_charge(data, op)
+
+    def check_domains(self, names, op="create", batch_size=CHECK_BATCH_SIZE):
+        """Check the availability of many domain names.
+
+        Names are checked `batch_size` at a time, in as few requests as
+        possible. Returns a dictionary mapping each name to its charge for
+        `op`, or to `False` if unavailable.
+        """
+        path = f"{Domain.base_path}/check/"
+        charges = {}
+        for batch in self._check_batches(names, batch_size=batch_size):
+            log.debug("Checking availability of %s domain names for %s",
+                      len(batch), op)
+            data = self._post(path=path, data={"name": batch},
+                              idempotent=True)
+            charges.update(self._check_charges(data, op, batch))
+        return charges
 
     def create_domain(self, name=None, period=1, period_unit="y",
                       autorenew=False, hosts=[], charge=None,
                       admin=None, registrant=None, billing=None, tech=None):
         """Create a domain."""
-        log.debug(f"Trying to create domain {name}")
+        log.debug("Trying to create domain %s", name)
         path = f"{Domain.base_path}/"
-        kwargs = locals()
-        details = {
-            "name": name,
-            "period": period,
-            "period_unit": period_unit,
-            "autorenew": autorenew,
-            "authinfo": gen_authinfo(name),
-            "hosts": [{"hostname": host} for host in hosts],
-            "contacts": [{"type": t, "contact": {"id": kwargs[t]}}
-                         for t in ("registrant", "admin", "billing", "tech")]
-        }
-        if charge is not None:
-            details["charge"] = {"price": charge}
-        log.debug(f"Domain details: {details}")
+        details = self._domain_details(name=name, period=period,
+                                       period_unit=period_unit,
+                                       autorenew=autorenew, hosts=hosts,
+                                       charge=charge, admin=admin,
+                                       registrant=registrant,
+                                       billing=billing, tech=tech)
+        log.debug("Domain details: %s", Redacted(details))
         data = self._post(path=path, data=details)
-        return Domain(client=self, **data)
+        return self.domain_class(client=self, **data)
+
+    def create_domains(self, rows, workers=BULK_WORKERS, ceiling=None,
+                       resume=False, **defaults):
+        """Create many domains concurrently.
+
+        Each of `rows` is a mapping of `create_domain` arguments, with
+        missing fields taken from `defaults` (see `domain_row`). Rows are
+        read lazily, and checked and created by a pool of `workers` threads.
+        Each created domain's charge must be accepted by `ceiling`, a
+        `ChargeCeiling`: by default, any charge is accepted.
+
+        Yields a result dictionary for each row as it completes, in
+        completion order, with the row's index, `name`, `status` (one of
+        "created", "unavailable", "rejected" or "failed"), `charge`, and the
+        `wid` of the created domain or the `error` that prevented it.
+
+        If `resume` is set, the client's journal is first reconciled, and
+        rows whose domain it records as created are "skipped".
+        """
+        if ceiling is None:
+            ceiling = ChargeCeiling()
+        if resume:
+            if self.journal is None:
+                raise RuntimeError("resuming requires a journal")
+            log.info(f"Reconciled journal: {self.journal.reconcile(self)}")
+        rows = enumerate(rows)
+        pending = set()
+        create_row = self.deadlines.bind(self.create_domain_row)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        with executor as pool:
+            try:
+                for index, row in itertools.islice(rows, 2 * workers):
+                    pending.add(pool.submit(create_row, row, ceiling, resume,
+                                            index, defaults))
+                while pending:
+                    done, pending = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        for index, row in itertools.islice(rows, 1):
+                            pending.add(pool.submit(create_row, row, ceiling,
+                                                    resume, index, defaults))
+                        yield future.result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def create_domain_row(self, row, ceiling, resume=False, index=None,
+                          defaults=None):
+        """Check and create the domain for a single row.
+
+        `row` is a mapping of `create_domain` arguments, with missing fields
+        taken from `defaults` (see `domain_row`). The domain is created if
+        it is available and its charge is accepted by `ceiling`, a
+        `ChargeCeiling`. If `resume` is set, a domain the journal records as
+        created is "skipped".
+
+        Returns a result dictionary as yielded by `create_domains`, with
+        `index` as the row's index.
+        """
+        result = {"row": index, "name": row.get("name"), "status": FAILED,
+                  "charge": None}
+        try:
+            details = domain_row(row, **(defaults or {}))
+            result["name"] = details["name"]
+            if resume:
+                entry = self.journal.state("POST",
+                                           self._url(f"{Domain.base_path}/"),
+                                           details)
+                if entry is not None and entry["state"] == DONE:
+                    result.update(status=SKIPPED, wid=entry["wid"])
+                    return result
+            charge = self.check_domain(name=details["name"], op="create")
+            if charge is False:
+                result["status"] = UNAVAILABLE
+                return result
+            result["charge"] = charge
+            refused = ceiling.reserve(charge)
+            if refused is not None:
+                result.update(status=REJECTED, error=refused)
+                return result
+            try:
+                domain = self.create_domain(charge=charge, **details)
+            except Exception as e:
+                # Only an error response shows the charge was not incurred.
+                if getattr(e, "response", None) is not None:
+                    ceiling.release(charge)
+                raise
+            result.update(status=CREATED, wid=domain.wid)
+        except Exception as e:
+            log.error(f"Failed to create domain from row {index}: {e}")
+            result["error"] = str(e)
+        return result
 
     @property
     def contacts(self):
-        """Get a list of registered contacts."""
+        """Get a query over registered contacts."""
         log.debug("Trying to get registered contacts")
-        path = f"{Contact.base_path}/"
-        for data in self._get_iter(path=path):
-            for result in data["results"]:
-                yield Contact(client=self, **result)
+        return self.query("contacts")
+
+    def contact(self, id=None, hydrate=None):
+        """Get a contact by id.
 
-    def contact(self, id=None):
-        """Get a contact by id."""
+        See `domain` for the meaning of `hydrate`.
+        """
         if id:
-            log.debug(f"Trying to get contact by id '{id}'")
+            log.debug("Trying to get contact by id '%s'", id)
             path = f"{Contact.base_path}/"
             params = {"id": id}
             data = self._get(path=path, params=params)
-            if data["count"] != 1:
-                err = RuntimeError(f"got {data['count']} results")
-                log.error(err)
-                raise err
-            return Contact(client=self, **data["results"][0]).refresh()
+            result = self._single_result(data)
+            contact, refresh = self._lookup_object(self.contact_class, result,
+                                                   hydrate)
+            return contact.refresh() if refresh else contact
 
     def create_contact(self, id=None, name=None, org=None,
                        email=None, phone=None, fax=None,
@@ -188,35 +959,41 @@ class DnsGatewayClient(object):
         """Create a contact."""
         log.debug("Trying to create a new contact")
         path = f"{Contact.base_path}/"
-        details = {
-            "id": id,
-            "phone": phone,
-            "fax": fax,
-            "email": email,
-            "contact_address": [
-                {
-                    "real_name": name,
-                    "org": org,
-                    "address1": address1,
-                    "address2": address2,
-                    "address3": address3,
-                    "city": city,
-                    "province": province,
-                    "code": code,
-                    "country": country,
-                    "type": type
-                } for type in ("loc", "int")
-            ]
-        }
-        log.debug(f"Contact details: {details}")
+        details = self._contact_details(id=id, name=name, org=org,
+                                        email=email, phone=phone, fax=fax,
+                                        address1=address1, address2=address2,
+                                        address3=address3, city=city,
+                                        province=province, code=code,
+                                        country=country)
+        log.debug("Contact details: %s", Redacted(details))
         data = self._post(path=path, data=details)
-        return Contact(client=self, **data)
+        return self.contact_class(client=self, **data)
 
     @property
     def zones(self):
-        """Get list of supported zones."""
+        """Get a query over supported zones."""
         log.debug("Trying to get supported zones")
-        path = f"{Zone.base_path}/"
-        for data in self._get_iter(path=path):
-            for result in data["results"]:
-                yield Zone(client=self, **result)
+        return self.query("zones")
+
+    def export(self, fp, format="ndjson", compression="gzip", tables=None,
+               since=None, page_size=None):
+        """Write a snapshot of the registry to the binary file `fp`.
+
+        Records of each of `tables` (by default zones, contacts and
+        domains) are written as they are received, page by page, as
+        "ndjson" or, if `pyarrow` is installed, "parquet". NDJSON is
+        compressed by `compression`: "gzip", "zstd" (if `zstandard` is
+        installed) or "none". Each record is written with the hash of its
+        content (see `read_snapshot` for reading snapshots back).
+
+        If `since` is given, a mapping of hashes of an earlier snapshot as
+        returned by `snapshot_hashes`, only a delta is written: records
+        whose content is unchanged are left out, and deleted records are
+        written without data.
+
+        Returns a dictionary of counts of written, unchanged and deleted
+        records by table.
+        """
+        return write_snapshot(self, fp, format=format,
+                              compression=compression, tables=tables,
+                              since=since, page_size=page_size)
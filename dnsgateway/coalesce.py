@@ -0,0 +1,138 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway.coalesce module."""
+
+import asyncio
+import copy
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class Call(object):
+    """An in-flight call, shared by concurrent callers."""
+
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self, done=None):
+        """Initialise a new call."""
+        self.done = done
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight(object):
+    """Thread-safe coalescing of concurrent identical calls.
+
+    While a call for a key is in flight, further calls for the same key
+    wait for it rather than calling again, and get its result or its
+    exception. When a result is shared, each caller gets its own deep
+    copy. `forget()` detaches in-flight calls, so that calls made after
+    e.g. a change to the data are not coalesced with calls made before it.
+    """
+
+    def __init__(self):
+        """Initialise a new instance."""
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Get the number of calls in flight."""
+        return len(self._calls)
+
+    def do(self, key, func, timeout=None):
+        """Call `func`, unless a call for `key` is already in flight.
+
+        Returns the result and whether it came from another caller's call.
+        Raises `TimeoutError` if the call in flight does not complete within
+        `timeout` seconds.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Call(done=threading.Event())
+            else:
+                call.followers += 1
+        if not leader:
+            log.debug("Joining in-flight call for %s", key[0])
+            if not call.done.wait(timeout):
+                err = TimeoutError(f"timed out joining in-flight call for "
+                                   f"{key[0]}")
+                log.error(err)
+                raise err
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result), True
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+        return self._lead_result(call)
+
+    @staticmethod
+    def _lead_result(call):
+        # no further callers can join once the call is detached, so the
+        # result is copied for the leader only if it was shared
+        if call.followers:
+            return copy.deepcopy(call.result), False
+        return call.result, False
+
+    def forget(self):
+        """Stop coalescing with the calls in flight."""
+        with self._lock:
+            self._calls.clear()
+
+
+class AsyncSingleFlight(SingleFlight):
+    """Coalescing of concurrent identical coroutine calls.
+
+    See `SingleFlight`. Each call runs as a task, so that cancelling one
+    of its callers does not cancel it for the others.
+    """
+
+    async def do(self, key, func, timeout=None):
+        """Await `func()`, unless a call for `key` is already in flight.
+
+        Returns the result and whether it came from another caller's call.
+        Raises `TimeoutError` if the call in flight does not complete within
+        `timeout` seconds.
+        """
+        call = self._calls.get(key)
+        if call is not None:
+            log.debug("Joining in-flight call for %s", key[0])
+            call.followers += 1
+            try:
+                result = await asyncio.wait_for(asyncio.shield(call.done),
+                                                timeout)
+            except asyncio.TimeoutError:
+                err = TimeoutError(f"timed out joining in-flight call for "
+                                   f"{key[0]}")
+                log.error(err)
+                raise err
+            return copy.deepcopy(result), True
+        call = self._calls[key] = Call(done=asyncio.ensure_future(func()))
+        call.done.add_done_callback(lambda task: self._detach(key, call))
+        call.result = await asyncio.shield(call.done)
+        return self._lead_result(call)
+
+    def _detach(self, key, call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
@@ -25,3 +25,9 @@ class Contact(BaseObject):
 
     _keys = ("wid", "id", "cdate", "name", "phone", "fax", "email",
              "contact_address", "statuses", "linked", "detail", "domains")
+
+    _detail_keys = ("contact_address", "statuses")
+
+    _filter_keys = ("id",)
+
+    _intern_keys = ("statuses",)
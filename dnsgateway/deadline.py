@@ -0,0 +1,201 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway.deadline module."""
+
+import functools
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 60.0
+
+
+class DeadlineExceeded(TimeoutError):
+    """A client call ran out of time.
+
+    Says how far the call got: `requests` responses and `pages` of
+    collections had been received in `elapsed` seconds, of a `budget` of
+    seconds, when `operation` (e.g. "GET registry/domains/") could not be
+    completed in time.
+    """
+
+    def __init__(self, budget, elapsed, requests, pages, operation=None):
+        """Initialise a new exception."""
+        self.budget = budget
+        self.elapsed = elapsed
+        self.requests = requests
+        self.pages = pages
+        self.operation = operation
+        message = f"deadline of {budget:g}s exceeded after {elapsed:.3f}s " \
+                  f"with {requests} responses and {pages} pages received"
+        if operation is not None:
+            message += f", during {operation}"
+        super().__init__(message)
+
+
+class Deadline(object):
+    """Time budget for a sequence of client calls.
+
+    Tracks the time remaining of `budget` seconds, and the number of
+    responses and collection pages received within it.
+    """
+
+    def __init__(self, budget, clock=time.monotonic):
+        """Initialise a new deadline."""
+        self.budget = float(budget)
+        self._clock = clock
+        self.started = clock()
+        self.expires = self.started + self.budget
+        self.requests = 0
+        self.pages = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        """Represent the deadline."""
+        return f"{type(self).__name__}({self.budget:g}, " \
+               f"remaining={self.remaining():.3f})"
+
+    def remaining(self):
+        """Get the number of seconds remaining, which may be negative."""
+        return self.expires - self._clock()
+
+    @property
+    def expired(self):
+        """Check whether the deadline has passed."""
+        return self.remaining() <= 0
+
+    def exceeded(self, operation=None):
+        """Get the exception for a call that ran out of time."""
+        return DeadlineExceeded(self.budget, self._clock() - self.started,
+                                self.requests, self.pages, operation)
+
+    def check(self, operation=None, delay=0):
+        """Raise `DeadlineExceeded` unless over `delay` seconds remain."""
+        if self.remaining() <= delay:
+            err = self.exceeded(operation)
+            log.error(err)
+            raise err
+
+    def timeout(self, timeout):
+        """Clip a (connect, read) request `timeout` to the time remaining."""
+        remaining = max(self.remaining(), 0.001)
+        if timeout is None:
+            return (remaining, remaining)
+        return tuple(remaining if t is None else min(t, remaining)
+                     for t in timeout)
+
+    def record_response(self):
+        """Count a response received within the deadline."""
+        with self._lock:
+            self.requests += 1
+
+    def record_page(self):
+        """Count a collection page received within the deadline."""
+        with self._lock:
+            self.pages += 1
+
+
+def normalise_timeout(timeout):
+    """Get a (connect, read) pair from a request `timeout` setting.
+
+    `timeout` may be a pair, a single number for both, or `None` to wait
+    forever.
+    """
+    if timeout is None:
+        return None
+    if isinstance(timeout, (int, float)):
+        return (float(timeout), float(timeout))
+    connect, read = timeout
+    return (connect, read)
+
+
+class DeadlineScope(object):
+    """Context in which client calls share a deadline.
+
+    Entering the scope makes `deadline` the current deadline held by
+    `store`, a `ThreadDeadlines` or a `contextvars.ContextVar`, and leaving
+    it restores the previous one. A scope nested in another keeps the
+    earlier of their deadlines. Usable with `with` and `async with`.
+    """
+
+    def __init__(self, deadline, store):
+        """Initialise a new scope."""
+        self.deadline = deadline
+        self.store = store
+        self._token = None
+
+    def __enter__(self):
+        """Make the deadline current, returning the deadline in effect."""
+        deadline = self.store.get(None)
+        if deadline is None or deadline.expires > self.deadline.expires:
+            deadline = self.deadline
+        self._token = self.store.set(deadline)
+        return deadline
+
+    def __exit__(self, *exc_info):
+        """Restore the previous deadline."""
+        self.store.reset(self._token)
+
+    async def __aenter__(self):
+        """Make the deadline current, returning the deadline in effect."""
+        return self.__enter__()
+
+    async def __aexit__(self, *exc_info):
+        """Restore the previous deadline."""
+        self.__exit__(*exc_info)
+
+
+class ThreadDeadlines(object):
+    """Current deadline of each thread.
+
+    Provides the `get`, `set` and `reset` methods of a
+    `contextvars.ContextVar`, for the synchronous client.
+    """
+
+    def __init__(self):
+        """Initialise a new instance."""
+        self._local = threading.local()
+
+    def get(self, default=None):
+        """Get the current deadline of this thread."""
+        return getattr(self._local, "deadline", default)
+
+    def set(self, deadline):
+        """Set the current deadline, returning a token to `reset` with."""
+        token = self.get()
+        self._local.deadline = deadline
+        return token
+
+    def reset(self, token):
+        """Restore the deadline current before the `set` giving `token`."""
+        self._local.deadline = token
+
+    def bind(self, func):
+        """Bind `func` to the current deadline, to be called by a worker."""
+        deadline = self.get()
+        if deadline is None:
+            return func
+
+        @functools.wraps(func)
+        def bound(*args, **kwargs):
+            token = self.set(deadline)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.reset(token)
+        return bound
+
+
+DEADLINES = ThreadDeadlines()
@@ -28,3 +28,30 @@ class Domain(BaseObject):
              "curExpDate", "rar", "period", "period_unit", "autorenew",
              "authinfo", "detail", "hosts", "contacts", "statuses", "events",
              "domainsec", "rgp_statuses", "fee_commands", "charge")
+
+    _detail_keys = ("hosts", "contacts", "statuses", "events")
+
+    _filter_keys = ("name", "zone")
+
+    _intern_keys = ("zone", "transport", "rar", "period_unit", "statuses",
+                    "rgp_statuses")
+
+    def _renewal(self, period, period_unit, charge):
+        """Get the path and payload of a renewal request.
+
+        The current expiry date is sent with the renewal, so that the
+        gateway refuses it if the domain was renewed in the meantime.
+        """
+        data = {"period": period, "period_unit": period_unit,
+                "curExpDate": self.curExpDate}
+        if charge is not None:
+            data["charge"] = {"price": charge}
+        log.debug("Renewing %s for %s%s", self.path, period, period_unit)
+        return f"{self.path}/renew/", data
+
+    def renew(self, period=1, period_unit="y", charge=None):
+        """Renew the domain for `period` units, accepting `charge`."""
+        path, data = self._renewal(period, period_unit, charge)
+        props = self.client._post(path=path, data=data)
+        self._update_properties(**props)
+        return self
@@ -0,0 +1,19 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway.endpoints module.
+
+Kept free of imports, so that the CLI can be built without loading the
+client.
+"""
+
+PRODUCTION_ENDPOINT = "https://gateway-epp.dns.net.za/api"
+DEVELOPMENT_ENDPOINT = "https://gateway-otande.dns.net.za:8443/api"
@@ -0,0 +1,267 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway.export module."""
+
+import gzip
+import hashlib
+import io
+import json
+import logging
+
+log = logging.getLogger(__name__)
+
+TABLES = ("zones", "contacts", "domains")
+
+FORMATS = ("ndjson", "parquet")
+COMPRESSIONS = ("gzip", "zstd", "none")
+EXTENSIONS = {".ndjson": ("ndjson", "none"), ".jsonl": ("ndjson", "none"),
+              ".ndjson.gz": ("ndjson", "gzip"),
+              ".jsonl.gz": ("ndjson", "gzip"),
+              ".ndjson.zst": ("ndjson", "zstd"),
+              ".jsonl.zst": ("ndjson", "zstd"),
+              ".parquet": ("parquet", "zstd")}
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+PARQUET_MAGIC = b"PAR1"
+
+ROW_GROUP_SIZE = 10000
+
+SNAPSHOT_FIELDS = ("table", "wid", "hash", "data")
+
+
+def guess_format(filename):
+    """Guess the format and compression of a snapshot from its name."""
+    name = (filename or "").lower()
+    for ext, guess in sorted(EXTENSIONS.items(), key=lambda i: -len(i[0])):
+        if name.endswith(ext):
+            return guess
+    raise ValueError(f"cannot guess format of '{filename}': "
+                     f"specify one of {', '.join(FORMATS)}")
+
+
+def canonical(record):
+    """Encode `record` as compact JSON, with its keys sorted.
+
+    Always uses the standard library, so that hashes of the encoding do not
+    depend on the JSON libraries installed.
+    """
+    return json.dumps(record, sort_keys=True, separators=(",", ":"),
+                      default=str)
+
+
+def content_hash(encoded):
+    """Get the digest of a canonically encoded record."""
+    return hashlib.blake2b(encoded.encode(), digest_size=16).hexdigest()
+
+
+def _zstd(usage):
+    try:
+        import zstandard
+    except ImportError as e:
+        log.error(e)
+        raise RuntimeError(f"{usage} requires 'zstandard': install "
+                           f"'py-dns-gateway[zstd]'") from e
+    return zstandard
+
+
+def _pyarrow(usage):
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        log.error(e)
+        raise RuntimeError(f"{usage} requires 'pyarrow': install "
+                           f"'py-dns-gateway[parquet]'") from e
+    return pyarrow
+
+
+class NDJSONWriter(object):
+    """Write snapshot entries as NDJSON to a binary file.
+
+    Each line is an object with the `table` and `wid` of a record, the
+    `hash` of its content, and its `data`. Deleted records have neither
+    hash nor data.
+    """
+
+    def __init__(self, fp, compression="gzip"):
+        """Initialise a new writer."""
+        self._stream = None
+        if compression == "gzip":
+            self._stream = gzip.GzipFile(fileobj=fp, mode="wb")
+        elif compression == "zstd":
+            zstandard = _zstd("zstd compression")
+            self._stream = zstandard.ZstdCompressor().stream_writer(
+                fp, closefd=False
+            )
+        elif compression not in (None, "none"):
+            raise ValueError(f"unknown compression '{compression}'")
+        self._fp = self._stream or fp
+
+    def write(self, table, wid, digest, encoded):
+        """Write an entry, with `encoded` record data."""
+        if digest is None:
+            line = f'{{"table":"{table}","wid":{wid},"hash":null,' \
+                   f'"data":null}}\n'
+        else:
+            line = f'{{"table":"{table}","wid":{wid},"hash":"{digest}",' \
+                   f'"data":{encoded}}}\n'
+        self._fp.write(line.encode())
+
+    def close(self):
+        """Finish the snapshot, leaving the file open."""
+        if self._stream is not None:
+            self._stream.close()
+
+
+class ParquetWriter(object):
+    """Write snapshot entries as Parquet to a binary file.
+
+    Entries have the columns of NDJSON snapshots (see `NDJSONWriter`).
+    Record data is kept as JSON text, since its fields are nested and vary
+    by table. Entries are buffered into row groups of `ROW_GROUP_SIZE`.
+    """
+
+    def __init__(self, fp, compression="zstd"):
+        """Initialise a new writer."""
+        pyarrow = _pyarrow("Parquet output")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"unknown compression '{compression}'")
+        self._pyarrow = pyarrow
+        self._schema = pyarrow.schema([("table", pyarrow.string()),
+                                       ("wid", pyarrow.int64()),
+                                       ("hash", pyarrow.string()),
+                                       ("data", pyarrow.string())])
+        self._writer = pyarrow.parquet.ParquetWriter(
+            fp, self._schema, compression=compression
+        )
+        self._columns = {k: [] for k in SNAPSHOT_FIELDS}
+
+    def write(self, table, wid, digest, encoded):
+        """Write an entry, with `encoded` record data."""
+        for k, v in zip(SNAPSHOT_FIELDS, (table, wid, digest, encoded)):
+            self._columns[k].append(v)
+        if len(self._columns["wid"]) >= ROW_GROUP_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if not self._columns["wid"]:
+            return
+        batch = self._pyarrow.Table.from_pydict(self._columns,
+                                                schema=self._schema)
+        self._writer.write_table(batch)
+        self._columns = {k: [] for k in SNAPSHOT_FIELDS}
+
+    def close(self):
+        """Finish the snapshot, leaving the file open."""
+        self._flush()
+        self._writer.close()
+
+
+WRITERS = {"ndjson": NDJSONWriter, "parquet": ParquetWriter}
+
+
+def read_snapshot(fp):
+    """Read the entries of the snapshot in the open binary file `fp`.
+
+    The format and compression are detected from the content. Yields
+    `(table, wid, hash, data)` tuples, with `data` decoded, lazily so that
+    large snapshots need not fit in memory.
+    """
+    magic = fp.read(4)
+    fp.seek(0)
+    if magic == PARQUET_MAGIC:
+        pyarrow = _pyarrow("reading Parquet snapshots")
+        parquet = pyarrow.parquet.ParquetFile(fp)
+        for batch in parquet.iter_batches(batch_size=ROW_GROUP_SIZE):
+            for row in zip(*(batch.column(k).to_pylist()
+                             for k in SNAPSHOT_FIELDS)):
+                table, wid, digest, data = row
+                yield table, wid, digest, data and json.loads(data)
+        return
+    if magic.startswith(GZIP_MAGIC):
+        stream = gzip.GzipFile(fileobj=fp, mode="rb")
+    elif magic == ZSTD_MAGIC:
+        zstandard = _zstd("reading zstd snapshots")
+        stream = zstandard.ZstdDecompressor().stream_reader(fp,
+                                                            closefd=False)
+    else:
+        stream = fp
+    text = io.TextIOWrapper(stream, encoding="utf-8")
+    try:
+        for line in text:
+            if line.strip():
+                entry = json.loads(line)
+                yield tuple(entry[k] for k in SNAPSHOT_FIELDS)
+    finally:
+        # Leave `fp` open for the caller to close
+        text.detach()
+
+
+def snapshot_hashes(files):
+    """Get the content hashes of records in a chain of snapshots.
+
+    `files` are open binary files of a full snapshot followed by the delta
+    snapshots taken since, in order. Returns a dictionary mapping each
+    `(table, wid)` to the hash of the record's latest content.
+    """
+    hashes = {}
+    for fp in files:
+        for table, wid, digest, _ in read_snapshot(fp):
+            if digest is None:
+                hashes.pop((table, wid), None)
+            else:
+                hashes[(table, wid)] = digest
+    return hashes
+
+
+def write_snapshot(client, fp, format="ndjson", compression="gzip",
+                   tables=None, since=None, page_size=None):
+    """Write a snapshot of the registry visible to `client` to `fp`.
+
+    See `DnsGatewayClient.export`.
+    """
+    if format not in WRITERS:
+        raise ValueError(f"unknown snapshot format '{format}'")
+    writer = WRITERS[format](fp, compression=compression)
+    stats = {}
+    for table in tables or TABLES:
+        stats[table] = _write_table(client, writer, table, since, page_size)
+    writer.close()
+    return stats
+
+
+def _write_table(client, writer, table, since, page_size):
+    log.info(f"Exporting {table}")
+    query = client.query(table).page_size(page_size)
+    stats = dict.fromkeys(("written", "unchanged", "deleted"), 0)
+    seen = set()
+    for data in client._get_iter(path=f"{query.cls.base_path}/",
+                                 params=query.params or None):
+        for record in data["results"]:
+            wid = record["wid"]
+            encoded = canonical(record)
+            digest = content_hash(encoded)
+            if since is not None:
+                seen.add(wid)
+                if since.get((table, wid)) == digest:
+                    stats["unchanged"] += 1
+                    continue
+            writer.write(table, wid, digest, encoded)
+            stats["written"] += 1
+    if since is not None:
+        for key in since:
+            if key[0] == table and key[1] not in seen:
+                writer.write(table, key[1], None, None)
+                stats["deleted"] += 1
+    log.info(f"Exported {table}: {stats}")
+    return stats
@@ -20,7 +20,7 @@ log = logging.getLogger(__name__)
 
 def gen_authinfo(name, length=16):
     """Generate an authinfo code appropriate to the domain name."""
-    log.debug(f"Generating authinfo for domain {name}")
+    log.debug("Generating authinfo for domain %s", name)
     if name.endswith(".co.za"):
         authinfo = "coza"
     else:
@@ -32,3 +32,18 @@ def gen_authinfo(name, length=16):
                     and any(char in string.punctuation for char in authinfo)):
                 break
     return authinfo
+
+
+def load_yaml(fp):
+    """Load the YAML documents in the open file `fp`.
+
+    Returns an iterator over the documents, each loaded safely as it is
+    reached. Requires the optional PyYAML dependency.
+    """
+    try:
+        import yaml
+    except ImportError as e:
+        log.error(e)
+        raise RuntimeError("reading YAML requires 'PyYAML': install "
+                           "'py-dns-gateway[yaml]'") from e
+    return yaml.safe_load_all(fp)
@@ -0,0 +1,180 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway.journal module."""
+
+import collections
+import datetime
+import logging
+import sqlite3
+import threading
+import urllib.parse
+
+log = logging.getLogger(__name__)
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS operations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    method TEXT NOT NULL,
+    path TEXT NOT NULL,
+    name TEXT,
+    expiry TEXT,
+    state TEXT NOT NULL,
+    wid INTEGER,
+    error TEXT,
+    started TEXT NOT NULL,
+    finished TEXT
+);
+CREATE INDEX IF NOT EXISTS operations_key ON operations (method, path, name);
+CREATE INDEX IF NOT EXISTS operations_state ON operations (state);
+"""
+
+
+class Journal(object):
+    """Crash-safe journal of mutating requests.
+
+    A client with a journal records each mutating request in the SQLite
+    database at `path` before it is sent, as "pending", and again once its
+    outcome is known: "done" if it succeeded, or "failed" if the gateway
+    rejected it. Requests whose outcome is unknown, e.g. after a timeout
+    or a crash, stay pending until resolved by `reconcile()`.
+
+    Only the method, path and name (or contact id) of each request, and
+    the current expiry date sent with renewals, are recorded, never its
+    body, which may hold authorisation codes.
+    """
+
+    def __init__(self, path):
+        """Initialise a new journal instance."""
+        self.path = path
+        log.debug(f"Opening journal database {path}")
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=FULL")
+        self.db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        """Enter the journal context."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close the journal on exiting the context."""
+        self.close()
+
+    def close(self):
+        """Close the journal database."""
+        self.db.close()
+
+    @staticmethod
+    def key(method, url, data=None):
+        """Get the method, path and name identifying a request."""
+        path = urllib.parse.urlsplit(url).path
+        name = None
+        if isinstance(data, dict):
+            name = data.get("name", data.get("id"))
+        return method.upper(), path, name
+
+    def begin(self, method, url, data=None):
+        """Record a request about to be sent, returning its entry id."""
+        method, path, name = self.key(method, url, data)
+        expiry = data.get("curExpDate") if isinstance(data, dict) else None
+        with self._lock, self.db:
+            cursor = self.db.execute(
+                "INSERT INTO operations (method, path, name, expiry, state, "
+                "started) VALUES (?, ?, ?, ?, ?, ?)",
+                (method, path, name, expiry, PENDING, self._now())
+            )
+            return cursor.lastrowid
+
+    def finish(self, entry, state, wid=None, error=None):
+        """Record the outcome of the request journalled as `entry`."""
+        with self._lock, self.db:
+            self.db.execute("UPDATE operations SET state = ?, wid = ?, "
+                            "error = ?, finished = ? WHERE id = ?",
+                            (state, wid, error, self._now(), entry))
+
+    def state(self, method, url, data=None):
+        """Get the latest journal entry for a request, or `None`."""
+        with self._lock:
+            return self.db.execute(
+                "SELECT * FROM operations WHERE method = ? AND path = ? "
+                "AND name IS ? ORDER BY id DESC LIMIT 1",
+                self.key(method, url, data)
+            ).fetchone()
+
+    def pending(self):
+        """Get the entries of requests with unknown outcomes."""
+        with self._lock:
+            return self.db.execute("SELECT * FROM operations "
+                                   "WHERE state = ? ORDER BY id",
+                                   (PENDING,)).fetchall()
+
+    def reconcile(self, client):
+        """Resolve pending entries by looking up their effect.
+
+        Creates are looked up by name (or contact id) in their collection,
+        and deletes by fetching the deleted object. Renewals are done if the
+        domain's expiry date has moved on from the one sent with them.
+        Updates are idempotent, so are marked failed to be sent again.
+        Returns the number of entries resolved to each state.
+        """
+        counts = collections.Counter()
+        for entry in self.pending():
+            state, wid = self._resolve(client, entry)
+            log.info(f"Reconciled {entry['method']} {entry['path']} "
+                     f"{entry['name'] or ''}: {state}")
+            self.finish(entry["id"], state, wid=wid,
+                        error=None if state == DONE else "not applied")
+            counts[state] += 1
+        return counts
+
+    def _resolve(self, client, entry):
+        method, path, name = entry["method"], entry["path"], entry["name"]
+        url = urllib.parse.urljoin(client.endpoint, path)
+        if method == "POST" and path.endswith("/renew/"):
+            return self._resolve_renew(client, url, entry["expiry"])
+        if method == "POST" and name is not None:
+            field = "id" if path.rstrip("/").endswith("contacts") else "name"
+            data = client._get(path=url, params={field: name})
+            if data["count"]:
+                return DONE, data["results"][0].get("wid")
+            return FAILED, None
+        if method == "DELETE":
+            return self._resolve_delete(client, url)
+        return FAILED, None
+
+    @staticmethod
+    def _resolve_renew(client, url, expiry):
+        domain = client._get(path=url.rstrip("/").rsplit("/", 1)[0])
+        if expiry is not None and domain.get("curExpDate") != expiry:
+            return DONE, domain.get("wid")
+        return FAILED, None
+
+    @staticmethod
+    def _resolve_delete(client, url):
+        try:
+            client._get(path=url)
+        except Exception as e:
+            response = getattr(e, "response", None)
+            if response is not None and response.status_code == 404:
+                return DONE, None
+            raise
+        return FAILED, None
+
+    @staticmethod
+    def _now():
+        return datetime.datetime.now(datetime.timezone.utc).isoformat()
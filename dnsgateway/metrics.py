@@ -0,0 +1,279 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway.metrics module."""
+
+import bisect
+import collections
+import functools
+import logging
+import os
+import re
+import tempfile
+import threading
+import urllib.parse
+
+log = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                    10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_CONTENT_TYPE = \
+    "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+RequestEvent = collections.namedtuple("RequestEvent", (
+    "request_id", "method", "url", "path", "attempt", "status", "error",
+    "request_bytes", "response_bytes", "duration",
+))
+RequestEvent.__doc__ = """A single HTTP request attempt made by a client.
+
+`url` includes any query parameters, and `path` is its templated API path,
+e.g. "registry/domains/{wid}/". `attempt` counts from zero for each retry
+of the request identified by `request_id`. `status` is the response status
+code, or `None` if the request raised `error`. Sizes are in bytes, and
+`duration` is the time in seconds until the response headers arrived.
+"""
+
+_ID_SEGMENT = re.compile(r"^\d+$")
+
+
+@functools.lru_cache(maxsize=256)
+def path_template(url, endpoint=""):
+    """Get the API path of `url`, with object ids replaced by "{wid}"."""
+    path = urllib.parse.urlsplit(url).path
+    base = urllib.parse.urlsplit(endpoint).path.rstrip("/")
+    if base and path.startswith(f"{base}/"):
+        path = path[len(base) + 1:]
+    return "/".join("{wid}" if _ID_SEGMENT.match(segment) else segment
+                    for segment in path.lstrip("/").split("/"))
+
+
+def request_size(resp):
+    """Get the size of the body sent to get `resp`."""
+    request = getattr(resp, "request", None)
+    body = getattr(request, "body", None)
+    if body is None:
+        # httpx requests keep their body as `content`
+        body = getattr(request, "content", None)
+    return len(body) if isinstance(body, (bytes, str)) else 0
+
+
+def response_size(resp, stream=False):
+    """Get the size of the body of `resp`.
+
+    Streamed bodies are not read, so are only measured when the response
+    has a Content-Length.
+    """
+    try:
+        return int(resp.headers["Content-Length"])
+    except (KeyError, TypeError, ValueError):
+        pass
+    if stream:
+        return 0
+    content = getattr(resp, "content", None)
+    return len(content) if isinstance(content, bytes) else 0
+
+
+class MetricsSink(object):
+    """Receiver of client instrumentation.
+
+    Pass an instance as the `metrics` argument of a client to receive a
+    `RequestEvent` for each request attempt, and the templated path of
+    each collection page iterated over. Methods are called from the
+    threads making requests, so must be thread-safe, and should be cheap.
+    """
+
+    def record_request(self, event):
+        """Record a request attempt."""
+
+    def record_page(self, path):
+        """Record a collection page iterated over."""
+
+
+class MultiSink(MetricsSink):
+    """Metrics sink that forwards to each of `sinks`."""
+
+    def __init__(self, *sinks):
+        """Initialise a new sink instance."""
+        self.sinks = sinks
+
+    def record_request(self, event):
+        """Record a request attempt in each sink."""
+        for sink in self.sinks:
+            sink.record_request(event)
+
+    def record_page(self, path):
+        """Record a collection page in each sink."""
+        for sink in self.sinks:
+            sink.record_page(path)
+
+
+class Histogram(object):
+    """Cumulative histogram of observed values, as in Prometheus."""
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets):
+        """Initialise a new histogram."""
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        """Record an observed value."""
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """Get the count of values at most each bucket bound, and overall."""
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield _format_value(bound), total
+        yield "+Inf", self.count
+
+
+class PrometheusMetrics(MetricsSink):
+    """Metrics sink aggregating requests for Prometheus.
+
+    Keeps request counts by method, path and status (or "error" if no
+    response was received), histograms of request durations and response
+    sizes by method and path, the bytes sent, and page counts by path.
+    `render()` writes them in the Prometheus text or OpenMetrics format,
+    and `write()` to a file, e.g. for the node exporter textfile collector.
+    """
+
+    def __init__(self, namespace="dnsgateway",
+                 duration_buckets=DURATION_BUCKETS,
+                 size_buckets=SIZE_BUCKETS):
+        """Initialise a new metrics instance."""
+        self.namespace = namespace
+        self.duration_buckets = duration_buckets
+        self.size_buckets = size_buckets
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Discard all recorded metrics."""
+        with self._lock:
+            self.requests = collections.Counter()
+            self.request_bytes = collections.Counter()
+            self.pages = collections.Counter()
+            self.durations = {}
+            self.sizes = {}
+
+    def record_request(self, event):
+        """Record a request attempt."""
+        status = "error" if event.status is None else str(event.status)
+        key = (event.method, event.path)
+        with self._lock:
+            self.requests[key + (status,)] += 1
+            self.request_bytes[key] += event.request_bytes
+            try:
+                duration, size = self.durations[key], self.sizes[key]
+            except KeyError:
+                duration = self.durations[key] = \
+                    Histogram(self.duration_buckets)
+                size = self.sizes[key] = Histogram(self.size_buckets)
+            duration.observe(event.duration)
+            if event.status is not None:
+                size.observe(event.response_bytes)
+
+    def record_page(self, path):
+        """Record a collection page iterated over."""
+        with self._lock:
+            self.pages[path] += 1
+
+    def render(self, openmetrics=False):
+        """Get the metrics in the Prometheus text exposition format.
+
+        If `openmetrics` is set, the OpenMetrics format is used instead.
+        """
+        ns = self.namespace
+        lines = []
+
+        def family(name, type, help, samples):
+            lines.append(f"# HELP {ns}_{name} {help}")
+            lines.append(f"# TYPE {ns}_{name} {type}")
+            lines.extend(samples)
+
+        def counter(name, help, counts, labels):
+            # OpenMetrics names counter families without the suffix
+            family(name if openmetrics else f"{name}_total", "counter", help,
+                   (f"{ns}_{name}_total{_labels(zip(labels, key))} {value}"
+                    for key, value in sorted(counts.items())))
+
+        def histogram(name, help, histograms):
+            samples = []
+            for (method, path), hist in sorted(histograms.items()):
+                labels = (("method", method), ("path", path))
+                for le, count in hist.cumulative():
+                    samples.append(f"{ns}_{name}_bucket"
+                                   f"{_labels(labels + (('le', le),))} "
+                                   f"{count}")
+                samples.append(f"{ns}_{name}_sum{_labels(labels)} "
+                               f"{_format_value(hist.sum)}")
+                samples.append(f"{ns}_{name}_count{_labels(labels)} "
+                               f"{hist.count}")
+            family(name, "histogram", help, samples)
+
+        with self._lock:
+            counter("requests", "HTTP requests made, by response status.",
+                    self.requests, ("method", "path", "status"))
+            histogram("request_duration_seconds",
+                      "Time until HTTP response headers were received.",
+                      self.durations)
+            histogram("response_size_bytes", "Size of HTTP response bodies.",
+                      self.sizes)
+            counter("request_bytes", "Bytes sent in HTTP request bodies.",
+                    self.request_bytes, ("method", "path"))
+            counter("pages", "Collection pages iterated over.",
+                    {(path,): n for path, n in self.pages.items()},
+                    ("path",))
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, openmetrics=False):
+        """Atomically write the rendered metrics to the file at `path`."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self.render(openmetrics=openmetrics))
+            os.replace(tmp, path)
+        except Exception as e:
+            os.unlink(tmp)
+            log.error(e)
+            raise e
+        log.debug(f"Wrote metrics to {path}")
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return f"{value:.1f}"
+    return str(value)
+
+
+def _labels(pairs):
+    escaped = (f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace("\n", r"\n") \
+        .replace('"', r'\"')
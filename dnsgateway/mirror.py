@@ -0,0 +1,291 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway.mirror module."""
+
+import datetime
+import json
+import logging
+import sqlite3
+
+from dnsgateway.contact import Contact
+from dnsgateway.domain import Domain
+from dnsgateway.export import canonical, content_hash
+from dnsgateway.query import utc
+from dnsgateway.zone import Zone
+
+log = logging.getLogger(__name__)
+
+CONTACT_TYPES = ("registrant", "admin", "tech", "billing")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS zones (
+    wid INTEGER PRIMARY KEY,
+    zone TEXT,
+    fingerprint TEXT NOT NULL,
+    synced TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS zones_zone ON zones (zone);
+CREATE TABLE IF NOT EXISTS contacts (
+    wid INTEGER PRIMARY KEY,
+    id TEXT,
+    email TEXT,
+    fingerprint TEXT NOT NULL,
+    synced TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS contacts_id ON contacts (id);
+CREATE TABLE IF NOT EXISTS domains (
+    wid INTEGER PRIMARY KEY,
+    name TEXT,
+    zone TEXT,
+    expiry TEXT,
+    registrant TEXT,
+    admin TEXT,
+    tech TEXT,
+    billing TEXT,
+    fingerprint TEXT NOT NULL,
+    synced TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS domains_name ON domains (name);
+CREATE INDEX IF NOT EXISTS domains_zone ON domains (zone);
+CREATE INDEX IF NOT EXISTS domains_expiry ON domains (expiry);
+CREATE INDEX IF NOT EXISTS domains_registrant ON domains (registrant);
+CREATE INDEX IF NOT EXISTS domains_admin ON domains (admin);
+CREATE INDEX IF NOT EXISTS domains_tech ON domains (tech);
+CREATE INDEX IF NOT EXISTS domains_billing ON domains (billing);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+DOMAIN_COLUMNS = ("name", "zone", "expiry") + CONTACT_TYPES
+
+
+def timestamp(value):
+    """Get the text of a date or time `value` as stored in the mirror.
+
+    Times are normalised to UTC, with a fixed precision, so that stored
+    expiry dates sort and compare correctly as text.
+    """
+    if value is None:
+        return None
+    return utc(value).isoformat(timespec="microseconds")
+
+
+def fingerprint(record):
+    """Get a digest identifying the version of a record.
+
+    Hashes the canonical encoding of the whole record as listed (see
+    `dnsgateway.export.canonical`), so that a change to any listed field,
+    or to the event history where a listing carries it, is picked up.
+    """
+    return content_hash(canonical(record))
+
+
+def contact_handle(value):
+    """Get a contact handle from a domain contact field."""
+    if isinstance(value, dict):
+        value = value.get("id", value.get("contact"))
+        if isinstance(value, dict):
+            value = value.get("id")
+    return None if value is None else str(value)
+
+
+def domain_contacts(record):
+    """Get the contact handles of a domain, by contact type."""
+    handles = {t: contact_handle(record.get(t)) for t in CONTACT_TYPES}
+    for item in record.get("contacts") or ():
+        if item.get("type") in handles and handles[item["type"]] is None:
+            handles[item["type"]] = contact_handle(item.get("contact"))
+    return handles
+
+
+class Mirror(object):
+    """Local SQLite mirror of the registry.
+
+    Keeps a copy of the domains, contacts and zones visible to `client`
+    in the database at `path`, with indexes on the fields commonly queried
+    in reports. `sync()` refreshes the mirror incrementally.
+    """
+
+    tables = {"zones": Zone, "contacts": Contact, "domains": Domain}
+
+    def __init__(self, path, client=None):
+        """Initialise a new mirror instance."""
+        self.path = path
+        self.client = client
+        log.debug(f"Opening mirror database {path}")
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        """Enter the mirror context."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close the mirror on exiting the context."""
+        self.close()
+
+    def close(self):
+        """Close the mirror database."""
+        self.db.close()
+
+    def _columns(self, table, record):
+        if table == "zones":
+            return {"zone": record.get("zone")}
+        if table == "contacts":
+            return {"id": record.get("id"), "email": record.get("email")}
+        columns = {"name": record.get("name"), "zone": record.get("zone"),
+                   "expiry": timestamp(record.get("curExpDate",
+                                                  record.get("expiry")))}
+        columns.update(domain_contacts(record))
+        return columns
+
+    def sync(self, tables=None, detail=False):
+        """Synchronise the mirror with the registry.
+
+        Walks each collection in `tables` (by default all of them) once.
+        Records whose fingerprint is unchanged are skipped; others are
+        written, fetching their full details first if `detail` is set.
+        Records no longer listed are removed.
+
+        Returns a dictionary of counts of added, updated, unchanged and
+        deleted records by table.
+        """
+        if self.client is None:
+            raise RuntimeError("mirror has no client to sync from")
+        stats = {}
+        for table in tables or self.tables:
+            stats[table] = self._sync_table(table, detail=detail)
+        self.set_meta("synced", self._now())
+        return stats
+
+    def _sync_table(self, table, detail=False):
+        log.info(f"Synchronising {table}")
+        known = {row["wid"]: row["fingerprint"] for row in
+                 self.db.execute(f"SELECT wid, fingerprint FROM {table}")}
+        stats = dict.fromkeys(("added", "updated", "unchanged", "deleted"), 0)
+        synced = self._now()
+        seen = set()
+        listed = set()
+        with self.db:
+            for obj in getattr(self.client, table):
+                record = obj._properties
+                wid = record["wid"]
+                seen.add(wid)
+                listed.update(record)
+                digest = fingerprint(record)
+                if known.get(wid) == digest:
+                    stats["unchanged"] += 1
+                    continue
+                if detail:
+                    record = obj.refresh()._properties
+                self._write(table, record, digest, synced)
+                stats["updated" if wid in known else "added"] += 1
+            deleted = [(wid,) for wid in known if wid not in seen]
+            self.db.executemany(f"DELETE FROM {table} WHERE wid = ?", deleted)
+            stats["deleted"] = len(deleted)
+        if listed:
+            self.set_meta(f"listed:{table}", json.dumps(sorted(listed)))
+        log.info(f"Synchronised {table}: {stats}")
+        return stats
+
+    def _write(self, table, record, digest, synced):
+        columns = self._columns(table, record)
+        columns.update(wid=record["wid"], fingerprint=digest, synced=synced,
+                       data=json.dumps(record, default=str))
+        names = ", ".join(columns)
+        placeholders = ", ".join("?" for _ in columns)
+        self.db.execute(f"INSERT OR REPLACE INTO {table} ({names}) "
+                        f"VALUES ({placeholders})", tuple(columns.values()))
+
+    def store(self, table, records):
+        """Write records fetched outside of a sync to the mirror.
+
+        Records are fingerprinted on the fields listed by the last sync of
+        `table`, as if listed, so that the next sync skips them if they are
+        unchanged. Before any sync, the fields listed aren't known, and
+        records are fingerprinted without their detail properties.
+        """
+        listed = self.get_meta(f"listed:{table}")
+        if listed is None:
+            keys = set(self.tables[table]._keys) - \
+                set(self.tables[table]._detail_keys)
+        else:
+            keys = set(json.loads(listed))
+        synced = self._now()
+        with self.db:
+            for record in records:
+                digest = fingerprint({k: v for k, v in record.items()
+                                      if k in keys})
+                self._write(table, record, digest, synced)
+
+    def forget(self, table, wids):
+        """Remove records from the mirror, to be fetched by the next sync."""
+        if table not in self.tables:
+            raise ValueError(f"unknown table '{table}'")
+        with self.db:
+            self.db.executemany(f"DELETE FROM {table} WHERE wid = ?",
+                                [(wid,) for wid in wids])
+
+    def query(self, table, where=None, params=(), order_by=None):
+        """Query the mirror, returning objects.
+
+        `where` and `order_by` are SQL fragments over the indexed columns
+        of `table`, with `params` bound to `where`.
+        """
+        if table not in self.tables:
+            raise ValueError(f"unknown table '{table}'")
+        cls = self.tables[table]
+        sql = f"SELECT data FROM {table}"
+        if where:
+            sql += f" WHERE {where}"
+        if order_by:
+            sql += f" ORDER BY {order_by}"
+        for row in self.db.execute(sql, params):
+            yield cls(client=self.client, **json.loads(row["data"]))
+
+    def domains(self, **filters):
+        """Get mirrored domains matching the indexed column `filters`."""
+        for k in filters:
+            if k not in DOMAIN_COLUMNS:
+                raise ValueError(f"cannot filter domains by '{k}'")
+        where = " AND ".join(f"{k} = ?" for k in filters)
+        return self.query("domains", where=where,
+                          params=tuple(filters.values()), order_by="name")
+
+    def count(self, table):
+        """Get the number of mirrored records in `table`."""
+        if table not in self.tables:
+            raise ValueError(f"unknown table '{table}'")
+        return self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def get_meta(self, key, default=None):
+        """Get a mirror metadata value."""
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?",
+                              (key,)).fetchone()
+        return default if row is None else row["value"]
+
+    def set_meta(self, key, value):
+        """Set a mirror metadata value."""
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) "
+                            "VALUES (?, ?)", (key, value))
+
+    @staticmethod
+    def _now():
+        return datetime.datetime.now(datetime.timezone.utc).isoformat()
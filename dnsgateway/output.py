@@ -0,0 +1,150 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway.output module."""
+
+import csv
+import io
+import json
+import logging
+
+log = logging.getLogger(__name__)
+
+FORMATS = ("pretty", "ndjson", "json", "csv", "table")
+
+
+def json_encoder():
+    """Get a compact JSON encoding function.
+
+    Uses `orjson` if it is installed, falling back to the standard library.
+    """
+    try:
+        import orjson
+    except ImportError:
+        log.debug("orjson not available: using json")
+        return json.JSONEncoder(separators=(",", ":"), default=str).encode
+
+    def encode(value):
+        return orjson.dumps(value, default=str).decode()
+    return encode
+
+
+def parse_fields(fields):
+    """Parse a comma separated list of field names."""
+    if not fields:
+        return None
+    return tuple(f.strip() for f in fields.split(",") if f.strip())
+
+
+def project(obj, fields=None):
+    """Get the properties of `obj` selected by `fields`, as a dictionary.
+
+    Only the selected properties are read, and missing ones are `None`.
+    Properties are read without triggering the hydration of lazy objects.
+    """
+    if fields is None:
+        return obj._properties
+    record = {}
+    for field in fields:
+        try:
+            record[field] = object.__getattribute__(obj, field)
+        except AttributeError:
+            record[field] = None
+    return record
+
+
+class RecordWriter(object):
+    """Serialise pages of objects for output.
+
+    `write()` takes an iterable of pages, each an iterable of objects, and
+    yields a chunk of text for each page as soon as it has been serialised,
+    so that output can be flushed page by page. `fields` selects the
+    properties written, and should be given for "csv" and "table" output:
+    otherwise the properties of the first object are used. "table" output
+    must see every record to align its columns, so it is written at the
+    end. "pretty" output is the indented JSON representation of objects.
+    """
+
+    def __init__(self, format="ndjson", fields=None):
+        """Initialise a new writer."""
+        if format not in FORMATS:
+            raise ValueError(f"unknown output format '{format}'")
+        self.format = format
+        self.fields = fields
+        self._encode = json_encoder()
+
+    def write(self, pages):
+        """Serialise `pages`, yielding a chunk of text for each page."""
+        write_page = getattr(self, f"_{self.format}")
+        if self.format == "json":
+            yield "["
+        first = True
+        rows = []
+        for page in pages:
+            chunk = write_page(page, first, rows)
+            first = first and not chunk
+            if chunk:
+                yield chunk
+        if self.format == "json":
+            yield "]\n" if first else "\n]\n"
+        elif self.format == "table":
+            yield self._table_text(rows)
+
+    def _cell(self, value):
+        if value is None:
+            return ""
+        if isinstance(value, (dict, list)):
+            return self._encode(value)
+        return str(value)
+
+    def _pretty(self, page, first, rows):
+        return "".join(f"{obj}\n" for obj in page)
+
+    def _ndjson(self, page, first, rows):
+        return "".join(self._encode(project(obj, self.fields)) + "\n"
+                       for obj in page)
+
+    def _json(self, page, first, rows):
+        records = [self._encode(project(obj, self.fields)) for obj in page]
+        if not records:
+            return ""
+        return ("\n" if first else ",\n") + ",\n".join(records)
+
+    def _csv(self, page, first, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        for obj in page:
+            record = project(obj, self.fields)
+            if self.fields is None:
+                self.fields = tuple(record)
+            if first:
+                writer.writerow(self.fields)
+                first = False
+            writer.writerow([self._cell(record.get(f)) for f in self.fields])
+        return buffer.getvalue()
+
+    def _table(self, page, first, rows):
+        for obj in page:
+            record = project(obj, self.fields)
+            if self.fields is None:
+                self.fields = tuple(record)
+            rows.append([self._cell(record.get(f)) for f in self.fields])
+        return ""
+
+    def _table_text(self, rows):
+        if self.fields is None:
+            return ""
+        header = [f.upper() for f in self.fields]
+        widths = [max(len(cell) for cell in column)
+                  for column in zip(header, *rows)]
+        return "".join("  ".join(cell.ljust(width) for cell, width
+                                 in zip(row, widths)).rstrip() + "\n"
+                       for row in [header] + rows)
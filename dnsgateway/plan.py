@@ -0,0 +1,471 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway.plan module."""
+
+import collections
+import concurrent.futures
+import json
+import logging
+import os
+
+from dnsgateway.bulk import (BULK_WORKERS, CREATED, ChargeCeiling, FAILED,
+                             SKIPPED, domain_row)
+from dnsgateway.contact import Contact
+from dnsgateway.domain import Domain
+from dnsgateway.helpers import load_yaml
+from dnsgateway.mirror import CONTACT_TYPES, domain_contacts
+
+log = logging.getLogger(__name__)
+
+FORMATS = ("json", "yaml")
+EXTENSIONS = {".json": "json", ".yaml": "yaml", ".yml": "yaml"}
+
+CONTACT = "contact"
+DOMAIN = "domain"
+
+CREATE = "create"
+UPDATE = "update"
+DELETE = "delete"
+
+UPDATED = "updated"
+DELETED = "deleted"
+
+CONTACT_FIELDS = ("id", "name", "org", "email", "phone", "fax", "address1",
+                  "address2", "address3", "city", "province", "code",
+                  "country")
+ADDRESS_FIELDS = ("name", "org", "address1", "address2", "address3", "city",
+                  "province", "code", "country")
+# Contact fields carried by list results, as well as by details
+LISTED_CONTACT_FIELDS = ("name", "email", "phone", "fax")
+DOMAIN_DETAIL_FIELDS = ("hosts",) + CONTACT_TYPES
+
+# Changes are applied in phases, so that contacts exist before the domains
+# referencing them are created or updated, and outlive them when deleted.
+PHASES = ((CONTACT, (CREATE, UPDATE)), (DOMAIN, (CREATE, UPDATE)),
+          (DOMAIN, (DELETE,)), (CONTACT, (DELETE,)))
+
+SYMBOLS = {CREATE: "+", UPDATE: "~", DELETE: "-"}
+
+State = collections.namedtuple("State", ("contacts", "domains"))
+
+Change = collections.namedtuple("Change", ("action", "kind", "key", "wid",
+                                           "changes", "data"))
+
+
+def guess_format(filename):
+    """Guess the format of a state file from its name."""
+    ext = os.path.splitext(filename or "")[1].lower()
+    try:
+        return EXTENSIONS[ext]
+    except KeyError:
+        raise ValueError(f"cannot guess format of '{filename}': "
+                         f"specify one of {', '.join(FORMATS)}")
+
+
+def load_state(fp, format):
+    """Load the desired state from the open file `fp`.
+
+    The state is a mapping with a list of "contacts", each a mapping of
+    `create_contact` arguments, and a list of "domains", each a mapping of
+    `create_domain` arguments (see `domain_row`). Fields left out of an
+    entry are not managed. YAML files require the optional PyYAML
+    dependency.
+    """
+    if format == "json":
+        document = json.load(fp)
+    elif format == "yaml":
+        documents = list(load_yaml(fp))
+        if len(documents) > 1:
+            raise ValueError("state must be a single YAML document")
+        document = documents[0] if documents else None
+    else:
+        raise ValueError(f"unknown state format '{format}'")
+    if document is None:
+        document = {}
+    if not isinstance(document, dict):
+        raise ValueError("state must be a mapping of 'contacts' and "
+                         "'domains'")
+    unknown = set(document) - {"contacts", "domains"}
+    if unknown:
+        raise ValueError(f"unknown state sections: "
+                         f"{', '.join(sorted(unknown))}")
+    contacts = _index((contact_state(e) for e in
+                       document.get("contacts") or ()), "id", "contact")
+    domains = _index((domain_row(e) for e in
+                      document.get("domains") or ()), "name", "domain")
+    return State(contacts=contacts, domains=domains)
+
+
+def _index(entries, key, kind):
+    index = collections.OrderedDict()
+    for entry in entries:
+        if entry[key] in index:
+            raise ValueError(f"duplicate {kind} '{entry[key]}'")
+        index[entry[key]] = entry
+    return index
+
+
+def contact_state(entry):
+    """Normalise a contact entry of a state file.
+
+    Values are converted to text, as the registry stores them.
+    """
+    unknown = set(entry) - set(CONTACT_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+    values = {k: str(v) for k, v in entry.items() if v not in (None, "")}
+    if not values.get("id"):
+        raise ValueError("contact has no id")
+    return values
+
+
+def host_name(host):
+    """Get the host name of a domain host entry."""
+    if isinstance(host, dict):
+        host = host.get("hostname")
+    return str(host)
+
+
+def _host_set(hosts):
+    return {host_name(h).lower().rstrip(".") for h in hosts}
+
+
+def domain_diff(desired, current):
+    """Get the changes to `current` domain properties reaching `desired`.
+
+    Only the fields present in `desired` are compared. Returns a mapping of
+    changed fields to their current and desired values, and the data of the
+    update making the changes. Hosts are compared without regard to order
+    or case. A change to any contact replaces the domain's contact list.
+    """
+    changes, data = {}, {}
+    if "autorenew" in desired:
+        autorenew = bool(current.get("autorenew"))
+        if autorenew != bool(desired["autorenew"]):
+            changes["autorenew"] = (autorenew, bool(desired["autorenew"]))
+            data["autorenew"] = bool(desired["autorenew"])
+    if "hosts" in desired:
+        hosts = [host_name(h) for h in current.get("hosts") or ()]
+        if _host_set(hosts) != _host_set(desired["hosts"]):
+            changes["hosts"] = (hosts, list(desired["hosts"]))
+            data["hosts"] = [{"hostname": h} for h in desired["hosts"]]
+    handles = domain_contacts(current)
+    for t in CONTACT_TYPES:
+        if t in desired and handles[t] != str(desired[t]):
+            changes[t] = (handles[t], str(desired[t]))
+            handles[t] = str(desired[t])
+    if any(t in changes for t in CONTACT_TYPES):
+        data["contacts"] = [{"type": t, "contact": {"id": handles[t]}}
+                            for t in CONTACT_TYPES if handles[t] is not None]
+    return changes, data
+
+
+def _contact_values(current):
+    addresses = current.get("contact_address") or ()
+    address = addresses[0] if addresses else {}
+    values = {k: current.get(k) for k in ("email", "phone", "fax")}
+    for k in ADDRESS_FIELDS:
+        values[k] = address.get("real_name" if k == "name" else k)
+    if not addresses:
+        values["name"] = current.get("name")
+    return {k: None if v is None else str(v) for k, v in values.items()}
+
+
+def contact_diff(desired, current):
+    """Get the changes to `current` contact properties reaching `desired`.
+
+    See `domain_diff`. A change to any address field updates every address
+    of the contact, keeping the fields not declared.
+    """
+    values = _contact_values(current)
+    changes = {k: (values[k], v) for k, v in desired.items()
+               if k != "id" and values[k] != v}
+    data = {k: changes[k][1] for k in ("email", "phone", "fax")
+            if k in changes}
+    address = {"real_name" if k == "name" else k: changes[k][1]
+               for k in ADDRESS_FIELDS if k in changes}
+    if address:
+        addresses = current.get("contact_address") or \
+            [{"type": t} for t in ("loc", "int")]
+        data["contact_address"] = [dict(a, **address) for a in addresses]
+    return changes, data
+
+
+class Plan(object):
+    """Changes reconciling the registry with a desired state.
+
+    Holds a `Change` for each contact and domain to be created, updated or
+    deleted, with a mapping of the changed fields to their current and
+    desired values, and the data sent to make the change. `unchanged`
+    counts the declared objects needing no change.
+    """
+
+    def __init__(self, changes=(), unchanged=0):
+        """Initialise a new plan instance."""
+        self.changes = list(changes)
+        self.unchanged = unchanged
+
+    def __iter__(self):
+        """Iterate over the changes."""
+        return iter(self.changes)
+
+    def __len__(self):
+        """Get the number of changes."""
+        return len(self.changes)
+
+    def phases(self):
+        """Get the changes in the order they must be applied, by phase."""
+        return [[c for c in self.changes
+                 if c.kind == kind and c.action in actions]
+                for kind, actions in PHASES]
+
+    def counts(self):
+        """Get the number of changes by action."""
+        counts = collections.Counter(dict.fromkeys((CREATE, UPDATE, DELETE),
+                                                   0))
+        counts.update(c.action for c in self.changes)
+        return counts
+
+    def describe(self):
+        """Get lines describing the changes, in the order applied."""
+        for phase in self.phases():
+            for change in phase:
+                yield f"{SYMBOLS[change.action]} {change.kind} {change.key}"
+                for field, (old, new) in change.changes.items():
+                    if change.action == CREATE:
+                        yield f"    {field}: {json.dumps(new)}"
+                    else:
+                        yield f"    {field}: {json.dumps(old)} -> " \
+                              f"{json.dumps(new)}"
+
+    def summary(self):
+        """Get a one-line summary of the plan."""
+        counts = self.counts()
+        return f"Plan: {counts[CREATE]} to create, {counts[UPDATE]} to " \
+               f"update, {counts[DELETE]} to delete, {self.unchanged} " \
+               f"unchanged."
+
+
+class Planner(object):
+    """Plan and apply the changes reconciling the registry with a state.
+
+    The current state is read in a single pass over the contacts and
+    domains listed by `client`, `page_size` records at a time. List results
+    carry summary fields only, so the details of objects whose declared
+    hosts, contacts or addresses must be compared are fetched by `workers`
+    concurrent threads.
+
+    Given a `Mirror`, the current state is read from it instead, once
+    synchronised with details. Details are then only fetched for records
+    whose listing changed since the last sync, so that planning an
+    unchanged portfolio costs a listing pass. Changes made elsewhere only
+    to properties missing from listings go unnoticed until then: records
+    to be updated are fetched again before their changes are planned, so
+    that such changes are not overwritten. Records changed by `apply()`
+    are dropped from the mirror, to be fetched again by the next sync.
+    """
+
+    def __init__(self, client, mirror=None, workers=BULK_WORKERS,
+                 page_size=None):
+        """Initialise a new planner instance."""
+        self.client = client
+        self.mirror = mirror
+        self.workers = workers
+        self.page_size = page_size
+
+    def plan(self, state, prune=False):
+        """Get the `Plan` reconciling the registry with `state`.
+
+        Declared objects missing from the registry are created, and those
+        differing from their declaration are updated. If `prune` is set,
+        registered objects missing from `state` are deleted, except for
+        contacts that declared domains still reference.
+        """
+        if self.mirror is not None:
+            self.mirror.sync(tables=("contacts", "domains"), detail=True)
+        contacts = self._current("contacts", "id")
+        domains = self._current("domains", "name")
+        self._fetch_details(Contact, contacts, state.contacts,
+                            set(ADDRESS_FIELDS) - set(LISTED_CONTACT_FIELDS))
+        self._fetch_details(Domain, domains, state.domains,
+                            DOMAIN_DETAIL_FIELDS)
+        changes, unchanged = self._diff(state, contacts, domains, prune)
+        updates = [c for c in changes if c.action == UPDATE]
+        if self.mirror is not None and updates:
+            # Mirrored details may predate changes made elsewhere
+            for kind, cls, records in ((CONTACT, Contact, contacts),
+                                       (DOMAIN, Domain, domains)):
+                self._fetch(cls, records,
+                            [c.key for c in updates if c.kind == kind])
+            changes, unchanged = self._diff(state, contacts, domains, prune)
+        plan = Plan(changes, unchanged=unchanged)
+        log.info(plan.summary())
+        return plan
+
+    def _diff(self, state, contacts, domains, prune):
+        """Get the changes from the current records to `state`.
+
+        Returns the changes and the number of declared objects unchanged.
+        """
+        changes, unchanged = [], 0
+        # Contacts the declared domains will reference cannot be deleted
+        referenced = self._referenced(state, domains)
+        for kind, desired, current, diff, kept in (
+                (CONTACT, state.contacts, contacts, contact_diff, referenced),
+                (DOMAIN, state.domains, domains, domain_diff, ())):
+            for key, values in desired.items():
+                if key not in current:
+                    changes.append(Change(CREATE, kind, key, None,
+                                          self._created(kind, values),
+                                          values))
+                    continue
+                fields, data = diff(values, current[key])
+                if data:
+                    changes.append(Change(UPDATE, kind, key,
+                                          current[key]["wid"], fields, data))
+                else:
+                    unchanged += 1
+            if prune:
+                changes.extend(Change(DELETE, kind, key, record["wid"], {},
+                                      None)
+                               for key, record in current.items()
+                               if key not in desired and key not in kept)
+        return changes, unchanged
+
+    @staticmethod
+    def _referenced(state, domains):
+        """Get the handles of contacts referenced by declared domains."""
+        handles = set()
+        for name, values in state.domains.items():
+            current = domain_contacts(domains.get(name, {}))
+            handles.update(str(values[t]) if t in values else current[t]
+                           for t in CONTACT_TYPES)
+        return handles
+
+    @staticmethod
+    def _created(kind, values):
+        key = "id" if kind == CONTACT else "name"
+        return {k: (None, v) for k, v in values.items() if k != key}
+
+    def _current(self, table, key):
+        if self.mirror is not None:
+            objects = self.mirror.query(table)
+        else:
+            objects = getattr(self.client, table).page_size(self.page_size)
+        records = {}
+        for obj in objects:
+            record = obj._properties
+            records[record[key]] = record
+        log.debug(f"Read {len(records)} current {table}")
+        return records
+
+    def _fetch_details(self, cls, records, desired, fields):
+        """Fetch the details of `records` whose declared `fields` need them."""
+        keys = [k for k, v in desired.items() if k in records and
+                not cls._is_detailed(records[k]) and
+                any(f in v for f in fields)]
+        self._fetch(cls, records, keys)
+
+    def _fetch(self, cls, records, keys):
+        """Fetch the details of the `records` with `keys` concurrently."""
+        if not keys:
+            return
+        log.info(f"Fetching details of {len(keys)} {cls.__name__.lower()}s")
+        get = self.client.deadlines.bind(self.client._get)
+        paths = [f"{cls.base_path}/{records[k]['wid']}" for k in keys]
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.workers) as pool:
+            for key, data in zip(keys, pool.map(lambda p: get(path=p),
+                                                paths)):
+                records[key] = data
+
+    def apply(self, plan, ceiling=None):
+        """Apply `plan`, making its changes concurrently.
+
+        The changes of each phase (see `Plan.phases`) are made by a pool of
+        `workers` threads, and each phase completes before the next starts.
+        Changes to domains referencing contacts that failed to be created or
+        updated are "skipped". Domains are created as by `create_domains`,
+        with each charge accepted by `ceiling`.
+
+        Yields a result dictionary for each change as it completes, with
+        its `action`, `kind`, `key`, `status` (one of "created", "updated",
+        "deleted", "skipped", or a `create_domains` status), and the `wid`
+        of the object or the `error` that prevented the change.
+        """
+        if ceiling is None:
+            ceiling = ChargeCeiling()
+        failed = set()
+        apply_change = self.client.deadlines.bind(self._apply_change)
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.workers) as pool:
+            for phase in plan.phases():
+                pending = set()
+                for change in phase:
+                    blocked = self._blocked(change, failed)
+                    if blocked:
+                        yield self._result(change, SKIPPED, error=f"contact "
+                                           f"'{blocked}' was not applied")
+                    else:
+                        pending.add(pool.submit(apply_change, change,
+                                                ceiling))
+                for future in concurrent.futures.as_completed(pending):
+                    result = future.result()
+                    if result["kind"] == CONTACT and \
+                            result["status"] == FAILED:
+                        failed.add(result["key"])
+                    self._forget(result)
+                    yield result
+
+    @staticmethod
+    def _blocked(change, failed):
+        if change.kind != DOMAIN or change.action == DELETE:
+            return None
+        handles = domain_contacts(change.data).values()
+        return next((h for h in handles if h in failed), None)
+
+    @staticmethod
+    def _result(change, status, **kwargs):
+        result = {"action": change.action, "kind": change.kind,
+                  "key": change.key, "status": status, "wid": change.wid}
+        result.update(kwargs)
+        return result
+
+    def _apply_change(self, change, ceiling):
+        """Make a single change."""
+        cls = self.client.contact_class if change.kind == CONTACT \
+            else self.client.domain_class
+        try:
+            if change.action == CREATE and change.kind == DOMAIN:
+                result = self.client.create_domain_row(change.data, ceiling)
+                result.pop("row")
+                result.pop("name")
+                return self._result(change, **result)
+            if change.action == CREATE:
+                contact = self.client.create_contact(**change.data)
+                return self._result(change, CREATED, wid=contact.wid)
+            obj = cls(client=self.client, wid=change.wid)
+            if change.action == UPDATE:
+                obj.update(**change.data)
+                return self._result(change, UPDATED)
+            obj.delete()
+            return self._result(change, DELETED)
+        except Exception as e:
+            log.error(f"Failed to {change.action} {change.kind} "
+                      f"{change.key}: {e}")
+            return self._result(change, FAILED, error=str(e))
+
+    def _forget(self, result):
+        if self.mirror is None or result["wid"] is None or \
+                result["status"] not in (UPDATED, DELETED):
+            return
+        self.mirror.forget(f"{result['kind']}s", [result["wid"]])
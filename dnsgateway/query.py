@@ -0,0 +1,287 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway.query module."""
+
+import datetime
+import logging
+import operator
+
+log = logging.getLogger(__name__)
+
+
+def _contains(value, arg):
+    return arg in value
+
+
+def _icontains(value, arg):
+    return str(arg).lower() in str(value).lower()
+
+
+def _in(value, arg):
+    return value in arg
+
+
+def _startswith(value, arg):
+    return str(value).startswith(arg)
+
+
+def _endswith(value, arg):
+    return str(value).endswith(arg)
+
+
+def _isnull(value, arg):
+    return (value is None) == bool(arg)
+
+
+LOOKUPS = {"exact": operator.eq, "ne": operator.ne,
+           "lt": operator.lt, "lte": operator.le,
+           "gt": operator.gt, "gte": operator.ge,
+           "in": _in, "contains": _contains, "icontains": _icontains,
+           "startswith": _startswith, "endswith": _endswith,
+           "isnull": _isnull}
+
+
+def parse_filter(key):
+    """Split a filter keyword into its field and lookup."""
+    field, _, lookup = key.partition("__")
+    lookup = lookup or "exact"
+    if lookup not in LOOKUPS:
+        err = ValueError(f"unknown lookup '{lookup}' in filter '{key}'")
+        log.error(err)
+        raise err
+    return field, lookup
+
+
+def parse_filter_option(text):
+    """Parse a "field[__lookup]=value" filter given as text.
+
+    Returns the filter keyword and its argument: "in" lookups take comma
+    separated values, and "isnull" lookups a boolean.
+    """
+    key, sep, arg = text.partition("=")
+    if not sep or not key:
+        err = ValueError(f"filter '{text}' is not of the form field=value")
+        log.error(err)
+        raise err
+    key = key.strip()
+    _, lookup = parse_filter(key)
+    if lookup == "in":
+        return key, [v.strip() for v in arg.split(",")]
+    if lookup == "isnull":
+        return key, _truthy(arg)
+    return key, arg
+
+
+def _truthy(text):
+    return text.strip().lower() in ("1", "true", "yes", "y")
+
+
+def utc(value):
+    """Get a date or time `value` as an aware datetime in UTC.
+
+    `value` is a `date`, a `datetime` or an ISO 8601 string, as in the API.
+    Naive values are taken to be in UTC, and dates to be at midnight.
+    """
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc)
+
+
+def coerce(value, arg):
+    """Convert an API property `value` and filter `arg` for comparison.
+
+    Date and time properties are strings in the API, and are parsed for
+    comparison with `date` or `datetime` arguments: naive arguments are
+    taken to be in UTC. Text arguments, as given on the command line, are
+    converted to the type of numeric and boolean properties.
+    """
+    if isinstance(arg, str):
+        if isinstance(value, bool):
+            return value, _truthy(arg)
+        if isinstance(value, (int, float)):
+            try:
+                return value, type(value)(arg)
+            except ValueError:
+                return str(value), arg
+        return value, arg
+    if not isinstance(value, str) or not isinstance(arg, datetime.date):
+        return value, arg
+    parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if not isinstance(arg, datetime.datetime):
+        return parsed.date(), arg
+    return utc(parsed), utc(arg)
+
+
+class Query(object):
+    """Lazy, chainable query over a collection.
+
+    Iterating over a query yields the matching objects, fetching pages as
+    needed. `filter()` (or calling the query) and `page_size()` return new
+    queries with added constraints.
+
+    Filters are keywords of the form `field` or `field__lookup`, with the
+    lookups in `LOOKUPS`. Exact filters on the fields in the model class'
+    `_filter_keys`, and the page size, are sent to the API. Other filters
+    are applied to each object as it is received. Filtering on properties
+    missing from list results (the model class' `_detail_keys`) refreshes
+    each listed object, with a request apiece, so should be avoided.
+    """
+
+    def __init__(self, client, collection, filters=None, limit=None):
+        """Initialise a new query."""
+        self.client = client
+        self.collection = collection
+        self.cls = client._collection_class(collection)
+        self.filters = dict(filters or {})
+        self.limit = limit
+        self._iterator = None
+        self.params, self.predicates = self._split_filters(self.filters)
+        self.detail = any(field in self.cls._detail_keys
+                          for field, _, _ in self.predicates)
+
+    def __repr__(self):
+        """Represent the query."""
+        return f"{type(self).__name__}({self.collection!r}, " \
+               f"filters={self.filters!r}, limit={self.limit!r})"
+
+    def __call__(self, **filters):
+        """Get a new query with added `filters`."""
+        return self.filter(**filters)
+
+    def filter(self, **filters):
+        """Get a new query with added `filters`."""
+        return type(self)(self.client, self.collection,
+                          filters=dict(self.filters, **filters),
+                          limit=self.limit)
+
+    def page_size(self, size):
+        """Get a new query fetching `size` objects per page."""
+        if size is not None and int(size) < 1:
+            err = ValueError("page size must be positive")
+            log.error(err)
+            raise err
+        return type(self)(self.client, self.collection, filters=self.filters,
+                          limit=size)
+
+    def _split_filters(self, filters):
+        """Split `filters` into API query parameters and predicates."""
+        params = {}
+        predicates = []
+        for key, arg in filters.items():
+            field, lookup = parse_filter(key)
+            if field not in self.cls._key_set:
+                err = ValueError(f"cannot filter {self.collection} by "
+                                 f"'{field}'")
+                log.error(err)
+                raise err
+            if lookup == "exact" and field in self.cls._filter_keys:
+                params[field] = arg
+            else:
+                predicates.append((field, LOOKUPS[lookup], arg))
+        if self.limit is not None:
+            params["limit"] = int(self.limit)
+        return params, tuple(predicates)
+
+    def matches(self, obj):
+        """Check whether `obj` satisfies the client-side filters."""
+        for field, test, arg in self.predicates:
+            value = getattr(obj, field, None)
+            if value is None and test is not _isnull:
+                return False
+            if not test(*coerce(value, arg)):
+                return False
+        return True
+
+    def _objects(self, results):
+        # Detail-only properties are fetched on access by lazy objects
+        objects = (self.cls(client=self.client, lazy=self.detail, **result)
+                   for result in results)
+        if not self.predicates:
+            return objects
+        return (obj for obj in objects if self.matches(obj))
+
+    def pages(self):
+        """Get the pages of matching objects, each an iterator of objects.
+
+        Each page should be consumed before the next is requested.
+        """
+        for data in self.client._get_iter(path=f"{self.cls.base_path}/",
+                                          params=self.params or None):
+            yield self._objects(data["results"])
+
+    def _iterate(self):
+        for page in self.pages():
+            yield from page
+
+    def __iter__(self):
+        """Iterate over the matching objects.
+
+        Each iteration fetches the collection afresh, unless `next()` has
+        been called on the query, in which case that iteration continues.
+        """
+        if self._iterator is not None:
+            return self._iterator
+        return self._iterate()
+
+    def __next__(self):
+        """Get the next matching object, iterating over the query."""
+        if self._iterator is None:
+            self._iterator = self._iterate()
+        return next(self._iterator)
+
+    def close(self):
+        """Stop iterating over the query."""
+        if self._iterator is not None:
+            self._iterator.close()
+
+
+class AsyncQuery(Query):
+    """Lazy, chainable query over a collection, for asynchronous clients.
+
+    See `Query`. Matching objects are yielded by `async for`.
+    """
+
+    async def pages(self):
+        """Get the pages of matching objects, each an iterator of objects.
+
+        If the filters need detail-only properties, the objects of each
+        page are refreshed concurrently before being filtered.
+        """
+        async for data in self.client._get_iter(
+            path=f"{self.cls.base_path}/", params=self.params or None
+        ):
+            if self.detail:
+                yield await self._refreshed(data["results"])
+            else:
+                yield self._objects(data["results"])
+
+    async def _refreshed(self, results):
+        # Loaded by the async client already: not imported for the CLI
+        import asyncio
+        objects = [self.cls(client=self.client, **result)
+                   for result in results]
+        await asyncio.gather(*(obj.refresh() for obj in objects))
+        return (obj for obj in objects if self.matches(obj))
+
+    def __iter__(self):
+        """Refuse synchronous iteration."""
+        raise TypeError(f"use 'async for' to iterate over {self!r}")
+
+    async def __aiter__(self):
+        """Iterate over the matching objects."""
+        async for page in self.pages():
+            for obj in page:
+                yield obj
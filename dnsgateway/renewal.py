@@ -0,0 +1,191 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway.renewal module."""
+
+import concurrent.futures
+import datetime
+import logging
+import re
+
+from dnsgateway.bulk import (BULK_WORKERS, ChargeCeiling, FAILED, REJECTED,
+                             UNAVAILABLE)
+from dnsgateway.mirror import timestamp
+from dnsgateway.query import utc
+
+log = logging.getLogger(__name__)
+
+RENEWED = "renewed"
+
+DURATION_UNITS = {"h": "hours", "d": "days", "w": "weeks"}
+
+
+def parse_duration(value):
+    """Parse a duration such as "30d", "2w" or "12h" into a timedelta.
+
+    A number without a unit is a number of days.
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([hdw]?)\s*", str(value),
+                         flags=re.IGNORECASE)
+    if match is None:
+        raise ValueError(f"invalid duration '{value}': use e.g. '30d', "
+                         f"'2w' or '12h'")
+    number, unit = match.groups()
+    return datetime.timedelta(**{DURATION_UNITS[unit.lower() or "d"]:
+                                 float(number)})
+
+
+def expiry(record):
+    """Get the expiry date of a domain record, in UTC."""
+    return utc(record.get("curExpDate", record.get("expiry")))
+
+
+def utcnow():
+    """Get the current time, in UTC."""
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class RenewalScheduler(object):
+    """Renew domains as they come due, using a mirror's expiry index.
+
+    Domains due within a window are found from the indexed expiry dates
+    of `mirror`, soonest first, without walking the registry. Only those
+    entries are refreshed from the registry, by `workers` concurrent
+    threads, before being acted on. The mirror is synchronised first if it
+    never has been. Later syncs (e.g. by `dnsgateway mirror sync`) pick up
+    newly registered domains, which are far from expiry.
+
+    `clock` gets the current time, as an aware datetime.
+    """
+
+    def __init__(self, client, mirror, workers=BULK_WORKERS, clock=utcnow):
+        """Initialise a new scheduler instance."""
+        self.client = client
+        self.mirror = mirror
+        self.workers = workers
+        self.clock = clock
+
+    def _cutoff(self, within):
+        return utc(self.clock() + within)
+
+    def due(self, within, autorenew=True):
+        """Get the mirrored domains expiring within `within`, soonest first.
+
+        `within` is a timedelta. Overdue domains are included. Domains set
+        to renew automatically are left out unless `autorenew` is set.
+        """
+        if self.mirror.get_meta("synced") is None:
+            log.info("Mirror was never synchronised: synchronising domains")
+            self.mirror.sync(tables=("domains",))
+        cutoff = timestamp(self._cutoff(within))
+        domains = self.mirror.query("domains", where="expiry <= ?",
+                                    params=(cutoff,), order_by="expiry")
+        return [d for d in domains
+                if autorenew or not getattr(d, "autorenew", False)]
+
+    def refresh(self, within):
+        """Refresh the domains due within `within` from the registry.
+
+        The mirror is updated with the refreshed domains, so that those
+        renewed elsewhere move back in the index, and deleted ones are
+        dropped from it. Returns the refreshed domains still due, soonest
+        first.
+        """
+        due = self.due(within)
+        if not due:
+            return []
+        log.info(f"Refreshing {len(due)} domains due for renewal")
+        fetch = self.client.deadlines.bind(self._fetch)
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.workers) as pool:
+            records = list(pool.map(fetch, due))
+        self.mirror.store("domains", [r for r in records if r is not None])
+        self.mirror.forget("domains", [d.wid for d, r in zip(due, records)
+                                       if r is None])
+        cutoff = self._cutoff(within)
+        return [self.client.domain_class(client=self.client, **r)
+                for r in sorted((r for r in records if r is not None),
+                                key=expiry)
+                if expiry(r) <= cutoff]
+
+    def _fetch(self, domain):
+        """Get the current record of `domain`, or `None` if deleted."""
+        try:
+            return self.client._get(path=domain.path)
+        except Exception as e:
+            response = getattr(e, "response", None)
+            if response is not None and response.status_code == 404:
+                return None
+            raise
+
+    def renew(self, within, period=1, period_unit="y", ceiling=None,
+              autorenew=False, batch_size=None):
+        """Renew the domains due within `within`.
+
+        Due domains are refreshed (see `refresh`), and renewed for `period`
+        units in batches of `batch_size` (by default, the client's check
+        batch size), soonest first. The renewal charges of each batch are
+        checked just before it is renewed, and must be accepted by
+        `ceiling`, a `ChargeCeiling`: by default, any charge is accepted.
+        Domains set to renew automatically are left to the registry, unless
+        `autorenew` is set.
+
+        Yields a result dictionary for each domain as it completes, with its
+        `name`, `wid`, `status` (one of "renewed", "unavailable", "rejected"
+        or "failed"), `charge`, and its new `expiry` or the `error` that
+        prevented its renewal.
+        """
+        if ceiling is None:
+            ceiling = ChargeCeiling()
+        domains = [d for d in self.refresh(within)
+                   if autorenew or not getattr(d, "autorenew", False)]
+        kwargs = {} if batch_size is None else {"batch_size": batch_size}
+        renew = self.client.deadlines.bind(self._renew)
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.workers) as pool:
+            for batch in self.client._check_batches(domains, **kwargs):
+                charges = self.client.check_domains(
+                    [d.name for d in batch], op="renew",
+                    batch_size=len(batch)
+                )
+                pending = [pool.submit(renew, d, charges.get(d.name, False),
+                                       ceiling, period, period_unit)
+                           for d in batch]
+                for future in concurrent.futures.as_completed(pending):
+                    result, record = future.result()
+                    if record is not None:
+                        self.mirror.store("domains", [record])
+                    yield result
+
+    def _renew(self, domain, charge, ceiling, period, period_unit):
+        """Renew a single domain, returning the result and its record."""
+        result = {"name": domain.name, "wid": domain.wid, "status": FAILED,
+                  "charge": None}
+        if charge is False:
+            result["status"] = UNAVAILABLE
+            return result, None
+        result["charge"] = charge
+        refused = ceiling.reserve(charge)
+        if refused is not None:
+            result.update(status=REJECTED, error=refused)
+            return result, None
+        try:
+            domain.renew(period=period, period_unit=period_unit,
+                         charge=charge)
+        except Exception as e:
+            # Only an error response shows the charge was not incurred.
+            if getattr(e, "response", None) is not None:
+                ceiling.release(charge)
+            log.error(f"Failed to renew domain {domain.name}: {e}")
+            result["error"] = str(e)
+            return result, None
+        result.update(status=RENEWED, expiry=domain.curExpDate)
+        return result, domain._properties
@@ -0,0 +1,197 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway.retry module."""
+
+import collections
+import datetime
+import email.utils
+import logging
+import random
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))
+RETRY_STATUSES = frozenset((429, 502, 503, 504))
+UNPROCESSED_STATUSES = frozenset((429,))
+
+
+class RetryPolicy(object):
+    """Retry policy implementation.
+
+    Failed requests are retried up to `total` times, waiting an
+    exponentially increasing `backoff_factor * 2 ** attempt` seconds
+    (bounded by `max_backoff`, with full jitter unless `jitter` is false)
+    between attempts. A `Retry-After` header on the response takes
+    precedence, up to `max_retry_after` seconds.
+
+    Only requests using `methods` are retried after a connection error or
+    a response with a status in `statuses`. Other requests (e.g. POSTs that
+    create billable objects) are retried only on responses with a status
+    in `unprocessed_statuses`, indicating that the gateway rejected the
+    request without acting on it.
+    """
+
+    def __init__(self, total=3, backoff_factor=0.5, max_backoff=30.0,
+                 jitter=True, statuses=RETRY_STATUSES,
+                 methods=IDEMPOTENT_METHODS,
+                 unprocessed_statuses=UNPROCESSED_STATUSES,
+                 max_retry_after=300.0):
+        """Initialise a new policy instance."""
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(m.upper() for m in methods)
+        self.unprocessed_statuses = frozenset(unprocessed_statuses)
+        self.max_retry_after = max_retry_after
+
+    def is_retryable(self, method, attempt, status=None, idempotent=None):
+        """Decide whether a failed attempt may be retried.
+
+        `status` is the response status code, or `None` after a connection
+        error. `idempotent` overrides the method-based classification of
+        the request.
+        """
+        if attempt >= self.total:
+            return False
+        if idempotent is None:
+            idempotent = method.upper() in self.methods
+        if status is None:
+            return idempotent
+        if status in self.unprocessed_statuses:
+            return True
+        return idempotent and status in self.statuses
+
+    def backoff(self, attempt, headers=None):
+        """Get the delay in seconds before the next attempt."""
+        retry_after = self.retry_after(headers)
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        delay = min(self.max_backoff, self.backoff_factor * 2 ** attempt)
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    @staticmethod
+    def retry_after(headers):
+        """Parse a `Retry-After` header into a delay in seconds."""
+        if not headers:
+            return None
+        value = headers.get("Retry-After")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            log.warning(f"Ignoring invalid Retry-After header: {value}")
+            return None
+        now = datetime.datetime.now(tz=date.tzinfo or datetime.timezone.utc)
+        return max(0.0, (date - now).total_seconds())
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket rate limiter.
+
+    Tokens accrue at `rate` per second up to `capacity` (defaulting to one
+    second's worth). Each request takes a token, waiting until one is
+    available. Reservations are made in arrival order, so waiting callers
+    are served fairly.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        """Initialise a new limiter instance."""
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        """Take `tokens` and get the delay before they may be used."""
+        with self._lock:
+            now = self._clock()
+            accrued = (now - self._updated) * self.rate
+            self._tokens = min(self.capacity, self._tokens + accrued)
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens=1):
+        """Take `tokens`, sleeping until they are available."""
+        delay = self.reserve(tokens)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+class RequestStats(object):
+    """Thread-safe counters of client request activity."""
+
+    def __init__(self):
+        """Initialise a new stats instance."""
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Reset all counters to zero."""
+        with self._lock:
+            self.requests = 0
+            self.retries = 0
+            self.retries_by_reason = collections.Counter()
+            self.limiter_waits = 0
+            self.limiter_wait_time = 0.0
+            self.coalesced = 0
+
+    def record_request(self):
+        """Record a request attempt."""
+        with self._lock:
+            self.requests += 1
+
+    def record_retry(self, reason):
+        """Record a retry, by status code or exception name."""
+        with self._lock:
+            self.retries += 1
+            self.retries_by_reason[reason] += 1
+
+    def record_wait(self, delay):
+        """Record a wait imposed by the rate limiter."""
+        if delay:
+            with self._lock:
+                self.limiter_waits += 1
+                self.limiter_wait_time += delay
+
+    def record_coalesced(self):
+        """Record a read served by another caller's request."""
+        with self._lock:
+            self.coalesced += 1
+
+    def as_dict(self):
+        """Get a snapshot of the counters."""
+        with self._lock:
+            return {"requests": self.requests,
+                    "retries": self.retries,
+                    "retries_by_reason": dict(self.retries_by_reason),
+                    "limiter_waits": self.limiter_waits,
+                    "limiter_wait_time": self.limiter_wait_time,
+                    "coalesced": self.coalesced}
@@ -0,0 +1,297 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway.stream module."""
+
+import codecs
+import collections
+import json
+import logging
+
+log = logging.getLogger(__name__)
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = " \t\n\r"
+
+
+class ChunkReader(object):
+    """File-like reader over an iterator of byte chunks."""
+
+    def __init__(self, chunks):
+        """Initialise a new reader."""
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def read(self, size=-1):
+        """Read up to `size` bytes.
+
+        Returns as soon as any data is available, like a raw socket read,
+        and an empty string only at the end of the stream.
+        """
+        while not self._buffer or size < 0:
+            try:
+                self._buffer += next(self._chunks)
+            except StopIteration:
+                break
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def iter_ijson(chunks):
+    """Decode top-level members of a JSON object using `ijson`.
+
+    Yields `(key, value)` pairs, with each item of the `results` array
+    yielded separately as `("results", item)`.
+    """
+    import ijson
+    import ijson.common
+    key = target = builder = None
+    for prefix, event, value in ijson.parse(ChunkReader(chunks),
+                                            use_float=True):
+        if builder is None:
+            if prefix == "":
+                if event == "map_key":
+                    key = value
+                continue
+            if prefix == "results" and event in ("start_array", "end_array"):
+                continue
+            target, builder = prefix, ijson.common.ObjectBuilder()
+            builder.event(event, value)
+            if event in ("start_map", "start_array"):
+                continue
+        else:
+            builder.event(event, value)
+            if prefix != target or event not in ("end_map", "end_array"):
+                continue
+        yield ("results" if target == "results.item" else key), builder.value
+        builder = None
+
+
+class JSONStreamDecoder(object):
+    """Incremental decoder of the top-level members of a JSON object.
+
+    A fallback for when `ijson` is not installed: text is buffered only
+    until the next complete member (or `results` item) can be decoded with
+    `json.JSONDecoder.raw_decode`.
+    """
+
+    def __init__(self):
+        """Initialise a new decoder."""
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._state = "start"
+        self._key = None
+        self._handlers = {"start": self._step_start,
+                          "key": self._step_key, "next": self._step_key,
+                          "colon": self._step_colon,
+                          "value": self._step_value,
+                          "item": self._step_item,
+                          "item_next": self._step_item}
+
+    def feed(self, chunk, final=False):
+        """Decode a chunk of bytes, returning any complete members."""
+        self._buffer = self._buffer[self._pos:] + \
+            self._text.decode(chunk, final=final)
+        self._pos = 0
+        items = []
+        while True:
+            item = self._step(final)
+            if item is None:
+                break
+            if item is not True:
+                items.append(item)
+        if final and self._state != "done":
+            raise ValueError("truncated JSON object")
+        return items
+
+    def _skip(self):
+        while self._pos < len(self._buffer) and \
+                self._buffer[self._pos] in WHITESPACE:
+            self._pos += 1
+        if self._pos < len(self._buffer):
+            return self._buffer[self._pos]
+        return None
+
+    def _expect(self, char):
+        if self._buffer[self._pos] != char:
+            raise ValueError(f"expected '{char}' at "
+                             f"'{self._buffer[self._pos:self._pos + 20]}'")
+        self._pos += 1
+
+    def _decode(self, final):
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return None
+        if end == len(self._buffer) and not final:
+            # A trailing number may be incomplete.
+            return None
+        self._pos = end
+        return (value,)
+
+    def _step(self, final):
+        """Advance past the next token in the buffer.
+
+        Returns a decoded `(key, value)` member, `True` if a token without
+        a value was consumed, or `None` if more text is needed.
+        """
+        char = self._skip()
+        if char is None or self._state == "done":
+            return None
+        return self._handlers[self._state](char, final)
+
+    def _step_start(self, char, final):
+        self._expect("{")
+        self._state = "key"
+        return True
+
+    def _step_key(self, char, final):
+        if char == "}":
+            self._pos += 1
+            self._state = "done"
+            return True
+        if self._state == "next":
+            self._expect(",")
+            self._state = "key"
+            return True
+        decoded = self._decode(final)
+        if decoded is None:
+            return None
+        self._key = decoded[0]
+        self._state = "colon"
+        return True
+
+    def _step_colon(self, char, final):
+        self._expect(":")
+        self._state = "value"
+        return True
+
+    def _step_value(self, char, final):
+        if self._key == "results" and char == "[":
+            self._pos += 1
+            self._state = "item"
+            return True
+        decoded = self._decode(final)
+        if decoded is None:
+            return None
+        self._state = "next"
+        return self._key, decoded[0]
+
+    def _step_item(self, char, final):
+        if char == "]":
+            self._pos += 1
+            self._state = "next"
+            return True
+        if self._state == "item_next":
+            self._expect(",")
+            self._state = "item"
+            return True
+        decoded = self._decode(final)
+        if decoded is None:
+            return None
+        self._state = "item_next"
+        return "results", decoded[0]
+
+
+def iter_fallback(chunks):
+    """Decode top-level members of a JSON object without `ijson`.
+
+    See `iter_ijson`.
+    """
+    decoder = JSONStreamDecoder()
+    for chunk in chunks:
+        yield from decoder.feed(chunk)
+    yield from decoder.feed(b"", final=True)
+
+
+def iter_members(chunks):
+    """Decode top-level members of a JSON object from byte `chunks`.
+
+    Uses `ijson` if it is installed, and `JSONStreamDecoder` otherwise.
+    """
+    try:
+        import ijson  # noqa: F401
+    except ImportError:
+        log.debug("ijson not available: using fallback stream decoder")
+        return iter_fallback(chunks)
+    return iter_ijson(chunks)
+
+
+class StreamedPage(object):
+    """Page of a collection, decoded as it is read.
+
+    Supports the subset of the `dict` interface used for pages. Indexing
+    `results` returns an iterator yielding each result as it is decoded.
+    Other members are available as soon as they have been read: if they
+    follow `results` in the response, the results read up to that point
+    are buffered.
+    """
+
+    def __init__(self, chunks, close=None):
+        """Initialise a new page."""
+        self._members = iter_members(chunks)
+        self._close = close
+        self._envelope = {}
+        self._buffered = collections.deque()
+        self._done = False
+
+    def __repr__(self):
+        """Represent the page by the members read so far."""
+        return f"<StreamedPage {self._envelope}>"
+
+    def _advance(self):
+        try:
+            key, value = next(self._members)
+        except StopIteration:
+            self._done = True
+            self.close()
+            return False
+        if key == "results":
+            self._buffered.append(value)
+        else:
+            self._envelope[key] = value
+        return True
+
+    def __getitem__(self, key):
+        """Get a member of the page."""
+        if key == "results":
+            return self._results()
+        while key not in self._envelope and not self._done:
+            self._advance()
+        return self._envelope[key]
+
+    def get(self, key, default=None):
+        """Get a member of the page, or `default`."""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def _results(self):
+        while True:
+            while self._buffered:
+                yield self._buffered.popleft()
+            if self._done or not self._advance():
+                return
+
+    def close(self):
+        """Release the underlying response."""
+        if self._close is not None:
+            close, self._close = self._close, None
+            close()
@@ -0,0 +1,730 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway.testing module.
+
+A stand-in DNS Gateway server for offline tests and benchmarks, using only
+the standard library. Serving HTTP/2 requires the optional `h2` package, and
+brotli compression the `brotli` package. To serve a seeded registry from the
+command line:
+
+    python -m dnsgateway.testing --domains 10000 --port 8000
+"""
+
+import argparse
+import base64
+import collections
+import datetime
+import gzip
+import http.server
+import json
+import logging
+import random
+import re
+import socket
+import socketserver
+import sys
+import threading
+import time
+import urllib.parse
+
+log = logging.getLogger(__name__)
+
+ZONES = ("co.za", "org.za", "net.za", "africa", "com")
+CHARGE = "10.00"
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+OPERATIONS = ("create", "renew", "transfer", "restore")
+CONTACT_TYPES = ("registrant", "admin", "billing", "tech")
+
+COLLECTIONS = ("domains", "contacts", "zones")
+UNIQUE_KEYS = {"domains": "name", "contacts": "id", "zones": "zone"}
+SUMMARY_KEYS = {
+    "domains": ("wid", "name", "zone", "cdate", "curExpDate", "autorenew",
+                "period", "period_unit", "rar", "transport"),
+    "contacts": ("wid", "id", "cdate", "name", "email", "phone", "fax"),
+    "zones": None,
+}
+
+COMPRESS_MIN_SIZE = 1024
+
+ROUTES = (
+    ("check", re.compile(r"^/registry/domains/check/$")),
+    ("collection", re.compile(r"^/registry/(domains|contacts|zones)/$")),
+    ("object", re.compile(r"^/registry/(domains|contacts|zones)/(\d+)$")),
+    ("renew", re.compile(r"^/registry/domains/(\d+)/renew/$")),
+)
+
+
+def compress(payload, accept_encoding=None):
+    """Compress a response `payload` with an encoding the client accepts.
+
+    Returns the payload and its content encoding, which is `None` if the
+    payload is too small to be worth compressing, or if no supported
+    encoding is accepted. Brotli is preferred to gzip if it is installed.
+    """
+    if len(payload) < COMPRESS_MIN_SIZE:
+        return payload, None
+    accepted = {coding.split(";")[0].strip().lower()
+                for coding in (accept_encoding or "").split(",")}
+    if "br" in accepted:
+        try:
+            import brotli
+        except ImportError:
+            log.debug("brotli not available: using gzip")
+        else:
+            return brotli.compress(payload, quality=4), "br"
+    if "gzip" in accepted:
+        return gzip.compress(payload, compresslevel=6), "gzip"
+    return payload, None
+
+
+class MockError(Exception):
+    """Error response from the mock gateway."""
+
+    def __init__(self, status, detail, headers=None):
+        """Initialise a new error."""
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+        self.headers = headers or {}
+
+
+class MockRegistry(object):
+    """Thread-safe in-memory registry served by `MockGateway`."""
+
+    def __init__(self, zones=ZONES, charge=CHARGE):
+        """Initialise a new registry."""
+        self.charge = charge
+        self.lock = threading.RLock()
+        self.records = {name: collections.OrderedDict()
+                        for name in COLLECTIONS}
+        self._index = {name: {} for name in COLLECTIONS}
+        self._wids = {name: 0 for name in COLLECTIONS}
+        for zone in zones:
+            self.add("zones", {"zone": zone, "operator": "mock",
+                               "transport": "epp", "default_allow": True,
+                               "cdate": self.now()})
+
+    @staticmethod
+    def now(days=0):
+        """Get a timestamp, offset by `days`."""
+        when = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        return (when + datetime.timedelta(days=days)).isoformat()
+
+    def add(self, collection, record):
+        """Store a new record, assigning its wid."""
+        with self.lock:
+            self._wids[collection] += 1
+            record = dict(record, wid=self._wids[collection])
+            self.records[collection][record["wid"]] = record
+            self._index[collection][record[UNIQUE_KEYS[collection]]] = \
+                record["wid"]
+            return record
+
+    def find(self, collection, **filters):
+        """Get the records of `collection` matching `filters`."""
+        key = UNIQUE_KEYS[collection]
+        with self.lock:
+            if key in filters:
+                wid = self._index[collection].get(filters.pop(key))
+                records = [] if wid is None \
+                    else [self.records[collection][wid]]
+            else:
+                records = list(self.records[collection].values())
+        for key, value in filters.items():
+            records = [r for r in records if str(r.get(key)) == value]
+        return records
+
+    def zone(self, name):
+        """Get the zone of a domain name."""
+        zones = sorted((r["zone"] for r in self.records["zones"].values()),
+                       key=len, reverse=True)
+        for zone in zones:
+            if name.endswith(f".{zone}"):
+                return zone
+        raise MockError(400, f"zone of '{name}' is not supported")
+
+    def charges(self):
+        """Get the charges of domain operations."""
+        return {"action": {op: self.charge for op in OPERATIONS}}
+
+    def check(self, name):
+        """Check the availability of a domain name.
+
+        Charges are given for names in supported zones, whether available
+        or registered (and so renewable).
+        """
+        try:
+            self.zone(name)
+        except MockError:
+            return {"name": name, "avail": 0}
+        avail = not self.find("domains", name=name)
+        return {"name": name, "avail": int(avail), "charge": self.charges()}
+
+    def create_domain(self, data):
+        """Register a domain."""
+        name = data.get("name")
+        if not name:
+            raise MockError(400, "domain name is required")
+        with self.lock:
+            if not self.check(name)["avail"]:
+                raise MockError(400, f"domain '{name}' is not available")
+            price = (data.get("charge") or {}).get("price")
+            if price != self.charge:
+                raise MockError(400, f"charge {price} does not match "
+                                     f"{self.charge}")
+            contacts = []
+            for item in data.get("contacts") or ():
+                handle = item["contact"]["id"]
+                if not self.find("contacts", id=handle):
+                    raise MockError(400, f"contact '{handle}' not found")
+                contacts.append(item)
+            period = int(data.get("period", 1))
+            days = period * (365 if data.get("period_unit", "y") == "y"
+                             else 30)
+            return self.add("domains", {
+                "name": name, "zone": self.zone(name),
+                "cdate": self.now(), "curExpDate": self.now(days),
+                "period": period, "period_unit": data.get("period_unit", "y"),
+                "autorenew": bool(data.get("autorenew")),
+                "rar": "mock", "transport": "epp",
+                "hosts": data.get("hosts") or [], "contacts": contacts,
+                "statuses": [{"status": "ok"}], "events": [],
+            })
+
+    def create_contact(self, data):
+        """Create a contact."""
+        handle = data.get("id")
+        if not handle:
+            raise MockError(400, "contact id is required")
+        with self.lock:
+            if self.find("contacts", id=handle):
+                raise MockError(400, f"contact '{handle}' already exists")
+            addresses = data.get("contact_address") or [{}]
+            return self.add("contacts", {
+                "id": handle, "cdate": self.now(),
+                "name": addresses[0].get("real_name"),
+                "email": data.get("email"), "phone": data.get("phone"),
+                "fax": data.get("fax"), "contact_address": addresses,
+                "statuses": [{"status": "ok"}],
+            })
+
+    def renew(self, wid, data):
+        """Renew a domain, extending its expiry date."""
+        with self.lock:
+            record = self.get("domains", wid)
+            if data.get("curExpDate") != record["curExpDate"]:
+                raise MockError(400, f"current expiry date of "
+                                     f"'{record['name']}' does not match")
+            price = (data.get("charge") or {}).get("price")
+            if price != self.charge:
+                raise MockError(400, f"charge {price} does not match "
+                                     f"{self.charge}")
+            period = int(data.get("period", 1))
+            days = period * (365 if data.get("period_unit", "y") == "y"
+                             else 30)
+            expiry = datetime.datetime.fromisoformat(record["curExpDate"])
+            record["curExpDate"] = \
+                (expiry + datetime.timedelta(days=days)).isoformat()
+            return record
+
+    def update(self, collection, wid, data):
+        """Update the properties of a record."""
+        with self.lock:
+            record = self.get(collection, wid)
+            key = UNIQUE_KEYS[collection]
+            record.update((k, v) for k, v in data.items()
+                          if k not in ("wid", key))
+            return record
+
+    def get(self, collection, wid):
+        """Get a record by wid."""
+        try:
+            return self.records[collection][wid]
+        except KeyError:
+            raise MockError(404, "Not found.")
+
+    def delete(self, collection, wid):
+        """Delete a record."""
+        with self.lock:
+            record = self.get(collection, wid)
+            if collection == "contacts" and any(
+                item["contact"]["id"] == record["id"]
+                for domain in self.records["domains"].values()
+                for item in domain.get("contacts") or ()
+            ):
+                raise MockError(400, "Domain dependencies prohibit contact "
+                                     "'delete' operation")
+            del self.records[collection][wid]
+            del self._index[collection][record[UNIQUE_KEYS[collection]]]
+
+    def seed(self, domains=0, contacts=1, seed=0):
+        """Add synthetic domains and contacts, reproducibly from `seed`."""
+        rng = random.Random(seed)
+        zones = [r["zone"] for r in self.records["zones"].values()]
+        handles = []
+        for i in range(contacts):
+            handle = f"seed-{seed}-{i}"
+            handles.append(handle)
+            self.create_contact({
+                "id": handle, "email": f"{handle}@example.net",
+                "phone": "+27.110000000",
+                "contact_address": [{"real_name": f"Contact {i}",
+                                     "city": "Johannesburg",
+                                     "country": "ZA", "type": t}
+                                    for t in ("loc", "int")],
+            })
+        for i in range(domains):
+            name = f"seed-{seed}-{i}.{rng.choice(zones)}"
+            handle = rng.choice(handles)
+            self.create_domain({
+                "name": name, "period": rng.randint(1, 5),
+                "autorenew": rng.random() < 0.5,
+                "hosts": [{"hostname": f"ns{n}.example.net"}
+                          for n in (1, 2)],
+                "contacts": [{"type": t, "contact": {"id": handle}}
+                             for t in CONTACT_TYPES],
+                "charge": {"price": self.charge},
+            })
+        return self
+
+
+class MockGateway(object):
+    """Stand-in DNS Gateway API server.
+
+    Serves `registry` (by default, an empty `MockRegistry`) over HTTP on
+    `host` and `port` (by default, a free port) from a background thread.
+    Point a client at `endpoint`.
+
+    Collections are paginated by `limit` and `offset`, `page_size` records
+    at a time, and may be filtered by any record field. Listed records
+    carry summary fields only: details are served by object.
+
+    Each request is delayed by `latency` seconds. A fraction `error_rate`
+    of requests (chosen reproducibly from `seed`) fail with `error_status`,
+    and `fail()` queues failures for the next requests. If `credentials`
+    are given, requests must use basic authentication with them. Request
+    counts by method and route are kept in `requests`, and the number of
+    connections accepted in `connections`.
+
+    If `compress` is set, large responses are compressed with an encoding
+    the client accepts (see `compress`). If `http2` is set, the server
+    speaks HTTP/2 without negotiation ("prior knowledge") rather than
+    HTTP/1.1, serving the requests multiplexed on each connection
+    concurrently.
+    """
+
+    def __init__(self, registry=None, host="127.0.0.1", port=0,
+                 page_size=PAGE_SIZE, latency=0.0, error_rate=0.0,
+                 error_status=503, credentials=None, seed=0, compress=False,
+                 http2=False):
+        """Initialise a new server instance."""
+        self.registry = registry if registry is not None else MockRegistry()
+        self.host = host
+        self.port = port
+        self.page_size = page_size
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.credentials = credentials
+        self.compress = compress
+        self.http2 = http2
+        self.requests = collections.Counter()
+        self.connections = 0
+        self._random = random.Random(seed)
+        self._failures = collections.deque()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def __enter__(self):
+        """Start the server on entering the context."""
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        """Stop the server on exiting the context."""
+        self.stop()
+
+    @property
+    def endpoint(self):
+        """Get the API endpoint URL of the server."""
+        return f"http://{self.host}:{self.port}/api"
+
+    def start(self):
+        """Start serving requests in a background thread."""
+        handler = MockH2Handler if self.http2 else MockHandler
+        self._server = MockHTTPServer((self.host, self.port), handler)
+        self._server.gateway = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        kwargs={"poll_interval": 0.05},
+                                        name="mock-gateway", daemon=True)
+        self._thread.start()
+        log.info(f"Mock gateway listening at {self.endpoint}")
+        return self
+
+    def stop(self):
+        """Stop the server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = self._thread = None
+
+    def fail(self, status=503, count=1, headers=None):
+        """Fail the next `count` requests with `status`."""
+        with self._lock:
+            for _ in range(count):
+                self._failures.append(MockError(status, "Injected failure.",
+                                                headers))
+
+    def connected(self):
+        """Count a connection accepted."""
+        with self._lock:
+            self.connections += 1
+
+    def _injected_failure(self):
+        with self._lock:
+            if self._failures:
+                return self._failures.popleft()
+            if self.error_rate and self._random.random() < self.error_rate:
+                return MockError(self.error_status, "Injected failure.")
+        return None
+
+    def _authorised(self, header):
+        if self.credentials is None:
+            return True
+        expected = base64.b64encode(":".join(self.credentials).encode())
+        return header == f"Basic {expected.decode()}"
+
+    def respond(self, method, url, body, headers):
+        """Handle a request with a raw `body` and lower-case `headers`.
+
+        Returns the status, the response headers and the encoded payload.
+        """
+        data = {}
+        if body:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                data = None
+        if data is None:
+            status, data, extra = 400, {"detail": "JSON parse error."}, {}
+        else:
+            status, data, extra = self.handle(
+                method, url, data, authorization=headers.get("authorization"),
+                host=headers.get("host")
+            )
+        payload = json.dumps(data).encode()
+        response_headers = {"Content-Type": "application/json"}
+        if self.compress:
+            payload, encoding = compress(payload,
+                                         headers.get("accept-encoding"))
+            response_headers["Vary"] = "Accept-Encoding"
+            if encoding is not None:
+                response_headers["Content-Encoding"] = encoding
+        response_headers["Content-Length"] = str(len(payload))
+        response_headers.update(extra)
+        return status, response_headers, payload
+
+    def handle(self, method, url, body, authorization=None, host=None):
+        """Handle a request, returning the status, data and headers."""
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path
+        if path.startswith("/api/"):
+            path = path[len("/api"):]
+        for route, pattern in ROUTES:
+            match = pattern.match(path)
+            if match:
+                break
+        else:
+            route, match = None, None
+        self.requests[(method, route)] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        try:
+            if not self._authorised(authorization):
+                raise MockError(401, "Invalid username/password.")
+            failure = self._injected_failure()
+            if failure is not None:
+                raise failure
+            if match is None:
+                raise self._unrouted(path, parts)
+            query = dict(urllib.parse.parse_qsl(parts.query))
+            handler = getattr(self, f"_{route}")
+            status, data = handler(method, body, query, host, parts.path,
+                                   *match.groups())
+            return status, data, {}
+        except MockError as e:
+            return e.status, {"detail": e.detail}, e.headers
+
+    @staticmethod
+    def _unrouted(path, parts):
+        """Get the error for a request `path` matching no route.
+
+        As with Django's `APPEND_SLASH`, paths that match a route once a
+        slash is appended are redirected there.
+        """
+        if any(pattern.match(f"{path}/") for _, pattern in ROUTES):
+            location = urllib.parse.urlunsplit(
+                parts._replace(path=f"{parts.path}/")
+            )
+            return MockError(301, "Moved permanently.",
+                             headers={"Location": location})
+        return MockError(404, "Not found.")
+
+    def _check(self, method, body, query, host, path):
+        if method != "POST":
+            raise MockError(405, f"Method \"{method}\" not allowed.")
+        names = body.get("name")
+        if isinstance(names, str):
+            names = [names]
+        results = [self.registry.check(name) for name in names or ()]
+        return 200, {"results": results}
+
+    def _collection(self, method, body, query, host, path, collection):
+        if method == "POST" and collection == "domains":
+            return 201, self.registry.create_domain(body)
+        if method == "POST" and collection == "contacts":
+            return 201, self.registry.create_contact(body)
+        if method != "GET":
+            raise MockError(405, f"Method \"{method}\" not allowed.")
+        try:
+            limit = min(int(query.pop("limit", self.page_size)),
+                        MAX_PAGE_SIZE)
+            offset = int(query.pop("offset", 0))
+        except ValueError:
+            raise MockError(400, "Invalid limit or offset.")
+        records = self.registry.find(collection, **query)
+        page = records[offset:offset + limit]
+        keys = SUMMARY_KEYS[collection]
+        if keys is not None:
+            page = [{k: r[k] for k in keys if k in r} for r in page]
+
+        def link(start):
+            if start >= len(records):
+                return None
+            params = dict(query, limit=limit, offset=start)
+            return f"http://{host}{path}?{urllib.parse.urlencode(params)}"
+        return 200, {"count": len(records),
+                     "next": link(offset + limit),
+                     "previous": link(max(offset - limit, 0))
+                     if offset else None,
+                     "results": page}
+
+    def _renew(self, method, body, query, host, path, wid):
+        if method != "POST":
+            raise MockError(405, f"Method \"{method}\" not allowed.")
+        return 200, self.registry.renew(int(wid), body)
+
+    def _object(self, method, body, query, host, path, collection, wid):
+        wid = int(wid)
+        if method == "GET":
+            return 200, self.registry.get(collection, wid)
+        if method == "PUT" and collection != "zones":
+            return 200, self.registry.update(collection, wid, body)
+        if method == "DELETE" and collection != "zones":
+            self.registry.delete(collection, wid)
+            return 200, {}
+        raise MockError(405, f"Method \"{method}\" not allowed.")
+
+
+class MockHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """Threaded HTTP server for the mock gateway."""
+
+    daemon_threads = True
+    gateway = None
+
+    def handle_error(self, request, client_address):
+        """Log errors, ignoring clients that hung up, e.g. on a timeout."""
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            log.debug(f"Client {client_address[0]} disconnected")
+            return
+        super().handle_error(request, client_address)
+
+
+class MockHandler(http.server.BaseHTTPRequestHandler):
+    """HTTP request handler for the mock gateway."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        """Count the connection."""
+        super().setup()
+        self.server.gateway.connected()
+
+    def log_message(self, format, *args):
+        """Log requests at debug level."""
+        log.debug(format % args)
+
+    def _dispatch(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        headers = {k.lower(): v for k, v in self.headers.items()}
+        status, headers, payload = self.server.gateway.respond(
+            self.command, self.path, body, headers
+        )
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _dispatch
+
+
+class MockH2Handler(socketserver.BaseRequestHandler):
+    """HTTP/2 connection handler for the mock gateway.
+
+    Requests are read from the connection as they arrive, and each is
+    answered from its own thread, so that concurrent requests on the
+    connection are served concurrently. Responses are sent within the
+    client's flow control windows.
+    """
+
+    def setup(self):
+        """Set up the HTTP/2 connection state."""
+        import h2.config
+        import h2.connection
+        config = h2.config.H2Configuration(client_side=False,
+                                           header_encoding="utf-8")
+        self.conn = h2.connection.H2Connection(config=config)
+        self.streams = {}
+        self.open = True
+        # guards the connection state, and is notified on window updates
+        self.lock = threading.Condition()
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.gateway.connected()
+
+    def handle(self):
+        """Read frames until the client closes the connection."""
+        with self.lock:
+            self.conn.initiate_connection()
+            self._flush()
+        while self.open:
+            data = self._recv()
+            with self.lock:
+                if not data:
+                    self.open = False
+                    break
+                for event in self._receive(data):
+                    self._handle_event(event)
+                self._flush()
+                self.lock.notify_all()
+        with self.lock:
+            self.open = False
+            self.lock.notify_all()
+
+    def _recv(self):
+        try:
+            return self.request.recv(65536)
+        except OSError:
+            return b""
+
+    def _receive(self, data):
+        """Get the events of received `data`, closing on protocol errors."""
+        import h2.exceptions
+        try:
+            return self.conn.receive_data(data)
+        except h2.exceptions.ProtocolError as e:
+            log.debug(f"HTTP/2 protocol error: {e}")
+            self.open = False
+            return ()
+
+    def _handle_event(self, event):
+        import h2.events
+        if isinstance(event, h2.events.RequestReceived):
+            self.streams[event.stream_id] = (dict(event.headers), bytearray())
+        elif isinstance(event, h2.events.DataReceived):
+            self.streams[event.stream_id][1].extend(event.data)
+            self.conn.acknowledge_received_data(event.flow_controlled_length,
+                                                event.stream_id)
+        elif isinstance(event, h2.events.StreamEnded):
+            headers, body = self.streams.pop(event.stream_id)
+            threading.Thread(target=self._respond,
+                             args=(event.stream_id, headers, bytes(body)),
+                             daemon=True).start()
+        elif isinstance(event, h2.events.ConnectionTerminated):
+            self.open = False
+
+    def _flush(self):
+        data = self.conn.data_to_send()
+        if data and self.open:
+            try:
+                self.request.sendall(data)
+            except OSError:
+                self.open = False
+
+    def _respond(self, stream_id, headers, body):
+        import h2.exceptions
+        headers = dict(headers, host=headers.get(":authority"))
+        status, response_headers, payload = self.server.gateway.respond(
+            headers[":method"], headers[":path"], body, headers
+        )
+        log.debug(f"HTTP/2 {headers[':method']} {headers[':path']} {status}")
+        with self.lock:
+            try:
+                self.conn.send_headers(
+                    stream_id,
+                    [(":status", str(status))] +
+                    [(k.lower(), v) for k, v in response_headers.items()],
+                    end_stream=not payload
+                )
+                self._flush()
+                while payload and self.open:
+                    size = min(self.conn.local_flow_control_window(stream_id),
+                               self.conn.max_outbound_frame_size,
+                               len(payload))
+                    if size <= 0:
+                        self.lock.wait()
+                        continue
+                    self.conn.send_data(stream_id, payload[:size],
+                                        end_stream=size == len(payload))
+                    payload = payload[size:]
+                    self._flush()
+            except h2.exceptions.StreamClosedError:
+                log.debug(f"HTTP/2 stream {stream_id} closed by client")
+
+
+def main(args=None):
+    """Serve a seeded mock registry until interrupted."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--domains", type=int, default=1000)
+    parser.add_argument("--contacts", type=int, default=100)
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compress", action="store_true")
+    parser.add_argument("--http2", action="store_true")
+    options = parser.parse_args(args)
+    logging.basicConfig(level=logging.INFO)
+    registry = MockRegistry().seed(domains=options.domains,
+                                   contacts=options.contacts,
+                                   seed=options.seed)
+    gateway = MockGateway(registry, host=options.host, port=options.port,
+                          page_size=options.page_size,
+                          latency=options.latency,
+                          error_rate=options.error_rate, seed=options.seed,
+                          compress=options.compress, http2=options.http2)
+    with gateway:
+        try:
+            gateway._thread.join()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
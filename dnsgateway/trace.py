@@ -0,0 +1,120 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway.trace module."""
+
+import json
+import logging
+import sys
+import threading
+import time
+import urllib.parse
+
+from dnsgateway.metrics import MetricsSink
+
+log = logging.getLogger(__name__)
+
+REDACT_KEYS = ("authinfo", "password")
+REDACTED = "<redacted>"
+
+
+def redact(value, keys=REDACT_KEYS):
+    """Get a copy of `value` with the values of sensitive keys replaced.
+
+    A key is sensitive if it contains any of `keys`, case-insensitively,
+    at any depth of nested dictionaries and lists.
+    """
+    if isinstance(value, dict):
+        return {k: REDACTED if _sensitive(k, keys) else redact(v, keys)
+                for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v, keys) for v in value]
+    return value
+
+
+def _sensitive(key, keys):
+    key = str(key).lower()
+    return any(k in key for k in keys)
+
+
+class Redacted(object):
+    """Lazily redacted value, for logging.
+
+    Formatting a `Redacted` value gives the representation of the redacted
+    copy of `value`. It is only built if the log record is emitted.
+    """
+
+    __slots__ = ("value", "keys")
+
+    def __init__(self, value, keys=REDACT_KEYS):
+        """Initialise a new instance."""
+        self.value = value
+        self.keys = keys
+
+    def __str__(self):
+        """Get the redacted value as a string."""
+        return str(redact(self.value, self.keys))
+
+
+class TraceSink(MetricsSink):
+    """Metrics sink emitting each event as a compact line of JSON.
+
+    Request events carry the request id shared by all attempts of a
+    request, the method, templated path and redacted query parameters,
+    the status or error, sizes and the duration in milliseconds. Payloads
+    are never traced. Values of query parameters whose names contain any
+    of `redact` are replaced.
+
+    Lines are written to `stream` (by default, standard error), or logged
+    at INFO level to `logger` if one is given.
+    """
+
+    def __init__(self, stream=None, logger=None, redact=REDACT_KEYS):
+        """Initialise a new trace sink."""
+        self.stream = stream
+        self.logger = logger
+        self.redact = redact
+        self._lock = threading.Lock()
+        self._encode = json.JSONEncoder(separators=(",", ":"),
+                                        default=str).encode
+
+    def record_request(self, event):
+        """Emit a request event."""
+        record = {"ts": round(time.time(), 6), "event": "request",
+                  "id": event.request_id, "attempt": event.attempt,
+                  "method": event.method, "path": event.path}
+        query = urllib.parse.urlsplit(event.url).query
+        if query:
+            record["query"] = redact(dict(urllib.parse.parse_qsl(query)),
+                                     self.redact)
+        if event.status is None:
+            record["error"] = type(event.error).__name__
+        else:
+            record["status"] = event.status
+        record.update(sent=event.request_bytes, received=event.response_bytes,
+                      ms=round(event.duration * 1000, 3))
+        self.emit(record)
+
+    def record_page(self, path):
+        """Emit a page event."""
+        self.emit({"ts": round(time.time(), 6), "event": "page",
+                   "path": path})
+
+    def emit(self, record):
+        """Write a trace record."""
+        line = self._encode(record)
+        if self.logger is not None:
+            self.logger.info(line)
+            return
+        stream = self.stream if self.stream is not None else sys.stderr
+        with self._lock:
+            stream.write(line + "\n")
+            stream.flush()
@@ -0,0 +1,391 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway.transport module."""
+
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 10
+
+TRANSPORTS = ("requests", "httpx", "http2")
+
+
+def basic_auth(auth):
+    """Get basic authentication credentials, or `None` if there are none."""
+    if auth is None or all(part is None for part in auth):
+        return None
+    return auth
+
+
+def _import_httpx(usage, http2=False):
+    """Import `httpx`, explaining how to install it if it is missing."""
+    try:
+        import httpx
+        if http2:
+            import h2  # noqa: F401
+    except ImportError as e:
+        log.error(e)
+        if http2:
+            usage, requirement, extra = "HTTP/2", "'httpx[http2]'", "http2"
+        else:
+            requirement, extra = "'httpx'", "async"
+        raise RuntimeError(f"{usage} requires {requirement}: "
+                           f"install 'py-dns-gateway[{extra}]'") from e
+    return httpx
+
+
+def _httpx_timeout(timeout):
+    """Get the `httpx` options for a (connect, read) `timeout`.
+
+    A `timeout` of `None` disables timeouts, as it does with `requests`,
+    rather than falling back to the `httpx` default.
+    """
+    if timeout is None:
+        return {"timeout": None}
+    import httpx
+    connect, read = timeout
+    return {"timeout": httpx.Timeout(read, connect=connect)}
+
+
+class Transport(object):
+    """Base synchronous HTTP transport implementation.
+
+    A transport sends a single HTTP request and returns the response object
+    of the underlying library, which must provide `status_code`, `headers`,
+    `json()` and `raise_for_status()`. Synchronous transports also accept
+    `stream=True`, in which case the body is read lazily from the
+    response's `iter_content()` and released by its `close()`.
+
+    Transports accept a `timeout` for each request, a (connect, read) pair
+    of seconds, and raise one of `retryable_exceptions` if it expires.
+
+    `retryable_exceptions` lists the exceptions raised by `request` on
+    connection failures that a retry policy may retry.
+    """
+
+    retryable_exceptions = ()
+
+    def request(self, method, url, params=None, json=None, headers=None,
+                stream=False, timeout=None):
+        """Send an HTTP request and return the response."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release any resources held by the transport."""
+        pass
+
+
+class AsyncTransport(object):
+    """Base asynchronous HTTP transport implementation."""
+
+    retryable_exceptions = ()
+
+    async def request(self, method, url, params=None, json=None,
+                      headers=None, timeout=None):
+        """Send an HTTP request and return the response."""
+        raise NotImplementedError
+
+    async def close(self):
+        """Release any resources held by the transport."""
+        pass
+
+
+class RequestsTransport(Transport):
+    """Synchronous transport using a pooled `requests` session.
+
+    The session is created on first use and shared by all threads using the
+    transport. `pool_connections` sets the number of per-host pools to
+    cache, `pool_maxsize` the number of keep-alive connections kept open per
+    host, and `pool_block` whether to wait for a free connection rather than
+    opening a throw-away one when the pool is exhausted.
+    """
+
+    def __init__(self, auth=None,
+                 pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False):
+        """Initialise a new transport instance."""
+        self.auth = auth
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def retryable_exceptions(self):
+        """Get the exceptions raised on connection failures."""
+        import requests.exceptions
+        return (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout)
+
+    @property
+    def session(self):
+        """Get the pooled HTTP session, creating it if required."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._new_session()
+        return self._session
+
+    def _new_session(self):
+        import requests
+        import requests.adapters
+        log.debug(f"Creating HTTP session with pool size {self.pool_maxsize}")
+        session = requests.Session()
+        session.auth = basic_auth(self.auth)
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block
+        )
+        for prefix in ("https://", "http://"):
+            session.mount(prefix, adapter)
+        return session
+
+    def request(self, method, url, params=None, json=None, headers=None,
+                stream=False, timeout=None):
+        """Send an HTTP request via the pooled session."""
+        return self.session.request(method, url, params=params, json=json,
+                                    headers=headers, stream=stream,
+                                    timeout=timeout)
+
+    def close(self):
+        """Close the HTTP session and release pooled connections."""
+        with self._session_lock:
+            if self._session is not None:
+                log.debug("Closing HTTP session")
+                self._session.close()
+                self._session = None
+
+
+class HttpxStreamedResponse(object):
+    """Streamed `httpx.Response`, read by way of `iter_content()`."""
+
+    def __init__(self, resp):
+        """Initialise a new response wrapper."""
+        self._resp = resp
+
+    def __getattr__(self, name):
+        """Get the attributes of the wrapped response."""
+        return getattr(self._resp, name)
+
+    def iter_content(self, chunk_size=None):
+        """Iterate over the decoded body, `chunk_size` bytes at a time."""
+        return self._resp.iter_bytes(chunk_size=chunk_size)
+
+    def close(self):
+        """Release the connection, unless the body has been read."""
+        if not self._resp.is_closed:
+            self._resp.close()
+
+
+class HttpxTransport(Transport):
+    """Synchronous transport using a pooled `httpx.Client`.
+
+    Requires the optional `httpx` dependency, available via the `async`
+    extra. `max_connections` bounds the number of concurrent connections
+    (`None` for no bound) and `max_keepalive` the number of idle
+    connections kept open. Requests are made over HTTP/1.1: see
+    `Http2Transport` for HTTP/2.
+
+    Responses are decompressed transparently: `gzip` and `deflate` are
+    always accepted, and `br` if the `brotli` package is installed.
+    """
+
+    def __init__(self, auth=None, max_connections=None,
+                 max_keepalive=DEFAULT_POOL_MAXSIZE):
+        """Initialise a new transport instance."""
+        self.auth = auth
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def retryable_exceptions(self):
+        """Get the exceptions raised on connection failures."""
+        import httpx
+        return (httpx.TransportError,)
+
+    @property
+    def client(self):
+        """Get the pooled HTTP client, creating it if required."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._new_client()
+        return self._client
+
+    def _new_client(self):
+        httpx = _import_httpx("httpx transport")
+        log.debug(f"Creating HTTP client with "
+                  f"{self.max_connections} max connections")
+        limits = httpx.Limits(max_connections=self.max_connections,
+                              max_keepalive_connections=self.max_keepalive)
+        return httpx.Client(auth=basic_auth(self.auth), limits=limits,
+                            follow_redirects=True)
+
+    def request(self, method, url, params=None, json=None, headers=None,
+                stream=False, timeout=None):
+        """Send an HTTP request via the pooled client."""
+        options = _httpx_timeout(timeout)
+        if not stream:
+            return self.client.request(method, url, params=params,
+                                       json=json, headers=headers, **options)
+        request = self.client.build_request(method, url, params=params,
+                                            json=json, headers=headers,
+                                            **options)
+        return HttpxStreamedResponse(self.client.send(request, stream=True))
+
+    def close(self):
+        """Close the HTTP client and release pooled connections."""
+        with self._client_lock:
+            if self._client is not None:
+                log.debug("Closing HTTP client")
+                self._client.close()
+                self._client = None
+
+
+class Http2Transport(Transport):
+    """Synchronous transport multiplexing requests over HTTP/2.
+
+    Requests from all threads are made by an `HttpxAsyncTransport` running
+    on an event loop in a background thread, so that they share a single
+    HTTP/2 connection to the endpoint. (The connections of the synchronous
+    `httpx.Client` may not be shared by threads over HTTP/2.) Requires the
+    `http2` extra.
+
+    HTTP/2 is negotiated with HTTPS endpoints, falling back to HTTP/1.1.
+    Unsetting `http1` uses HTTP/2 without negotiation, including over plain
+    HTTP, e.g. with a `MockGateway` serving HTTP/2. See `HttpxTransport`
+    for the other arguments. Streamed responses are read in full before
+    they are returned.
+    """
+
+    def __init__(self, auth=None, max_connections=None,
+                 max_keepalive=DEFAULT_POOL_MAXSIZE, http1=True):
+        """Initialise a new transport instance."""
+        self.transport = HttpxAsyncTransport(auth=auth,
+                                             max_connections=max_connections,
+                                             max_keepalive=max_keepalive,
+                                             http2=True, http1=http1)
+        self._loop = None
+        self._thread = None
+        self._loop_lock = threading.Lock()
+
+    @property
+    def retryable_exceptions(self):
+        """Get the exceptions raised on connection failures."""
+        return self.transport.retryable_exceptions
+
+    @property
+    def loop(self):
+        """Get the event loop running requests, starting it if required."""
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    import asyncio
+                    _import_httpx("HTTP/2 transport", http2=True)
+                    log.debug("Starting HTTP/2 event loop")
+                    loop = asyncio.new_event_loop()
+                    self._thread = threading.Thread(target=loop.run_forever,
+                                                    name="http2-transport",
+                                                    daemon=True)
+                    self._thread.start()
+                    self._loop = loop
+        return self._loop
+
+    def request(self, method, url, params=None, json=None, headers=None,
+                stream=False, timeout=None):
+        """Send an HTTP request via the event loop."""
+        import asyncio
+        request = self.transport.request(method, url, params=params,
+                                         json=json, headers=headers,
+                                         timeout=timeout)
+        resp = asyncio.run_coroutine_threadsafe(request, self.loop).result()
+        return HttpxStreamedResponse(resp) if stream else resp
+
+    def close(self):
+        """Close the HTTP client and stop the event loop."""
+        import asyncio
+        with self._loop_lock:
+            if self._loop is None:
+                return
+            loop, self._loop = self._loop, None
+            asyncio.run_coroutine_threadsafe(self.transport.close(),
+                                             loop).result()
+            log.debug("Stopping HTTP/2 event loop")
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join()
+            self._thread = None
+            loop.close()
+
+
+class HttpxAsyncTransport(AsyncTransport):
+    """Asynchronous transport using a pooled `httpx.AsyncClient`.
+
+    Requires the optional `httpx` dependency, available via the `async`
+    extra. `max_connections` bounds the number of concurrent connections
+    and `max_keepalive` the number of idle connections kept open. See
+    `HttpxTransport` for the meaning of `http2` and `http1`.
+    """
+
+    def __init__(self, auth=None, max_connections=100, max_keepalive=20,
+                 http2=False, http1=True):
+        """Initialise a new transport instance."""
+        self.auth = auth
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.http2 = http2
+        self.http1 = http1
+        self._client = None
+
+    @property
+    def retryable_exceptions(self):
+        """Get the exceptions raised on connection failures."""
+        import httpx
+        return (httpx.TransportError,)
+
+    @property
+    def client(self):
+        """Get the pooled HTTP client, creating it if required."""
+        if self._client is None:
+            self._client = self._new_client()
+        return self._client
+
+    def _new_client(self):
+        httpx = _import_httpx("asynchronous transport", http2=self.http2)
+        log.debug(f"Creating async HTTP client with http2={self.http2} and "
+                  f"{self.max_connections} max connections")
+        limits = httpx.Limits(max_connections=self.max_connections,
+                              max_keepalive_connections=self.max_keepalive)
+        return httpx.AsyncClient(auth=basic_auth(self.auth), limits=limits,
+                                 http1=self.http1, http2=self.http2,
+                                 follow_redirects=True)
+
+    async def request(self, method, url, params=None, json=None,
+                      headers=None, timeout=None):
+        """Send an HTTP request via the pooled client."""
+        options = _httpx_timeout(timeout)
+        return await self.client.request(method, url, params=params,
+                                         json=json, headers=headers,
+                                         **options)
+
+    async def close(self):
+        """Close the HTTP client and release pooled connections."""
+        if self._client is not None:
+            log.debug("Closing async HTTP client")
+            client, self._client = self._client, None
+            await client.aclose()
@@ -25,3 +25,5 @@ class Zone(BaseObject):
 
     _keys = ("wid", "cdate", "operator", "url", "zone", "default_allow",
              "zone_access", "transport", "passthrough")
+
+    _intern_keys = ("zone", "operator", "transport")
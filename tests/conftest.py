@@ -20,25 +20,120 @@ import click.testing
 from dnsgateway import DnsGatewayClient
 from dnsgateway.client import DEVELOPMENT_ENDPOINT
 from dnsgateway.contact import Contact
+from dnsgateway.testing import MockGateway
+from dnsgateway.transport import AsyncTransport, Transport
 
 import pytest
 
 import requests.exceptions
 
+MOCK_CREDENTIALS = {"username": "test", "password": "test"}
+
 CONTACT_DATA = {"name": "Test Contact", "email": "test@example.com",
                 "phone": "+27.110001111", "city": "Test City",
                 "country": "ZA"}
 
 
+class FakeResponse(object):
+    """Canned HTTP response for offline tests."""
+
+    def __init__(self, data=None, status_code=200, headers=None):
+        """Initialise a new response."""
+        self.data = data
+        self.status_code = status_code
+        self.reason = "OK" if status_code < 400 else "ERROR"
+        self.headers = headers or {}
+
+    def json(self):
+        """Return the response data."""
+        return self.data
+
+    def iter_content(self, chunk_size=1):
+        """Return the serialised response data in chunks."""
+        body = json.dumps(self.data).encode()
+        for i in range(0, len(body), chunk_size):
+            yield body[i:i + chunk_size]
+
+    def close(self):
+        """Release the response."""
+        self.closed = True
+
+    def raise_for_status(self):
+        """Raise HTTPError for error status codes."""
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code}",
+                                                response=self)
+
+
+class FakeTransport(Transport):
+    """Transport that records requests and returns canned responses.
+
+    `handler` is called with `(method, url, params, json)` and must return
+    a `FakeResponse`. Request headers are recorded in `headers`, and
+    timeouts in `timeouts`.
+    """
+
+    def __init__(self, handler):
+        """Initialise a new transport."""
+        self.handler = handler
+        self.calls = []
+        self.headers = []
+        self.timeouts = []
+
+    def request(self, method, url, params=None, json=None, headers=None,
+                stream=False, timeout=None):
+        """Record the request and return the handler response."""
+        self.calls.append((method, url, params, json))
+        self.headers.append(headers)
+        self.timeouts.append(timeout)
+        return self.handler(method, url, params, json)
+
+
+class FakeAsyncTransport(AsyncTransport, FakeTransport):
+    """Asynchronous variant of `FakeTransport`."""
+
+    async def request(self, method, url, params=None, json=None,
+                      headers=None, timeout=None):
+        """Record the request and return the handler response."""
+        return FakeTransport.request(self, method, url, params, json, headers,
+                                     timeout=timeout)
+
+
+def paginate(url, results, page_size=2):
+    """Build paginated list responses for `results`, keyed by URL."""
+    pages = {}
+    for offset in range(0, max(len(results), 1), page_size):
+        page_url = url if offset == 0 else f"{url}?offset={offset}"
+        next_offset = offset + page_size
+        next = f"{url}?offset={next_offset}" \
+            if next_offset < len(results) else None
+        pages[page_url] = {"count": len(results), "next": next,
+                           "previous": None,
+                           "results": results[offset:next_offset]}
+    return pages
+
+
 @pytest.fixture(scope="session")
 def session_id():
     """Generate a unique session id."""
     return f"test-{uuid.uuid4().hex[:8]}"
 
 
+def live():
+    """Check whether to test against the live development environment.
+
+    Set `DNS_GATEWAY_TEST_LIVE` (and provide `credentials.json.secret`) to
+    run the client tests against the development gateway rather than the
+    local mock gateway.
+    """
+    return bool(os.environ.get("DNS_GATEWAY_TEST_LIVE"))
+
+
 @pytest.fixture(scope="session")
 def credentials():
     """Get credentials for the development environment."""
+    if not live():
+        return dict(MOCK_CREDENTIALS)
     credentials_path = os.path.join(os.path.dirname(__file__),
                                     "credentials.json.secret")
     with open(credentials_path) as f:
@@ -47,9 +142,21 @@ def credentials():
 
 
 @pytest.fixture(scope="session")
-def client(credentials):
+def gateway(credentials):
+    """Run a mock gateway for the test session."""
+    with MockGateway(credentials=(credentials["username"],
+                                  credentials["password"])) as gateway:
+        yield gateway
+
+
+@pytest.fixture(scope="session")
+def client(request, credentials):
     """Get an instance of DnsGatewayClient as a test fixture."""
-    api_client = DnsGatewayClient(endpoint=DEVELOPMENT_ENDPOINT, **credentials)
+    if live():
+        endpoint = DEVELOPMENT_ENDPOINT
+    else:
+        endpoint = request.getfixturevalue("gateway").endpoint
+    api_client = DnsGatewayClient(endpoint=endpoint, **credentials)
     return api_client
 
 
@@ -0,0 +1,159 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway asyncio client tests."""
+
+import asyncio
+
+from conftest import FakeAsyncTransport, FakeResponse, paginate
+
+from dnsgateway import AsyncDnsGatewayClient
+from dnsgateway.aio import AsyncDomain
+from dnsgateway.client import DnsGatewayClient
+from dnsgateway.testing import CHARGE, MockGateway, MockRegistry
+
+import pytest
+
+ENDPOINT = "https://gateway.example.net/api"
+DOMAINS = [{"wid": i, "name": f"example-{i}.co.za", "zone": "co.za"}
+           for i in range(5)]
+
+
+def handler(method, url, params, json):
+    """Serve a small domain registry."""
+    pages = paginate(f"{ENDPOINT}/registry/domains/", DOMAINS)
+    if method == "GET" and url in pages:
+        if params and "name" in params:
+            results = [d for d in DOMAINS if d["name"] == params["name"]]
+            return FakeResponse({"count": len(results), "next": None,
+                                 "results": results})
+        return FakeResponse(pages[url])
+    if method == "GET" and url == f"{ENDPOINT}/registry/domains/3":
+        return FakeResponse(dict(DOMAINS[3], autorenew=True))
+    if method == "PUT":
+        return FakeResponse(dict(DOMAINS[3], **json))
+    if method == "DELETE":
+        return FakeResponse({})
+    if method == "POST" and url.endswith("/check/"):
+        return FakeResponse({"results": [{"avail": 1}],
+                             "charge": {"action": {"create": "10.00"}}})
+    return FakeResponse({"detail": "not found"}, status_code=404)
+
+
+class TestAsyncClient(object):
+    """Test cases for the asyncio client."""
+
+    def _run(self, coro_func, **options):
+        async def wrapper():
+            transport = FakeAsyncTransport(handler)
+            async with AsyncDnsGatewayClient(endpoint=ENDPOINT,
+                                             transport=transport,
+                                             **options) as client:
+                return await coro_func(client), transport
+        return asyncio.run(wrapper())
+
+    def test_domains(self):
+        """Test asynchronous domain iteration."""
+        async def list_domains(client):
+            return [d async for d in client.domains]
+        domains, transport = self._run(list_domains)
+        assert [d.wid for d in domains] == [d["wid"] for d in DOMAINS]
+        assert all(isinstance(d, AsyncDomain) for d in domains)
+        assert len(transport.calls) == 3
+
+    def test_domain_lookup(self):
+        """Test domain lookup by name."""
+        async def get_domain(client):
+            return await client.domain(name="example-3.co.za",
+                                       hydrate="eager")
+        domain, transport = self._run(get_domain)
+        assert domain.wid == 3
+        assert domain.autorenew is True
+
+    def test_domain_lookup_lazy(self):
+        """Test single request domain lookup by name."""
+        async def get_domain(client):
+            domain = await client.domain(name="example-3.co.za")
+            with pytest.raises(AttributeError):
+                domain.autorenew
+            return await domain.refresh()
+        domain, transport = self._run(get_domain)
+        assert domain.autorenew is True
+        assert len(transport.calls) == 2
+
+    def test_check_domain(self):
+        """Test domain availability check."""
+        async def check(client):
+            return await client.check_domain(name="example.co.za")
+        charge, _ = self._run(check)
+        assert charge == "10.00"
+
+    def test_object_methods(self):
+        """Test awaitable object update and delete."""
+        async def modify(client):
+            domain = await client.domain(wid=3)
+            await domain.update(autorenew=False)
+            assert domain.autorenew is False
+            with pytest.raises(AttributeError):
+                domain.autorenew = True
+            async with domain.batch():
+                domain.autorenew = True
+                domain.period = 2
+            assert domain.period == 2
+            await domain.delete()
+        _, transport = self._run(modify)
+        assert [c[0] for c in transport.calls] == ["GET", "PUT", "PUT",
+                                                   "DELETE"]
+        assert transport.calls[2][3] == {"autorenew": True, "period": 2}
+
+    @pytest.mark.parametrize("coalesce", (False, True))
+    def test_concurrent(self, coalesce):
+        """Test many in-flight requests on one event loop."""
+        async def gather(client):
+            domains = await asyncio.gather(*(client.domain(wid=3)
+                                             for _ in range(50)))
+            return domains, client.stats.coalesced
+        (domains, coalesced), transport = self._run(gather,
+                                                    coalesce=coalesce)
+        assert len(domains) == 50
+        assert all(d.autorenew is True for d in domains)
+        assert len(transport.calls) == (1 if coalesce else 50)
+        assert coalesced == (49 if coalesce else 0)
+
+    def test_shared_payloads(self):
+        """Test that both clients build identical request payloads."""
+        sync = DnsGatewayClient._contact_details(id="TEST", name="Test")
+        aio = AsyncDnsGatewayClient._contact_details(id="TEST", name="Test")
+        assert sync == aio
+
+    def test_domains_prefetch(self):
+        """Test asynchronous domain iteration with prefetching."""
+        async def list_domains(client):
+            client.prefetch = 3
+            return [d async for d in client.domains]
+        domains, transport = self._run(list_domains)
+        assert [d.wid for d in domains] == [d["wid"] for d in DOMAINS]
+        assert len(transport.calls) == 3
+
+    def test_renew(self):
+        """Test asynchronous domain renewal against the mock gateway."""
+        registry = MockRegistry().seed(domains=1)
+        expiry = registry.get("domains", 1)["curExpDate"]
+
+        async def renew(endpoint):
+            async with AsyncDnsGatewayClient(endpoint=endpoint) as client:
+                domain = await client.domain(wid=1)
+                return await domain.renew(charge=CHARGE)
+        with MockGateway(registry) as gateway:
+            domain = asyncio.run(renew(gateway.endpoint))
+        assert domain.curExpDate > expiry
+        assert domain.curExpDate == registry.get("domains", 1)["curExpDate"]
+        assert gateway.requests[("POST", "renew")] == 1
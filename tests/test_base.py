@@ -0,0 +1,144 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway model object tests."""
+
+import json
+import logging
+
+from conftest import FakeResponse, FakeTransport
+
+from dnsgateway import DnsGatewayClient
+from dnsgateway.aio import AsyncDomain
+from dnsgateway.contact import Contact
+from dnsgateway.domain import Domain
+from dnsgateway.zone import Zone
+
+import pytest
+
+import requests
+
+RECORD = {"wid": 1, "name": "example.co.za", "zone": "co.za",
+          "statuses": [{"status": "ok"}], "unknown": True}
+
+
+class TestObjects(object):
+    """Test cases for compact model objects."""
+
+    @pytest.mark.parametrize("cls", (Domain, Contact, Zone, AsyncDomain))
+    def test_slots(self, cls):
+        """Test that objects carry no instance dictionary."""
+        obj = cls(client=None, wid=1)
+        assert not hasattr(obj, "__dict__")
+        assert set(cls._keys) <= set(dir(obj))
+
+    def test_properties(self):
+        """Test property access and serialisation."""
+        domain = Domain(client=None, **RECORD)
+        assert domain.name == RECORD["name"]
+        assert domain._properties == {k: v for k, v in RECORD.items()
+                                      if k != "unknown"}
+        assert json.loads(repr(domain)) == domain._properties
+        domain._update_properties(wid=1, name="other.co.za")
+        assert domain._properties == {"wid": 1, "name": "other.co.za"}
+
+    def test_missing(self, caplog):
+        """Test that missing properties raise quietly."""
+        domain = Domain(client=None, **RECORD)
+        with caplog.at_level(logging.DEBUG):
+            with pytest.raises(AttributeError):
+                domain.expiry
+            assert getattr(domain, "hosts", None) is None
+        assert not caplog.records
+
+    def test_lazy_without_wid(self):
+        """Test that a lazy object without a wid is not refreshed."""
+        transport = FakeTransport(lambda *args: FakeResponse({}))
+        client = DnsGatewayClient(endpoint="https://gateway.example.net/api",
+                                  transport=transport)
+        domain = Domain(client=client, lazy=True, name="example.co.za")
+        for name in ("wid", "path", "hosts"):
+            with pytest.raises(AttributeError):
+                getattr(domain, name)
+        assert not transport.calls
+
+    def test_interning(self):
+        """Test optional interning of repeated strings."""
+        class InternedDomain(Domain):
+            intern_strings = True
+        first, second = (InternedDomain(client=None, **json.loads(
+            json.dumps(RECORD))) for _ in range(2))
+        assert first.zone is second.zone
+        assert first.statuses[0]["status"] is second.statuses[0]["status"]
+        first, second = (Domain(client=None, **json.loads(
+            json.dumps(RECORD))) for _ in range(2))
+        assert first.zone is not second.zone
+
+
+class TestChangeSets(object):
+    """Test cases for staged, batched updates."""
+
+    def _domain(self, failures=0):
+        def handler(method, url, params, json):
+            if len(transport.calls) <= failures:
+                return FakeResponse({"detail": "invalid"}, status_code=400)
+            return FakeResponse(dict(RECORD, **json))
+        transport = FakeTransport(handler)
+        client = DnsGatewayClient(endpoint="https://gateway.example.net/api",
+                                  transport=transport)
+        return Domain(client=client, **RECORD), transport
+
+    def test_batch(self):
+        """Test that changes in a batch are sent in one update."""
+        domain, transport = self._domain()
+        with domain.batch():
+            domain.autorenew = True
+            domain.period = 2
+            domain.zone = "co.za"
+            assert domain.dirty == {"autorenew": True, "period": 2}
+            assert not transport.calls
+        assert len(transport.calls) == 1
+        assert transport.calls[0][0] == "PUT"
+        assert transport.calls[0][3] == {"autorenew": True, "period": 2}
+        assert domain.autorenew is True
+        assert domain.dirty == {}
+
+    def test_unchanged(self):
+        """Test that saving unchanged values makes no request."""
+        domain, transport = self._domain()
+        domain.stage(name=RECORD["name"], zone="co.za").save()
+        assert not transport.calls
+        with pytest.raises(AttributeError):
+            domain.stage(unknown=1)
+
+    def test_discard(self):
+        """Test that a failed batch discards its changes."""
+        domain, transport = self._domain()
+        with pytest.raises(ValueError):
+            with domain.batch():
+                domain.autorenew = True
+                raise ValueError
+        assert not transport.calls
+        domain.autorenew = False
+        assert transport.calls[0][3] == {"autorenew": False}
+
+    def test_failed_save(self):
+        """Test that a failed save stops staging but keeps the changes."""
+        domain, transport = self._domain(failures=1)
+        with pytest.raises(requests.exceptions.HTTPError):
+            with domain.batch():
+                domain.autorenew = True
+        assert domain.dirty == {"autorenew": True}
+        domain.period = 2
+        assert transport.calls[1][3] == {"period": 2}
+        domain.save()
+        assert transport.calls[2][3] == {"autorenew": True}
+        assert domain.dirty == {}
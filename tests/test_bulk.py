@@ -0,0 +1,127 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway bulk provisioning tests."""
+
+import io
+
+from conftest import FakeResponse, FakeTransport
+
+from dnsgateway import DnsGatewayClient
+from dnsgateway.bulk import ChargeCeiling, domain_row, read_rows
+
+import pytest
+
+ENDPOINT = "https://gateway.example.net/api"
+CSV = """name,period,autorenew,hosts
+free-1.co.za,2,yes,"ns1.example.net, ns2.example.net"
+
+taken.co.za,,,
+free-2.co.za,,,
+"""
+NDJSON = '{"name": "free-1.co.za"}\n\n{"name": "free-2.co.za"}\n'
+YAML = "- name: free-1.co.za\n- name: free-2.co.za\n"
+
+
+class TestRows(object):
+    """Test cases for reading bulk rows."""
+
+    @pytest.mark.parametrize("format, text", (("csv", CSV),
+                                              ("ndjson", NDJSON),
+                                              ("yaml", YAML)))
+    def test_read(self, format, text):
+        """Test reading rows in each format."""
+        rows = [domain_row(row) for row in read_rows(io.StringIO(text),
+                                                     format)]
+        assert rows[0]["name"] == "free-1.co.za"
+        assert rows[-1] == {"name": "free-2.co.za"}
+
+    def test_normalise(self):
+        """Test conversion of text fields and defaults."""
+        row = next(read_rows(io.StringIO(CSV), "csv"))
+        assert domain_row(row, admin="C1", period=1) == {
+            "name": "free-1.co.za", "period": 2, "autorenew": True,
+            "hosts": ["ns1.example.net", "ns2.example.net"], "admin": "C1"
+        }
+        with pytest.raises(ValueError):
+            domain_row({"name": "x.co.za", "colour": "blue"})
+        with pytest.raises(ValueError):
+            domain_row({"period": 1})
+
+    def test_ceiling(self):
+        """Test per-item and total charge limits."""
+        ceiling = ChargeCeiling(max_charge="10", max_total="15")
+        assert ceiling.reserve("10.00") is None
+        assert ceiling.reserve("10.01") is not None
+        assert ceiling.reserve("6.00") is not None
+        ceiling.release("10.00")
+        assert ceiling.reserve("6.00") is None
+        assert ceiling.total == 6
+
+
+class TestCreateDomains(object):
+    """Test cases for concurrent bulk creation."""
+
+    def _client(self):
+        def handler(method, url, params, json):
+            if url.endswith("/check/"):
+                avail = int(json["name"].startswith("free"))
+                return FakeResponse({"results": [{"avail": avail}],
+                                     "charge": {"action":
+                                                {"create": "10.00"}}})
+            if json["name"] == "free-3.co.za":
+                return FakeResponse({"detail": "invalid"}, status_code=400)
+            return FakeResponse(dict(json, wid=len(transport.calls)))
+        transport = FakeTransport(handler)
+        client = DnsGatewayClient(endpoint=ENDPOINT, transport=transport)
+        return client, transport
+
+    def test_create_domains(self):
+        """Test results for created, unavailable and failed rows."""
+        client, transport = self._client()
+        rows = read_rows(io.StringIO(CSV + "free-3.co.za,,,\n"), "csv")
+        results = {r["name"]: r for r in client.create_domains(
+            rows, workers=2, admin="C1", registrant="C1",
+            billing="C1", tech="C1")}
+        assert results["free-1.co.za"]["status"] == "created"
+        assert results["free-1.co.za"]["charge"] == "10.00"
+        assert isinstance(results["free-2.co.za"]["wid"], int)
+        assert results["taken.co.za"]["status"] == "unavailable"
+        assert results["free-3.co.za"]["status"] == "failed"
+        assert sorted(r["row"] for r in results.values()) == [0, 1, 2, 3]
+        creates = [c for c in transport.calls
+                   if not c[1].endswith("/check/")]
+        assert {"type": "admin", "contact": {"id": "C1"}} in \
+            creates[0][3]["contacts"]
+
+    def test_ceiling(self):
+        """Test that rows over the charge ceiling are rejected."""
+        client, transport = self._client()
+        rows = [{"name": f"free-{i}.co.za"} for i in (3, 1, 2, 4)]
+        ceiling = ChargeCeiling(max_total="20")
+        statuses = sorted(r["status"] for r in client.create_domains(
+            rows, workers=1, ceiling=ceiling))
+        assert statuses == ["created", "created", "failed", "rejected"]
+        assert ceiling.total == 20
+
+    def test_create_domain_row(self):
+        """Test checking and creating the domain for a single row."""
+        client, transport = self._client()
+        ceiling = ChargeCeiling(max_charge="10")
+        result = client.create_domain_row({"name": "free-1.co.za"}, ceiling,
+                                          index=7, defaults={"period": 2})
+        assert result == {"row": 7, "name": "free-1.co.za",
+                          "status": "created", "charge": "10.00",
+                          "wid": 2}
+        assert transport.calls[-1][3]["period"] == 2
+        result = client.create_domain_row({"name": "taken.co.za"}, ceiling)
+        assert result["status"] == "unavailable"
+        assert ceiling.total == 10
@@ -0,0 +1,157 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway response cache tests."""
+
+from conftest import FakeResponse, FakeTransport
+
+from dnsgateway import DnsGatewayClient
+from dnsgateway.cache import ResponseCache
+
+ENDPOINT = "https://gateway.example.net/api"
+DOMAIN = {"wid": 1, "name": "example.co.za", "zone": "co.za",
+          "curExpDate": "2020-01-01"}
+
+
+class TestResponseCache(object):
+    """Test cases for the response cache."""
+
+    def _client(self, headers=None, **kwargs):
+        now = [0.0]
+
+        def handler(method, url, params, json):
+            if transport.headers[-1]:
+                return FakeResponse(None, status_code=304)
+            if method == "PUT":
+                return FakeResponse(dict(DOMAIN, **json))
+            if method == "POST" and url.endswith("/renew/"):
+                return FakeResponse(dict(DOMAIN, curExpDate="2021-01-01"))
+            if method == "POST":
+                return FakeResponse({"results": [{"avail": 0}]})
+            if url.endswith("/domains/"):
+                return FakeResponse({"count": 1, "next": None,
+                                     "results": [DOMAIN]}, headers=headers)
+            return FakeResponse(dict(DOMAIN), headers=headers)
+        transport = FakeTransport(handler)
+        cache = ResponseCache(clock=lambda: now[0], **kwargs)
+        client = DnsGatewayClient(endpoint=ENDPOINT, transport=transport,
+                                  cache=cache)
+        return client, transport, now
+
+    def test_hit(self):
+        """Test that fresh responses are served from the cache."""
+        client, transport, now = self._client()
+        first = client.domain(wid=1)
+        second = client.domain(wid=1)
+        assert first.name == second.name == DOMAIN["name"]
+        assert len(transport.calls) == 1
+        now[0] = 10
+        client.domain(wid=1)
+        assert len(transport.calls) == 2
+        assert client.cache.hits == 1
+
+    def test_key(self):
+        """Test cache keys of requests with sequences of parameter values."""
+        key = ResponseCache.key(ENDPOINT, {"zone": ["co.za", "org.za"],
+                                           "name": "example"})
+        assert key == ResponseCache.key(ENDPOINT, {"name": "example",
+                                                   "zone": ("co.za",
+                                                            "org.za")})
+        assert key != ResponseCache.key(ENDPOINT, {"zone": "co.za",
+                                                   "name": "example"})
+        client, transport, now = self._client()
+        for _ in range(2):
+            client._get(path="registry/domains/1",
+                        params={"zone": ["co.za", "org.za"]})
+        assert len(transport.calls) == 1
+
+    def test_ttls(self):
+        """Test per-resource TTLs."""
+        cache = ResponseCache()
+        assert cache.ttl("/api/registry/zones/") == 6 * 60 * 60
+        assert cache.ttl("/api/registry/domains/1") == 5
+        assert cache.ttl("/api/registry/domains/check/") == 5
+        assert cache.ttl("/api/other/") == 0
+
+    def test_not_shared(self):
+        """Test that cached data is not shared between callers."""
+        client, transport, now = self._client()
+        client._get(path="registry/domains/1")["name"] = "mutated"
+        assert client._get(path="registry/domains/1")["name"] == \
+            DOMAIN["name"]
+
+    def test_invalidation(self):
+        """Test that updates invalidate the object and its collection."""
+        client, transport, now = self._client()
+        list(client.domains)
+        domain = client.domain(wid=1)
+        client._get(path="registry/zones/")
+        assert len(client.cache) == 3
+        domain.update(autorenew=True)
+        assert len(client.cache) == 1
+        client.check_domains(["example.co.za"])
+        assert len(client.cache) == 1
+
+    def test_sub_resource_invalidation(self):
+        """Test that sub-resource writes invalidate their parent object."""
+        client, transport, now = self._client()
+        list(client.domains)
+        domain = client.domain(wid=1)
+        client._get(path="registry/zones/")
+        domain.renew(charge=10)
+        assert domain.curExpDate == "2021-01-01"
+        assert len(client.cache) == 1
+        client.domain(wid=1)
+        assert [c[:2] for c in transport.calls[-2:]] == [
+            ("POST", f"{ENDPOINT}/registry/domains/1/renew/"),
+            ("GET", f"{ENDPOINT}/registry/domains/1"),
+        ]
+        assert ResponseCache.stale_paths("/api/registry/domains/1/renew/") \
+            >= {"/api/registry/domains/1", "/api/registry/domains/"}
+
+    def test_racing_read(self):
+        """Test that reads completing during a write are not left cached."""
+        client, transport, now = self._client()
+        handler = transport.handler
+
+        def racing(method, url, params, json):
+            if method == "PUT":
+                client.domain(wid=1)
+            return handler(method, url, params, json)
+        transport.handler = racing
+        domain = client.domain(wid=1)
+        domain.update(autorenew=True)
+        assert len(client.cache) == 0
+        client.domain(wid=1)
+        assert [c[0] for c in transport.calls] == ["GET", "PUT", "GET", "GET"]
+
+    def test_revalidation(self):
+        """Test conditional requests for expired entries."""
+        client, transport, now = self._client(headers={"ETag": '"v1"'})
+        client.domain(wid=1)
+        now[0] = 10
+        assert client.domain(wid=1).name == DOMAIN["name"]
+        assert transport.headers == [None, {"If-None-Match": '"v1"'}]
+        assert client.cache.revalidations == 1
+
+    def test_lru_bounds(self):
+        """Test eviction by entry count and size."""
+        client, transport, now = self._client(max_entries=2)
+        for wid in range(3):
+            client._get(path=f"registry/domains/{wid}")
+        assert len(client.cache) == 2
+        client._get(path="registry/domains/0")
+        assert len(transport.calls) == 4
+        client, transport, now = self._client(max_bytes=100)
+        for wid in range(3):
+            client._get(path=f"registry/domains/{wid}")
+        assert client.cache.size <= 100
+        assert len(client.cache) == 1
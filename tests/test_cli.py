@@ -11,10 +11,11 @@
 # the License.
 """dnsgateway cli tests."""
 
-from unittest.mock import DEFAULT, PropertyMock, patch
+from unittest.mock import DEFAULT, patch
 
 from dnsgateway.__meta__ import __version__ as version
 from dnsgateway.cli import main
+from dnsgateway.domain import Domain
 
 import pytest
 
@@ -57,33 +58,80 @@ class TestCli(object):
     @pytest.mark.parametrize("exc", ((DEFAULT,), Exception))
     def test_domain_list(self, cli, credentials, exc):
         """Test domain list command."""
-        with patch("dnsgateway.cli.DnsGatewayClient.domains",
-                   new_callable=PropertyMock) as m:
-            m.return_value = DOMAINS
+        with patch("dnsgateway.client.DnsGatewayClient.pages") as m:
+            m.return_value = [DOMAINS]
             m.side_effect = exc
             result = cli.invoke(main, ("-u", credentials["username"],
                                        "-p", credentials["password"],
                                        "--dev", "domain", "list"))
-            m.assert_called_once_with()
+            m.assert_called_once_with("domains")
         assert self._check_result(DOMAIN, exc, result)
 
+    def test_domain_list_output(self, cli, credentials):
+        """Test projected NDJSON output of the domain list command."""
+        domains = [Domain(client=None, wid=1, name=NAME)]
+        with patch("dnsgateway.client.DnsGatewayClient.pages") as m:
+            m.return_value = [domains]
+            result = cli.invoke(main, ("-u", credentials["username"],
+                                       "-p", credentials["password"],
+                                       "--dev", "domain", "list",
+                                       "-o", "ndjson", "--fields", "name"))
+        assert result.exit_code == 0
+        assert result.output == f'{{"name":"{NAME}"}}\n'
+        result = cli.invoke(main, ("--dev", "domain", "list",
+                                   "--fields", "colour"))
+        assert result.exit_code == 2
+
+    def test_metrics_file(self, cli, credentials, gateway, tmp_path):
+        """Test writing request metrics on exit."""
+        path = tmp_path / "gateway.prom"
+        result = cli.invoke(main, ("-u", credentials["username"],
+                                   "-p", credentials["password"],
+                                   "--endpoint-url", gateway.endpoint,
+                                   "--metrics-file", str(path),
+                                   "zone", "list", "-o", "ndjson"))
+        assert result.exit_code == 0
+        assert 'dnsgateway_pages_total{path="registry/zones/"} 1' \
+            in path.read_text()
+
+    @pytest.mark.parametrize("transport", ("requests", "httpx", "http2"))
+    def test_transport(self, cli, credentials, gateway, transport):
+        """Test selecting the HTTP transport."""
+        result = cli.invoke(main, ("-u", credentials["username"],
+                                   "-p", credentials["password"],
+                                   "--endpoint-url", gateway.endpoint,
+                                   "--transport", transport,
+                                   "zone", "list", "-o", "ndjson"))
+        assert result.exit_code == 0
+        assert '"zone":"co.za"' in result.output
+
+    @pytest.mark.parametrize("deadline,exit_code", (("30", 0), ("0", 1)))
+    def test_deadline(self, cli, credentials, gateway, deadline, exit_code):
+        """Test bounding the time taken by a command."""
+        result = cli.invoke(main, ("-u", credentials["username"],
+                                   "-p", credentials["password"],
+                                   "--endpoint-url", gateway.endpoint,
+                                   "--timeout", "5", "--deadline", deadline,
+                                   "zone", "list", "-o", "ndjson"))
+        assert result.exit_code == exit_code
+
     @pytest.mark.parametrize("exc", ((DEFAULT,), Exception))
     def test_domain_show(self, cli, credentials, exc):
         """Test domain show command."""
-        with patch("dnsgateway.cli.DnsGatewayClient", autospec=True) as m:
+        with patch("dnsgateway.client.DnsGatewayClient", autospec=True) as m:
             client = m.return_value
             client.domain.return_value = DOMAIN
             client.domain.side_effect = exc
             result = cli.invoke(main, ("-u", credentials["username"],
                                        "-p", credentials["password"],
                                        "--dev", "domain", "show", NAME))
-            client.domain.assert_called_once_with(name=NAME)
+            client.domain.assert_called_once_with(name=NAME, hydrate="eager")
         assert self._check_result(DOMAIN, exc, result)
 
     @pytest.mark.parametrize("exc", ((DEFAULT,), Exception))
     def test_domain_check(self, cli, credentials, exc):
         """Test domain check command."""
-        with patch("dnsgateway.cli.DnsGatewayClient", autospec=True) as m:
+        with patch("dnsgateway.client.DnsGatewayClient", autospec=True) as m:
             client = m.return_value
             client.check_domain.return_value = CHARGE
             client.check_domain.side_effect = exc
@@ -93,11 +141,60 @@ class TestCli(object):
             client.check_domain.assert_called_once_with(name=NAME, op="create")
         assert self._check_result(CHARGE, exc, result)
 
+    @pytest.mark.parametrize("exc", ((DEFAULT,), Exception))
+    def test_domain_check_file(self, cli, credentials, exc):
+        """Test domain check command reading names from stdin."""
+        with patch("dnsgateway.client.DnsGatewayClient", autospec=True) as m:
+            client = m.return_value
+            client.check_domains.return_value = {NAME: CHARGE}
+            client.check_domains.side_effect = exc
+            result = cli.invoke(main, ("-u", credentials["username"],
+                                       "-p", credentials["password"],
+                                       "--dev", "domain", "check", "-f", "-"),
+                                input=f"# names\n{NAME}\n\n")
+            names = client.check_domains.call_args[0][0]
+            assert client.check_domains.call_args[1] == {"op": "create"}
+        if exc is not Exception:
+            assert list(names) == [NAME]
+        assert self._check_result(f"{NAME}\t{CHARGE}", exc, result)
+
+    @pytest.mark.parametrize("exc", ((DEFAULT,), Exception))
+    def test_domain_bulk_create(self, cli, credentials, exc, tmp_path):
+        """Test domain bulk-create command."""
+        rows = tmp_path / "rows.csv"
+        rows.write_text(f"name,period\n{NAME},2\n")
+        output = tmp_path / "results.ndjson"
+        read = []
+
+        def create_domains(rows, **kwargs):
+            read.extend(rows)
+            return [{"row": 0, "name": NAME, "status": "created", "wid": 1}]
+        with patch("dnsgateway.client.DnsGatewayClient", autospec=True) as m:
+            client = m.return_value
+            client.create_domains.side_effect = create_domains \
+                if exc is not Exception else exc
+            result = cli.invoke(main, ("-u", credentials["username"],
+                                       "-p", credentials["password"],
+                                       "--dev", "domain", "bulk-create",
+                                       str(rows), "-o", str(output),
+                                       "--max-total", "100",
+                                       "--admin", CONTACT_ID))
+            args, kwargs = client.create_domains.call_args
+            assert kwargs["admin"] == CONTACT_ID
+            assert kwargs["ceiling"].max_total == 100
+        assert self._check_result("1 created (total charge 0)", exc, result)
+        if exc is not Exception:
+            assert read == [{"name": NAME, "period": "2"}]
+            assert '"status": "created"' in output.read_text()
+        result = cli.invoke(main, ("--dev", "domain", "bulk-create",
+                                   str(rows)))
+        assert result.exit_code == 2
+
     @pytest.mark.parametrize("exc_check", ((DEFAULT,), Exception))
     @pytest.mark.parametrize("exc_create", ((DEFAULT,), Exception))
     def test_domain_create(self, cli, credentials, exc_check, exc_create):
         """Test domain create command."""
-        with patch("dnsgateway.cli.DnsGatewayClient", autospec=True) as m:
+        with patch("dnsgateway.client.DnsGatewayClient", autospec=True) as m:
             client = m.return_value
             client.check_domain.return_value = CHARGE
             client.check_domain.side_effect = exc_check
@@ -131,7 +228,7 @@ class TestCli(object):
     @pytest.mark.parametrize("exc", ((DEFAULT,), Exception))
     def test_domain_delete(self, cli, credentials, exc):
         """Test domain delete command."""
-        with patch("dnsgateway.cli.DnsGatewayClient", autospec=True) as m:
+        with patch("dnsgateway.client.DnsGatewayClient", autospec=True) as m:
             client = m.return_value
             domain = client.domain.return_value
             domain.delete.side_effect = exc
@@ -145,33 +242,33 @@ class TestCli(object):
     @pytest.mark.parametrize("exc", ((DEFAULT,), Exception))
     def test_contact_list(self, cli, credentials, exc):
         """Test contact list command."""
-        with patch("dnsgateway.cli.DnsGatewayClient.contacts",
-                   new_callable=PropertyMock) as m:
-            m.return_value = CONTACTS
+        with patch("dnsgateway.client.DnsGatewayClient.pages") as m:
+            m.return_value = [CONTACTS]
             m.side_effect = exc
             result = cli.invoke(main, ("-u", credentials["username"],
                                        "-p", credentials["password"],
                                        "--dev", "contact", "list"))
-            m.assert_called_once_with()
+            m.assert_called_once_with("contacts")
         assert self._check_result(CONTACT, exc, result)
 
     @pytest.mark.parametrize("exc", ((DEFAULT,), Exception))
     def test_contact_show(self, cli, credentials, exc):
         """Test contact show command."""
-        with patch("dnsgateway.cli.DnsGatewayClient", autospec=True) as m:
+        with patch("dnsgateway.client.DnsGatewayClient", autospec=True) as m:
             client = m.return_value
             client.contact.return_value = CONTACT
             client.contact.side_effect = exc
             result = cli.invoke(main, ("-u", credentials["username"],
                                        "-p", credentials["password"],
                                        "--dev", "contact", "show", CONTACT_ID))
-            client.contact.assert_called_once_with(id=CONTACT_ID)
+            client.contact.assert_called_once_with(id=CONTACT_ID,
+                                                   hydrate="eager")
         assert self._check_result(CONTACT, exc, result)
 
     @pytest.mark.parametrize("exc", ((DEFAULT,), Exception))
     def test_contact_create(self, cli, credentials, exc):
         """Test contact create command."""
-        with patch("dnsgateway.cli.DnsGatewayClient", autospec=True) as m:
+        with patch("dnsgateway.client.DnsGatewayClient", autospec=True) as m:
             client = m.return_value
             client.create_contact.return_value = CONTACT
             client.create_contact.side_effect = exc
@@ -202,7 +299,7 @@ class TestCli(object):
     @pytest.mark.parametrize("exc", ((DEFAULT,), Exception))
     def test_contact_delete(self, cli, credentials, exc):
         """Test contact delete command."""
-        with patch("dnsgateway.cli.DnsGatewayClient", autospec=True) as m:
+        with patch("dnsgateway.client.DnsGatewayClient", autospec=True) as m:
             client = m.return_value
             contact = client.contact.return_value
             contact.delete.side_effect = exc
@@ -216,12 +313,27 @@ class TestCli(object):
     @pytest.mark.parametrize("exc", ((DEFAULT,), Exception))
     def test_zone_list(self, cli, credentials, exc):
         """Test zone list command."""
-        with patch("dnsgateway.cli.DnsGatewayClient.zones",
-                   new_callable=PropertyMock) as m:
-            m.return_value = ZONES
+        with patch("dnsgateway.client.DnsGatewayClient.pages") as m:
+            m.return_value = [ZONES]
             m.side_effect = exc
             result = cli.invoke(main, ("-u", credentials["username"],
                                        "-p", credentials["password"],
                                        "--dev", "zone", "list"))
-            m.assert_called_once_with()
+            m.assert_called_once_with("zones")
         assert self._check_result(ZONE, exc, result)
+
+    @pytest.mark.parametrize("exc", ((DEFAULT,), Exception))
+    def test_mirror_sync(self, cli, credentials, exc, tmp_path):
+        """Test mirror sync command."""
+        with patch("dnsgateway.mirror.Mirror", autospec=True) as m:
+            mirror = m.return_value.__enter__.return_value
+            mirror.sync.return_value = {"zones": {"added": 1}}
+            mirror.sync.side_effect = exc
+            database = str(tmp_path / "mirror.sqlite3")
+            result = cli.invoke(main, ("-u", credentials["username"],
+                                       "-p", credentials["password"],
+                                       "--dev", "mirror", "-d", database,
+                                       "sync", "--table", "zones"))
+            mirror.sync.assert_called_once_with(tables=("zones",),
+                                                detail=False)
+        assert self._check_result("zones: 1 added", exc, result)
@@ -0,0 +1,228 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway client transport tests."""
+
+import threading
+from unittest.mock import patch
+
+from conftest import FakeResponse, FakeTransport, paginate
+
+from dnsgateway import DnsGatewayClient
+
+import pytest
+
+import requests
+
+
+class TestSession(object):
+    """Test cases for pooled HTTP session handling."""
+
+    def test_session_reused(self):
+        """Test that a single session is shared across requests."""
+        client = DnsGatewayClient(username="user", password="pass")
+        session = client.transport.session
+        assert isinstance(session, requests.Session)
+        assert client.transport.session is session
+        assert session.auth == ("user", "pass")
+
+    def test_session_pool_size(self):
+        """Test that the connection pool is configured per host."""
+        client = DnsGatewayClient(pool_connections=2, pool_maxsize=32)
+        adapter = client.transport.session.get_adapter(client.endpoint)
+        assert adapter._pool_connections == 2
+        assert adapter._pool_maxsize == 32
+
+    def test_session_thread_safe(self):
+        """Test that concurrent first use creates exactly one session."""
+        client = DnsGatewayClient()
+        sessions = []
+
+        def get_session():
+            sessions.append(client.transport.session)
+
+        threads = [threading.Thread(target=get_session) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert all(s is sessions[0] for s in sessions)
+
+    def test_request_uses_session(self):
+        """Test that requests are sent via the pooled session."""
+        client = DnsGatewayClient()
+        with patch.object(requests.Session, "request") as m:
+            m.return_value.json.return_value = {"ok": True}
+            assert client._get(path="registry/zones/") == {"ok": True}
+            assert client._get(path="registry/zones/") == {"ok": True}
+        assert m.call_count == 2
+        url = m.call_args[0][1]
+        assert url == f"{client.endpoint}/registry/zones/"
+
+    def test_close(self):
+        """Test that closing the client releases the session."""
+        with DnsGatewayClient() as client:
+            session = client.transport.session
+            with patch.object(session, "close") as m:
+                client.close()
+                m.assert_called_once_with()
+            assert client.transport.session is not session
+        assert client.transport._session is None
+
+
+class TestPagination(object):
+    """Test cases for collection page fetching."""
+
+    url = "https://gateway.example.net/api/registry/domains/"
+    results = [{"wid": i, "name": f"example-{i}.co.za"} for i in range(9)]
+
+    def _client(self, pages, prefetch):
+        def handler(method, url, params, json):
+            return FakeResponse(pages[url])
+        transport = FakeTransport(handler)
+        client = DnsGatewayClient(endpoint="https://gateway.example.net/api",
+                                  transport=transport, prefetch=prefetch)
+        return client, transport
+
+    @pytest.mark.parametrize("prefetch", (0, 1, 3, 10))
+    def test_offset_pages(self, prefetch):
+        """Test parallel fetching of offset paginated collections."""
+        client, transport = self._client(paginate(self.url, self.results),
+                                         prefetch)
+        assert [d.wid for d in client.domains] == list(range(9))
+        assert len(transport.calls) == 5
+
+    def test_cursor_pages(self):
+        """Test pipelined fetching of link paginated collections."""
+        pages = {}
+        for i in range(0, 9, 2):
+            url = self.url if i == 0 else f"{self.url}?cursor={i}"
+            next = f"{self.url}?cursor={i + 2}" if i + 2 < 9 else None
+            pages[url] = {"count": 9, "next": next,
+                          "results": self.results[i:i + 2]}
+        assert DnsGatewayClient._page_urls(pages[self.url]) is None
+        client, transport = self._client(pages, 4)
+        assert [d.wid for d in client.domains] == list(range(9))
+        assert len(transport.calls) == 5
+
+    def test_page_urls(self):
+        """Test computation of remaining page URLs."""
+        data = {"count": 25, "results": [{}] * 10,
+                "next": f"{self.url}?limit=10&offset=10&zone=co.za"}
+        urls = DnsGatewayClient._page_urls(data)
+        assert urls == [f"{self.url}?limit=10&offset=10&zone=co.za",
+                        f"{self.url}?limit=10&offset=20&zone=co.za"]
+        data = {"count": 25, "results": [{}] * 10,
+                "next": f"{self.url}?page=2"}
+        assert DnsGatewayClient._page_urls(data) == [f"{self.url}?page=2",
+                                                     f"{self.url}?page=3"]
+
+    def test_early_exit(self):
+        """Test that abandoning iteration stops fetching."""
+        client, transport = self._client(paginate(self.url, self.results), 2)
+        domains = client.domains
+        assert next(domains).wid == 0
+        domains.close()
+        assert len(transport.calls) <= 3
+
+
+class TestCheck(object):
+    """Test cases for domain availability checks."""
+
+    def _handler(self, method, url, params, json):
+        names = json["name"]
+        if isinstance(names, str):
+            names = [names]
+        results = [{"name": name, "avail": 0 if "taken" in name else 1}
+                   for name in names]
+        return FakeResponse({"results": results,
+                             "charge": {"action": {"create": "10.00",
+                                                   "renew": "8.00"}}})
+
+    def test_check_domain(self):
+        """Test single name check."""
+        client = DnsGatewayClient(transport=FakeTransport(self._handler))
+        assert client.check_domain(name="example.co.za") == "10.00"
+        assert client.check_domain(name="taken.co.za") is False
+        assert client.check_domain(name="taken.co.za", op="renew") == "8.00"
+        with pytest.raises(KeyError):
+            client.check_domain(name="example.co.za", op="restore")
+
+    def test_check_domains(self):
+        """Test batched name checks."""
+        transport = FakeTransport(self._handler)
+        client = DnsGatewayClient(transport=transport)
+        names = [f"example-{i}.co.za" for i in range(25)] + ["taken.co.za"]
+        charges = client.check_domains(iter(names), op="renew")
+        assert list(charges) == names
+        # Registered names can be renewed
+        assert all(charges[name] == "8.00" for name in names)
+        assert [len(call[3]["name"]) for call in transport.calls] == \
+            [10, 10, 6]
+
+
+class TestLookup(object):
+    """Test cases for domain and contact lookups."""
+
+    endpoint = "https://gateway.example.net/api"
+    summary = {"wid": 1, "name": "example.co.za", "zone": "co.za"}
+    detail = dict(summary, hosts=[], contacts=[], statuses=[], events=[],
+                  autorenew=True)
+
+    def _client(self, result, **kwargs):
+        def handler(method, url, params, json):
+            if url.endswith("/"):
+                return FakeResponse({"count": 1, "next": None,
+                                     "results": [result]})
+            return FakeResponse(self.detail)
+        transport = FakeTransport(handler)
+        return DnsGatewayClient(endpoint=self.endpoint, transport=transport,
+                                **kwargs), transport
+
+    def test_lazy(self):
+        """Test that details are fetched on first access."""
+        client, transport = self._client(self.summary)
+        domain = client.domain(name="example.co.za")
+        assert domain.wid == 1
+        assert len(transport.calls) == 1
+        assert domain.autorenew is True
+        assert domain.hosts == []
+        assert len(transport.calls) == 2
+
+    def test_eager(self):
+        """Test that details are fetched before returning."""
+        client, transport = self._client(self.summary, hydrate="eager")
+        domain = client.domain(name="example.co.za")
+        assert len(transport.calls) == 2
+        assert domain.autorenew is True
+        with pytest.raises(AttributeError):
+            domain.charge
+        assert len(transport.calls) == 2
+
+    @pytest.mark.parametrize("hydrate", ("eager", "lazy"))
+    def test_detailed_list(self, hydrate):
+        """Test single request lookups when the list carries details."""
+        client, transport = self._client(self.detail)
+        domain = client.domain(name="example.co.za", hydrate=hydrate)
+        assert domain.autorenew is True
+        with pytest.raises(AttributeError):
+            domain.charge
+        assert len(transport.calls) == 1
+
+    def test_listing_not_lazy(self):
+        """Test that collection members are not hydrated on access."""
+        client, transport = self._client(self.summary)
+        domain, = client.domains
+        with pytest.raises(AttributeError):
+            domain.autorenew
+        assert len(transport.calls) == 1
+        with pytest.raises(ValueError):
+            client.domain(name="example.co.za", hydrate="sometimes")
@@ -0,0 +1,185 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway request coalescing tests."""
+
+import asyncio
+import threading
+import time
+
+from conftest import FakeResponse, FakeTransport
+
+from dnsgateway import DnsGatewayClient
+from dnsgateway.coalesce import AsyncSingleFlight, SingleFlight
+
+import pytest
+
+ENDPOINT = "https://gateway.example.net/api"
+CALLERS = 8
+
+
+def wait_for(condition, timeout=5):
+    """Wait until `condition()` is true."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def concurrently(func, count=CALLERS):
+    """Call `func` from `count` threads, returning results or exceptions."""
+    results = [None] * count
+
+    def run(i):
+        try:
+            results[i] = func()
+        except Exception as e:
+            results[i] = e
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+class TestSingleFlight(object):
+    """Test cases for thread-safe call coalescing."""
+
+    def test_coalesce(self):
+        """Test that concurrent calls share one call and its result."""
+        flight, release, calls = SingleFlight(), threading.Event(), []
+
+        def fetch():
+            calls.append(1)
+            release.wait()
+            return {"results": [{"wid": 1}]}
+        threads, results = concurrently(lambda: flight.do(("key", ()), fetch))
+        wait_for(lambda: flight._calls[("key", ())].followers == CALLERS - 1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 1 and not len(flight)
+        assert sorted(joined for _, joined in results) == \
+            [False] + [True] * (CALLERS - 1)
+        data = [d for d, _ in results]
+        assert all(d == {"results": [{"wid": 1}]} for d in data)
+        assert len({id(d["results"]) for d in data}) == CALLERS
+
+    def test_error(self):
+        """Test that the exception of a call is raised for every caller."""
+        flight, release = SingleFlight(), threading.Event()
+
+        def fetch():
+            release.wait()
+            raise RuntimeError("gateway down")
+        threads, results = concurrently(lambda: flight.do(("key", ()), fetch))
+        wait_for(lambda: flight._calls[("key", ())].followers == CALLERS - 1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert flight.do(("key", ()), lambda: 1) == (1, False)
+
+    def test_forget(self):
+        """Test that forgotten calls are not joined."""
+        flight, release, calls = SingleFlight(), threading.Event(), []
+
+        def fetch():
+            calls.append(1)
+            release.wait()
+            return len(calls)
+        threads, results = concurrently(lambda: flight.do(("key", ()), fetch),
+                                        count=1)
+        wait_for(lambda: calls)
+        flight.forget()
+        release.set()
+        assert flight.do(("key", ()), fetch) == (2, False)
+        threads[0].join()
+        assert results[0][1] is False
+        assert len(calls) == 2
+
+
+class TestAsyncSingleFlight(object):
+    """Test cases for coroutine call coalescing."""
+
+    def test_cancel(self):
+        """Test that cancelling the first caller does not cancel others."""
+        async def run():
+            flight, calls = AsyncSingleFlight(), []
+
+            async def fetch():
+                calls.append(1)
+                await asyncio.sleep(0.01)
+                return {"wid": 1}
+            first = asyncio.ensure_future(flight.do(("key", ()), fetch))
+            await asyncio.sleep(0)
+            rest = [asyncio.ensure_future(flight.do(("key", ()), fetch))
+                    for _ in range(3)]
+            await asyncio.sleep(0)
+            first.cancel()
+            results = await asyncio.gather(*rest)
+            with pytest.raises(asyncio.CancelledError):
+                await first
+            return results, calls, len(flight)
+        results, calls, pending = asyncio.run(run())
+        assert results == [({"wid": 1}, True)] * 3
+        assert len(calls) == 1 and not pending
+
+
+class TestClientCoalescing(object):
+    """Test cases for coalesced client reads."""
+
+    def _client(self, release, **options):
+        def handler(method, url, params, json):
+            if method == "GET":
+                release.wait()
+                return FakeResponse({"wid": 3, "name": "example.co.za"})
+            return FakeResponse({"wid": 3, "name": "example.co.za"})
+        transport = FakeTransport(handler)
+        return DnsGatewayClient(endpoint=ENDPOINT, transport=transport,
+                                **options), transport
+
+    def test_client(self):
+        """Test coalescing of concurrent identical lookups."""
+        release = threading.Event()
+        client, transport = self._client(release)
+        threads, results = concurrently(lambda: client.domain(wid=3))
+        wait_for(lambda: client.single_flight._calls and next(iter(
+            client.single_flight._calls.values())).followers == CALLERS - 1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert [d.wid for d in results] == [3] * CALLERS
+        assert len(transport.calls) == 1
+        assert client.stats.as_dict()["coalesced"] == CALLERS - 1
+
+    def test_writes(self):
+        """Test that reads after a write don't join earlier reads."""
+        release = threading.Event()
+        client, transport = self._client(release)
+        threads, _ = concurrently(lambda: client.domain(wid=3), count=1)
+        wait_for(lambda: transport.calls)
+        client._put(path="registry/domains/3", data={"autorenew": True})
+        release.set()
+        client.domain(wid=3)
+        threads[0].join()
+        assert [m for m, *_ in transport.calls] == ["GET", "PUT", "GET"]
+        assert client.stats.coalesced == 0
+
+    def test_disabled(self):
+        """Test clients without coalescing."""
+        release = threading.Event()
+        release.set()
+        client, transport = self._client(release, coalesce=False)
+        threads, _ = concurrently(lambda: client.domain(wid=3))
+        for thread in threads:
+            thread.join()
+        assert client.single_flight is None
+        assert len(transport.calls) == CALLERS
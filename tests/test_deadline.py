@@ -0,0 +1,213 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway timeout and deadline tests."""
+
+import asyncio
+import threading
+
+from conftest import FakeAsyncTransport, FakeResponse, FakeTransport
+
+from dnsgateway import AsyncDnsGatewayClient, DnsGatewayClient
+from dnsgateway.deadline import (DEADLINES, Deadline, DeadlineExceeded,
+                                 DeadlineScope)
+from dnsgateway.retry import RetryPolicy
+from dnsgateway.testing import MockGateway, MockRegistry
+
+import pytest
+
+ENDPOINT = "https://gateway.example.net/api"
+
+
+class Clock(object):
+    """Manually advanced clock."""
+
+    def __init__(self):
+        """Initialise a new clock."""
+        self.now = 100.0
+
+    def __call__(self):
+        """Get the current time."""
+        return self.now
+
+
+def ok(method, url, params, json):
+    """Serve an empty collection page."""
+    return FakeResponse({"count": 0, "next": None, "results": []})
+
+
+@pytest.fixture(scope="module")
+def registry():
+    """Get a seeded registry."""
+    return MockRegistry().seed(domains=20, contacts=1)
+
+
+class TestDeadline(object):
+    """Test cases for deadlines."""
+
+    def test_remaining(self):
+        """Test the time remaining and request timeout clipping."""
+        clock = Clock()
+        deadline = Deadline(5, clock=clock)
+        assert deadline.timeout((10, 60)) == (5, 5)
+        clock.now += 4
+        assert deadline.remaining() == 1
+        assert deadline.timeout((0.5, 60)) == (0.5, 1)
+        assert deadline.timeout(None) == (1, 1)
+        assert not deadline.expired
+        deadline.check(delay=0.5)
+        with pytest.raises(DeadlineExceeded):
+            deadline.check(delay=1)
+        clock.now += 1
+        assert deadline.expired
+
+    def test_exceeded(self):
+        """Test that the exception says how far the call got."""
+        clock = Clock()
+        deadline = Deadline(2, clock=clock)
+        deadline.record_response()
+        deadline.record_response()
+        deadline.record_page()
+        clock.now += 2.5
+        with pytest.raises(DeadlineExceeded) as e:
+            deadline.check("GET registry/domains/")
+        assert isinstance(e.value, TimeoutError)
+        assert (e.value.budget, e.value.elapsed, e.value.requests,
+                e.value.pages) == (2, 2.5, 2, 1)
+        assert str(e.value) == "deadline of 2s exceeded after 2.500s with " \
+                               "2 responses and 1 pages received, " \
+                               "during GET registry/domains/"
+
+    def test_nested(self):
+        """Test that nested scopes keep the earlier deadline."""
+        outer, inner = Deadline(1), Deadline(10)
+        with DeadlineScope(outer, DEADLINES) as current:
+            assert current is outer
+            with DeadlineScope(inner, DEADLINES) as current:
+                assert current is outer
+            shorter = Deadline(0.5)
+            with DeadlineScope(shorter, DEADLINES) as current:
+                assert current is shorter
+            assert DEADLINES.get() is outer
+        assert DEADLINES.get() is None
+
+    def test_bind(self):
+        """Test that bound functions see the deadline in other threads."""
+        seen = []
+
+        def task():
+            seen.append(DEADLINES.get())
+        with DeadlineScope(Deadline(1), DEADLINES) as deadline:
+            bound = DEADLINES.bind(task)
+        for func in (task, bound):
+            thread = threading.Thread(target=func)
+            thread.start()
+            thread.join()
+        assert seen == [None, deadline]
+
+
+class TestClientTimeouts(object):
+    """Test cases for client request timeouts and deadlines."""
+
+    @pytest.mark.parametrize("timeout,expected", (
+        ((10.0, 60.0), (10.0, 60.0)),
+        (5, (5.0, 5.0)),
+        (None, None),
+    ))
+    def test_timeout(self, timeout, expected):
+        """Test that request timeouts are passed to the transport."""
+        transport = FakeTransport(ok)
+        client = DnsGatewayClient(endpoint=ENDPOINT, transport=transport,
+                                  timeout=timeout)
+        list(client.domains)
+        assert transport.timeouts == [expected]
+
+    def test_clipped(self):
+        """Test that request timeouts are clipped to the deadline."""
+        transport = FakeTransport(ok)
+        client = DnsGatewayClient(endpoint=ENDPOINT, transport=transport)
+        with client.deadline(2):
+            list(client.domains)
+        connect, read = transport.timeouts[0]
+        assert 1 < connect == read <= 2
+
+    def test_retry_delay(self):
+        """Test that retries that would overrun the deadline are not made."""
+        def unavailable(method, url, params, json):
+            return FakeResponse({}, status_code=503,
+                                headers={"Retry-After": "30"})
+        transport = FakeTransport(unavailable)
+        client = DnsGatewayClient(endpoint=ENDPOINT, transport=transport,
+                                  retry=RetryPolicy(total=3))
+        with pytest.raises(DeadlineExceeded) as e:
+            with client.deadline(5):
+                client.domain(wid=1)
+        assert len(transport.calls) == 1
+        assert e.value.requests == 1
+        assert e.value.elapsed < 1
+        assert e.value.operation == f"GET {ENDPOINT}/registry/domains/1"
+
+    def test_read_timeout(self, registry):
+        """Test that a stalled lookup and refresh raise in time."""
+        with MockGateway(registry, latency=0.2) as gateway:
+            client = DnsGatewayClient(endpoint=gateway.endpoint,
+                                      retry=RetryPolicy(total=3))
+            name = registry.records["domains"][3]["name"]
+            with pytest.raises(DeadlineExceeded) as e:
+                with client.deadline(0.3):
+                    client.domain(name=name).refresh()
+        assert e.value.requests == 1
+        assert e.value.elapsed < 0.5
+
+    @pytest.mark.parametrize("prefetch", (0, 2))
+    def test_pagination(self, registry, prefetch):
+        """Test that a deadline applies to a whole collection walk."""
+        with MockGateway(registry, page_size=2, latency=0.05) as gateway:
+            client = DnsGatewayClient(endpoint=gateway.endpoint,
+                                      prefetch=prefetch)
+            domains = []
+            with pytest.raises(DeadlineExceeded) as e:
+                with client.deadline(0.2):
+                    domains.extend(client.domains)
+        assert 0 < e.value.pages <= e.value.requests < 10
+        assert len(domains) == 2 * e.value.pages
+
+    def test_within_deadline(self, registry):
+        """Test that calls completing in time are counted."""
+        with MockGateway(registry, page_size=10) as gateway:
+            client = DnsGatewayClient(endpoint=gateway.endpoint)
+            with client.deadline(5) as deadline:
+                domains = list(client.domains)
+        assert len(domains) == 20
+        assert (deadline.requests, deadline.pages) == (2, 2)
+
+    def test_async(self, registry):
+        """Test deadlines on the asynchronous client."""
+        async def run(endpoint):
+            async with AsyncDnsGatewayClient(endpoint=endpoint) as client:
+                await client.domain(wid=1)
+                async with client.deadline(0.2):
+                    return [d async for d in client.domains]
+        with MockGateway(registry, page_size=2, latency=0.05) as gateway:
+            with pytest.raises(DeadlineExceeded) as e:
+                asyncio.run(run(gateway.endpoint))
+        assert 0 < e.value.pages <= e.value.requests < 10
+
+    def test_async_timeout(self):
+        """Test that request timeouts are passed to async transports."""
+        async def run(client):
+            async with client.deadline(2):
+                return [d async for d in client.domains]
+        transport = FakeAsyncTransport(ok)
+        client = AsyncDnsGatewayClient(endpoint=ENDPOINT, transport=transport)
+        asyncio.run(run(client))
+        connect, read = transport.timeouts[0]
+        assert 1 < connect == read <= 2
@@ -0,0 +1,125 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway registry export tests."""
+
+import gzip
+import io
+import json
+
+from dnsgateway import DnsGatewayClient
+from dnsgateway.cli import EXPORT_COMPRESSIONS, EXPORT_FORMATS, main
+from dnsgateway.export import (COMPRESSIONS, FORMATS, guess_format,
+                               read_snapshot, snapshot_hashes)
+from dnsgateway.testing import MockGateway, MockRegistry
+
+import pytest
+
+SNAPSHOTS = (("ndjson", "gzip"), ("ndjson", "zstd"), ("ndjson", "none"),
+             ("parquet", "zstd"))
+
+
+@pytest.fixture()
+def registry():
+    """Get a seeded registry."""
+    return MockRegistry().seed(domains=25, contacts=2)
+
+
+@pytest.fixture()
+def gateway(registry):
+    """Get a gateway serving the registry."""
+    with MockGateway(registry, page_size=10) as gateway:
+        yield gateway
+
+
+class TestExport(object):
+    """Test cases for registry snapshots."""
+
+    def _export(self, client, snapshot, **kwargs):
+        fp = io.BytesIO()
+        format, compression = snapshot
+        stats = client.export(fp, format=format, compression=compression,
+                              **kwargs)
+        fp.seek(0)
+        return fp, stats
+
+    @pytest.mark.parametrize("snapshot", SNAPSHOTS)
+    def test_full(self, gateway, snapshot):
+        """Test that a full snapshot holds every record."""
+        if snapshot[0] == "parquet":
+            pytest.importorskip("pyarrow")
+        if snapshot[1] == "zstd":
+            pytest.importorskip("zstandard")
+        client = DnsGatewayClient(endpoint=gateway.endpoint, stream=True)
+        fp, stats = self._export(client, snapshot)
+        assert {t: s["written"] for t, s in stats.items()} == \
+            {"zones": 5, "contacts": 2, "domains": 25}
+        entries = list(read_snapshot(fp))
+        assert len(entries) == 32
+        table, wid, digest, data = entries[-1]
+        assert (table, wid, data["wid"]) == ("domains", 25, 25)
+        assert not fp.closed
+
+    @pytest.mark.parametrize("snapshot", SNAPSHOTS)
+    def test_delta(self, gateway, registry, snapshot):
+        """Test that a delta holds only changed and deleted records."""
+        if snapshot[0] == "parquet":
+            pytest.importorskip("pyarrow")
+        if snapshot[1] == "zstd":
+            pytest.importorskip("zstandard")
+        client = DnsGatewayClient(endpoint=gateway.endpoint)
+        full, _ = self._export(client, snapshot)
+        registry.update("domains", 3, {"autorenew": "changed"})
+        registry.delete("domains", 4)
+        delta, stats = self._export(client, snapshot,
+                                    since=snapshot_hashes([full]))
+        assert stats["domains"] == {"written": 1, "unchanged": 23,
+                                    "deleted": 1}
+        assert [e[:2] + (e[3] and e[3]["autorenew"],)
+                for e in read_snapshot(delta)] == \
+            [("domains", 3, "changed"), ("domains", 4, None)]
+        full.seek(0)
+        delta.seek(0)
+        hashes = snapshot_hashes([full, delta])
+        assert len(hashes) == 31 and ("domains", 4) not in hashes
+        registry.delete("domains", 5)
+        delta, stats = self._export(client, snapshot, tables=("domains",),
+                                    since=hashes)
+        assert stats == {"domains": {"written": 0, "unchanged": 23,
+                                     "deleted": 1}}
+
+    def test_formats(self):
+        """Test guessing snapshot formats from file names."""
+        assert guess_format("registry.ndjson.gz") == ("ndjson", "gzip")
+        assert guess_format("registry.jsonl") == ("ndjson", "none")
+        assert guess_format("REGISTRY.PARQUET") == ("parquet", "zstd")
+        with pytest.raises(ValueError):
+            guess_format("registry.json")
+        assert set(FORMATS) == set(EXPORT_FORMATS)
+        assert set(COMPRESSIONS) == set(EXPORT_COMPRESSIONS)
+
+    def test_cli(self, cli, gateway, registry, tmp_path):
+        """Test the export command."""
+        full = tmp_path / "full.ndjson.gz"
+        delta = tmp_path / "delta.ndjson.gz"
+        args = ("--endpoint-url", gateway.endpoint, "export")
+        result = cli.invoke(main, args + (str(full),))
+        assert result.exit_code == 0
+        assert "domains: 25 written" in result.output
+        with gzip.open(str(full), "rt") as f:
+            assert len([json.loads(line) for line in f]) == 32
+        registry.delete("domains", 1)
+        result = cli.invoke(main, args + (str(delta), "--table", "domains",
+                                          "--since", str(full)))
+        assert result.exit_code == 0
+        assert "domains: 0 written, 24 unchanged, 1 deleted" in result.output
+        result = cli.invoke(main, args + (str(tmp_path / "registry.txt"),))
+        assert result.exit_code == 2
@@ -0,0 +1,128 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway mutation journal tests."""
+
+from conftest import FakeResponse, FakeTransport
+
+from dnsgateway import DnsGatewayClient
+from dnsgateway.journal import Journal
+
+import pytest
+
+import requests
+
+ENDPOINT = "https://gateway.example.net/api"
+DOMAINS_URL = f"{ENDPOINT}/registry/domains/"
+
+
+class TestJournal(object):
+    """Test cases for the mutation journal."""
+
+    def _client(self, tmp_path, registry, fail=()):
+        def handler(method, url, params, json):
+            if url.endswith("/check/"):
+                return FakeResponse({"results": [{"avail": 1}],
+                                     "charge": {"action":
+                                                {"create": "10.00"}}})
+            if method == "GET" and url == DOMAINS_URL:
+                results = [d for d in registry.values()
+                           if d["name"] == params["name"]]
+                return FakeResponse({"count": len(results), "next": None,
+                                     "results": results})
+            if method == "GET":
+                wid = int(url.rsplit("/", 1)[1])
+                if wid in registry:
+                    return FakeResponse(registry[wid])
+                return FakeResponse({"detail": "not found"}, status_code=404)
+            if method == "POST":
+                if json["name"] in fail:
+                    raise requests.exceptions.ConnectionError
+                if json["name"].startswith("invalid"):
+                    return FakeResponse({"detail": "invalid"},
+                                        status_code=400)
+                wid = len(registry) + 1
+                registry[wid] = {"wid": wid, "name": json["name"]}
+                return FakeResponse(registry[wid])
+            if method == "DELETE":
+                registry.pop(int(url.rsplit("/", 1)[1]))
+                return FakeResponse({})
+        transport = FakeTransport(handler)
+        journal = Journal(str(tmp_path / "journal.sqlite3"))
+        client = DnsGatewayClient(endpoint=ENDPOINT, transport=transport,
+                                  journal=journal)
+        return client, transport, journal
+
+    def test_outcomes(self, tmp_path):
+        """Test journalling of completed, rejected and in-doubt requests."""
+        client, transport, journal = self._client(tmp_path, {},
+                                                  fail=("lost.co.za",))
+        client.create_domain(name="example.co.za")
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.create_domain(name="invalid.co.za")
+        with pytest.raises(requests.exceptions.ConnectionError):
+            client.create_domain(name="lost.co.za")
+        client.check_domain(name="example.co.za")
+        states = {name: journal.state("POST", DOMAINS_URL, {"name": name})
+                  for name in ("example.co.za", "invalid.co.za",
+                               "lost.co.za")}
+        assert states["example.co.za"]["state"] == "done"
+        assert states["example.co.za"]["wid"] == 1
+        assert states["invalid.co.za"]["state"] == "failed"
+        assert states["lost.co.za"]["state"] == "pending"
+        assert [e["name"] for e in journal.pending()] == ["lost.co.za"]
+        assert len(journal.db.execute(
+            "SELECT * FROM operations").fetchall()) == 3
+
+    def test_reconcile(self, tmp_path):
+        """Test resolving in-doubt requests by lookup."""
+        registry = {1: {"wid": 1, "name": "created.co.za"}}
+        client, transport, journal = self._client(tmp_path, registry)
+        for name in ("created.co.za", "missing.co.za"):
+            journal.begin("POST", DOMAINS_URL, {"name": name})
+        journal.begin("DELETE", f"{DOMAINS_URL}2")
+        assert journal.reconcile(client) == {"done": 2, "failed": 1}
+        assert journal.state("POST", DOMAINS_URL,
+                             {"name": "created.co.za"})["wid"] == 1
+        assert not journal.pending()
+
+    def test_reconcile_renewals(self, tmp_path):
+        """Test resolving in-doubt renewals by their domain's expiry date."""
+        registry = {1: {"wid": 1, "name": "renewed.co.za",
+                        "curExpDate": "2021-01-01"},
+                    2: {"wid": 2, "name": "lost.co.za",
+                        "curExpDate": "2020-01-01"}}
+        client, transport, journal = self._client(tmp_path, registry)
+        for wid in registry:
+            journal.begin("POST", f"{DOMAINS_URL}{wid}/renew/",
+                          {"period": 1, "curExpDate": "2020-01-01"})
+        assert journal.reconcile(client) == {"done": 1, "failed": 1}
+        states = {wid: journal.state("POST", f"{DOMAINS_URL}{wid}/renew/")
+                  for wid in registry}
+        assert states[1]["state"] == "done" and states[1]["wid"] == 1
+        assert states[2]["state"] == "failed"
+
+    def test_resume(self, tmp_path):
+        """Test that resumed bulk runs skip completed creates."""
+        registry = {}
+        client, transport, journal = self._client(tmp_path, registry,
+                                                  fail=("b.co.za",))
+        rows = [{"name": name} for name in ("a.co.za", "b.co.za")]
+        results = {r["name"]: r["status"]
+                   for r in client.create_domains(rows, workers=1)}
+        assert results == {"a.co.za": "created", "b.co.za": "failed"}
+        client, transport, journal = self._client(tmp_path, registry)
+        results = {r["name"]: r["status"]
+                   for r in client.create_domains(rows, resume=True)}
+        assert results == {"a.co.za": "skipped", "b.co.za": "created"}
+        creates = [c for c in transport.calls if c[0] == "POST"
+                   and not c[1].endswith("/check/")]
+        assert [c[3]["name"] for c in creates] == ["b.co.za"]
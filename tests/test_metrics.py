@@ -0,0 +1,161 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway request metrics tests."""
+
+import asyncio
+
+from conftest import FakeAsyncTransport, FakeResponse, paginate
+
+from dnsgateway import AsyncDnsGatewayClient, DnsGatewayClient
+from dnsgateway.metrics import (MetricsSink, PrometheusMetrics, RequestEvent,
+                                path_template)
+from dnsgateway.retry import RetryPolicy
+from dnsgateway.testing import MockGateway, MockRegistry
+
+import pytest
+
+import requests
+
+ENDPOINT = "https://gateway.example.net/api"
+
+
+class RecordingSink(MetricsSink):
+    """Metrics sink keeping every event."""
+
+    def __init__(self):
+        """Initialise a new sink."""
+        self.events = []
+        self.pages = []
+
+    def record_request(self, event):
+        """Keep a request event."""
+        self.events.append(event)
+
+    def record_page(self, path):
+        """Keep a page path."""
+        self.pages.append(path)
+
+
+def event(status=200, duration=0.02, size=100, path="registry/domains/"):
+    """Build a request event."""
+    return RequestEvent(request_id="1", method="GET",
+                        url=f"{ENDPOINT}/{path}", path=path,
+                        attempt=0, status=status, error=None,
+                        request_bytes=0, response_bytes=size,
+                        duration=duration)
+
+
+class TestPrometheusMetrics(object):
+    """Test cases for the Prometheus exporter."""
+
+    @pytest.mark.parametrize("url, expected", (
+        (f"{ENDPOINT}/registry/domains/", "registry/domains/"),
+        (f"{ENDPOINT}/registry/domains/42", "registry/domains/{wid}"),
+        (f"{ENDPOINT}/registry/domains/?limit=100&offset=200",
+         "registry/domains/"),
+        ("https://other.example.net/check/", "check/"),
+    ))
+    def test_path_template(self, url, expected):
+        """Test templating of request paths."""
+        assert path_template(url, ENDPOINT) == expected
+
+    def test_render(self):
+        """Test the Prometheus text format."""
+        metrics = PrometheusMetrics()
+        metrics.record_request(event())
+        metrics.record_request(event(duration=0.3, size=5000))
+        metrics.record_request(event(status=None, duration=1))
+        metrics.record_page("registry/domains/")
+        text = metrics.render()
+        assert "# TYPE dnsgateway_requests_total counter" in text
+        assert 'dnsgateway_requests_total{method="GET",' \
+            'path="registry/domains/",status="200"} 2' in text
+        assert 'status="error"} 1' in text
+        labels = 'method="GET",path="registry/domains/"'
+        assert f'dnsgateway_request_duration_seconds_bucket{{{labels},' \
+            'le="0.025"} 1' in text
+        assert f'dnsgateway_request_duration_seconds_bucket{{{labels},' \
+            'le="+Inf"} 3' in text
+        assert f"dnsgateway_request_duration_seconds_count{{{labels}}} 3" \
+            in text
+        assert f"dnsgateway_response_size_bytes_sum{{{labels}}} 5100" in text
+        assert 'dnsgateway_pages_total{path="registry/domains/"} 1' in text
+        assert "# EOF" not in text
+
+    def test_openmetrics(self, tmp_path):
+        """Test the OpenMetrics format and writing to a file."""
+        metrics = PrometheusMetrics()
+        metrics.record_request(event())
+        path = tmp_path / "gateway.prom"
+        metrics.write(str(path), openmetrics=True)
+        text = path.read_text()
+        assert "# TYPE dnsgateway_requests counter" in text
+        assert text.endswith("# EOF\n")
+        assert list(tmp_path.iterdir()) == [path]
+
+
+class TestClientMetrics(object):
+    """Test cases for client instrumentation."""
+
+    def test_client(self):
+        """Test metrics of requests, retries and pages."""
+        registry = MockRegistry().seed(domains=25, contacts=1)
+        sink, metrics = RecordingSink(), PrometheusMetrics()
+        with MockGateway(registry, page_size=10) as gateway:
+            client = DnsGatewayClient(endpoint=gateway.endpoint,
+                                      metrics=[sink, metrics],
+                                      retry=RetryPolicy(total=1,
+                                                        backoff_factor=0))
+            assert len(list(client.domains)) == 25
+            gateway.fail(503)
+            client.domain(wid=3)
+            with pytest.raises(requests.exceptions.HTTPError):
+                client.domain(wid=99)
+        assert sink.pages == ["registry/domains/"] * 3
+        assert [(e.path, e.attempt, e.status) for e in sink.events[3:]] == [
+            ("registry/domains/{wid}", 0, 503),
+            ("registry/domains/{wid}", 1, 200),
+            ("registry/domains/{wid}", 0, 404),
+        ]
+        assert all(e.duration > 0 and e.response_bytes > 0
+                   for e in sink.events)
+        assert metrics.requests[("GET", "registry/domains/", "200")] == 3
+        assert metrics.pages["registry/domains/"] == 3
+
+    def test_transport_error(self):
+        """Test metrics of requests without a response."""
+        sink = RecordingSink()
+        client = DnsGatewayClient(endpoint="http://127.0.0.1:9/api",
+                                  metrics=sink)
+        with pytest.raises(requests.exceptions.ConnectionError):
+            client.domain(wid=1)
+        assert sink.events[0].status is None
+        assert isinstance(sink.events[0].error,
+                          requests.exceptions.ConnectionError)
+
+    def test_async_client(self):
+        """Test metrics of the asyncio client."""
+        results = [{"wid": i, "name": f"example-{i}.co.za"} for i in range(5)]
+        pages = paginate(f"{ENDPOINT}/registry/domains/", results)
+        sink = RecordingSink()
+
+        async def list_domains():
+            transport = FakeAsyncTransport(
+                lambda method, url, params, json: FakeResponse(pages[url])
+            )
+            async with AsyncDnsGatewayClient(endpoint=ENDPOINT,
+                                             transport=transport,
+                                             metrics=sink) as client:
+                return [d async for d in client.domains]
+        assert len(asyncio.run(list_domains())) == 5
+        assert len(sink.pages) == len(sink.events) == 3
+        assert {e.path for e in sink.events} == {"registry/domains/"}
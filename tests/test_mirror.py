@@ -0,0 +1,142 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway registry mirror tests."""
+
+from conftest import FakeResponse, FakeTransport, paginate
+
+from dnsgateway import DnsGatewayClient
+from dnsgateway.cli import MIRROR_TABLES
+from dnsgateway.domain import Domain
+from dnsgateway.mirror import Mirror, domain_contacts
+from dnsgateway.testing import MockGateway, MockRegistry
+
+import pytest
+
+ENDPOINT = "https://gateway.example.net/api"
+
+
+class Registry(object):
+    """Minimal registry serving list and detail responses."""
+
+    def __init__(self):
+        """Initialise the registry data."""
+        self.data = {
+            "zones": [{"wid": 1, "zone": "co.za"}],
+            "contacts": [{"wid": 1, "id": "TEST", "email": "a@example.com"}],
+            "domains": [{"wid": i, "name": f"example-{i}.co.za",
+                         "zone": "co.za", "cdate": "2019-01-01",
+                         "curExpDate": f"2020-01-{i + 1:02d}",
+                         "registrant": "TEST"}
+                        for i in range(5)],
+        }
+
+    def __call__(self, method, url, params, json):
+        """Handle a request."""
+        for table, records in self.data.items():
+            pages = paginate(f"{ENDPOINT}/registry/{table}/", records)
+            if url in pages:
+                return FakeResponse(pages[url])
+            for record in records:
+                if url == f"{ENDPOINT}/registry/{table}/{record['wid']}":
+                    return FakeResponse(dict(record, detail=True))
+        return FakeResponse({}, status_code=404)
+
+
+class TestMirror(object):
+    """Test cases for the registry mirror."""
+
+    @pytest.fixture()
+    def registry(self):
+        """Get a registry."""
+        return Registry()
+
+    @pytest.fixture()
+    def mirror(self, registry, tmp_path):
+        """Get a mirror of the registry."""
+        transport = FakeTransport(registry)
+        client = DnsGatewayClient(endpoint=ENDPOINT, transport=transport)
+        with Mirror(str(tmp_path / "mirror.sqlite3"), client=client) as m:
+            yield m
+
+    def test_initial_sync(self, mirror):
+        """Test populating an empty mirror."""
+        stats = mirror.sync()
+        assert stats["domains"]["added"] == 5
+        assert stats["contacts"]["added"] == 1
+        assert stats["zones"]["added"] == 1
+        assert mirror.count("domains") == 5
+        assert mirror.get_meta("synced") is not None
+
+    def test_incremental_sync(self, mirror, registry):
+        """Test that only changed records are rewritten."""
+        mirror.sync()
+        registry.data["domains"][0]["curExpDate"] = "2021-01-01"
+        del registry.data["domains"][4]
+        calls = len(mirror.client.transport.calls)
+        stats = mirror.sync(tables=("domains",), detail=True)
+        assert stats["domains"] == {"added": 0, "updated": 1,
+                                    "unchanged": 3, "deleted": 1}
+        assert len(mirror.client.transport.calls) - calls == 3
+        domain, = mirror.domains(name="example-0.co.za")
+        assert domain.detail is True
+
+    def test_updated_fields(self, tmp_path):
+        """Test that a change to any listed field is synchronised."""
+        registry = MockRegistry().seed(domains=3)
+        with MockGateway(registry) as gateway:
+            client = DnsGatewayClient(endpoint=gateway.endpoint)
+            with Mirror(str(tmp_path / "mirror.sqlite3"),
+                        client=client) as mirror:
+                mirror.sync(tables=("domains",))
+                autorenew = registry.get("domains", 2)["autorenew"]
+                registry.update("domains", 2, {"autorenew": not autorenew})
+                stats = mirror.sync(tables=("domains",), detail=True)
+                assert stats["domains"] == {"added": 0, "updated": 1,
+                                            "unchanged": 2, "deleted": 0}
+                domain, = mirror.query("domains", where="wid = ?",
+                                       params=(2,))
+                assert domain.autorenew is not autorenew
+
+    def test_store(self, mirror):
+        """Test that a sync skips unchanged records stored in between."""
+        mirror.sync(tables=("domains",))
+        records = [mirror.client._get(path=f"{Domain.base_path}/{wid}")
+                   for wid in (1, 2)]
+        mirror.store("domains", records)
+        stats = mirror.sync(tables=("domains",))
+        assert stats["domains"]["unchanged"] == 5
+        domain, = mirror.query("domains", where="wid = ?", params=(1,))
+        assert domain.detail is True
+
+    def test_queries(self, mirror):
+        """Test indexed queries."""
+        mirror.sync()
+        domains = list(mirror.domains(registrant="TEST", zone="co.za"))
+        assert len(domains) == 5
+        assert all(isinstance(d, Domain) for d in domains)
+        expiring = list(mirror.query("domains", where="expiry < ?",
+                                     params=("2020-01-03",),
+                                     order_by="expiry"))
+        assert [d.wid for d in expiring] == [0, 1]
+        with pytest.raises(ValueError):
+            list(mirror.domains(data="x"))
+
+    def test_domain_contacts(self):
+        """Test extraction of contact handles."""
+        record = {"registrant": {"id": "A"},
+                  "contacts": [{"type": "admin", "contact": {"id": "B"}}]}
+        assert domain_contacts(record) == {"registrant": "A", "admin": "B",
+                                           "tech": None, "billing": None}
+
+    def test_cli_tables(self):
+        """Test that the CLI offers every mirrored table."""
+        assert set(MIRROR_TABLES) == set(Mirror.tables)
@@ -0,0 +1,88 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway output formatting tests."""
+
+import csv
+import io
+import json
+from unittest.mock import patch
+
+from dnsgateway.domain import Domain
+from dnsgateway.output import RecordWriter, json_encoder, project
+
+import pytest
+
+RECORDS = [{"wid": i, "name": f"example-{i}.co.za", "zone": "co.za",
+            "hosts": [{"hostname": "ns1.example.net"}]} for i in range(5)]
+FIELDS = ("name", "hosts", "expiry")
+
+
+def pages(size=2):
+    """Get pages of domains."""
+    domains = [Domain(client=None, **r) for r in RECORDS]
+    return [iter(domains[i:i + size]) for i in range(0, len(domains), size)]
+
+
+class TestRecordWriter(object):
+    """Test cases for list output formats."""
+
+    def _write(self, format, fields=FIELDS, size=2):
+        return list(RecordWriter(format=format, fields=fields)
+                    .write(pages(size)))
+
+    def test_project(self):
+        """Test projection of selected properties."""
+        domain = Domain(client=None, lazy=True, **RECORDS[0])
+        assert project(domain, ("name", "expiry")) == {
+            "name": "example-0.co.za", "expiry": None
+        }
+        assert project(domain) == RECORDS[0]
+
+    def test_ndjson(self):
+        """Test NDJSON output, written a page at a time."""
+        chunks = self._write("ndjson")
+        assert len(chunks) == 3
+        lines = "".join(chunks).splitlines()
+        assert [json.loads(line) for line in lines] == [
+            {"name": r["name"], "hosts": r["hosts"], "expiry": None}
+            for r in RECORDS
+        ]
+
+    @pytest.mark.parametrize("size", (2, 5))
+    def test_json(self, size):
+        """Test JSON array output."""
+        assert json.loads("".join(self._write("json", fields=None,
+                                              size=size))) == RECORDS
+        assert json.loads("".join(RecordWriter(format="json")
+                                  .write([iter(())]))) == []
+
+    def test_csv(self):
+        """Test CSV output with a single header row."""
+        rows = list(csv.reader(io.StringIO("".join(self._write("csv")))))
+        assert rows[0] == list(FIELDS)
+        assert len(rows) == 6
+        assert json.loads(rows[1][1]) == RECORDS[0]["hosts"]
+        assert rows[1][2] == ""
+
+    def test_table(self):
+        """Test aligned table output."""
+        chunks = self._write("table", fields=("wid", "name"))
+        assert len(chunks) == 1
+        lines = chunks[0].splitlines()
+        assert lines[0].split() == ["WID", "NAME"]
+        assert lines[1] == "0    example-0.co.za"
+
+    def test_encoder_fallback(self):
+        """Test the standard library encoder."""
+        with patch.dict("sys.modules", {"orjson": None}):
+            encode = json_encoder()
+        assert encode({"a": [1, None]}) == '{"a":[1,null]}'
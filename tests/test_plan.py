@@ -0,0 +1,259 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway declarative plan and apply tests."""
+
+import io
+import json
+
+from dnsgateway import DnsGatewayClient
+from dnsgateway.cli import STATE_FORMATS, main
+from dnsgateway.mirror import Mirror, domain_contacts
+from dnsgateway.plan import (FORMATS, Planner, State, contact_diff,
+                             domain_diff, load_state)
+from dnsgateway.testing import MockGateway, MockRegistry
+
+import pytest
+
+YAML = """
+contacts:
+  - id: ACME
+    name: Acme
+    email: hostmaster@example.net
+    code: 2196
+domains:
+  - name: acme.co.za
+    autorenew: yes
+    hosts: ns1.example.net ns2.example.net
+    registrant: ACME
+    admin: ACME
+    tech: ACME
+    billing: ACME
+"""
+
+
+def portfolio(registry):
+    """Get a state declaring the registry's domains as they are."""
+    domains = [{"name": r["name"], "autorenew": r["autorenew"],
+                "hosts": [h["hostname"] for h in r["hosts"]],
+                "registrant": r["contacts"][0]["contact"]["id"]}
+               for r in registry.records["domains"].values()]
+    return load_state(io.StringIO(json.dumps({"domains": domains})), "json")
+
+
+class TestState(object):
+    """Test cases for loading and comparing desired states."""
+
+    def test_load(self):
+        """Test loading and normalising a state file."""
+        state = load_state(io.StringIO(YAML), "yaml")
+        assert state.contacts["ACME"]["code"] == "2196"
+        assert state.domains["acme.co.za"] == {
+            "name": "acme.co.za", "autorenew": True,
+            "hosts": ["ns1.example.net", "ns2.example.net"],
+            "registrant": "ACME", "admin": "ACME", "tech": "ACME",
+            "billing": "ACME"
+        }
+        assert set(FORMATS) == set(STATE_FORMATS)
+
+    @pytest.mark.parametrize("document", (
+        [], {"zones": []}, {"contacts": [{"name": "No Id"}]},
+        {"domains": [{"name": "x.co.za"}, {"name": "x.co.za"}]},
+        {"contacts": [{"id": "X", "colour": "blue"}]},
+    ))
+    def test_invalid(self, document):
+        """Test that malformed states are refused."""
+        with pytest.raises(ValueError):
+            load_state(io.StringIO(json.dumps(document)), "json")
+
+    def test_domain_diff(self):
+        """Test that only declared and changed fields are updated."""
+        current = {"autorenew": False,
+                   "hosts": [{"hostname": "NS2.example.net"},
+                             {"hostname": "ns1.example.net"}],
+                   "contacts": [{"type": t, "contact": {"id": "OLD"}}
+                                for t in ("registrant", "admin")]}
+        desired = {"name": "x.co.za", "autorenew": False, "period": 5,
+                   "hosts": ["ns1.example.net", "ns2.example.net."]}
+        assert domain_diff(desired, current) == ({}, {})
+        changes, data = domain_diff(dict(desired, admin="NEW"), current)
+        assert changes == {"admin": ("OLD", "NEW")}
+        assert data == {"contacts": [
+            {"type": "registrant", "contact": {"id": "OLD"}},
+            {"type": "admin", "contact": {"id": "NEW"}},
+        ]}
+
+    def test_contact_diff(self):
+        """Test that address changes keep the undeclared fields."""
+        current = {"email": "a@example.net", "phone": "+27.1",
+                   "contact_address": [{"type": t, "real_name": "A",
+                                        "city": "Durban"}
+                                       for t in ("loc", "int")]}
+        assert contact_diff({"id": "A", "name": "A"}, current) == ({}, {})
+        changes, data = contact_diff({"id": "A", "name": "B",
+                                      "email": "b@example.net"}, current)
+        assert changes == {"name": ("A", "B"),
+                           "email": ("a@example.net", "b@example.net")}
+        assert data["email"] == "b@example.net"
+        assert data["contact_address"][1] == {"type": "int",
+                                              "real_name": "B",
+                                              "city": "Durban"}
+
+
+class TestPlanner(object):
+    """Test cases for planning and applying changes."""
+
+    @pytest.fixture()
+    def registry(self):
+        """Get a seeded registry."""
+        return MockRegistry().seed(domains=30, contacts=3)
+
+    @pytest.fixture()
+    def gateway(self, registry):
+        """Get a gateway serving the registry."""
+        with MockGateway(registry, page_size=10) as gateway:
+            yield gateway
+
+    @pytest.fixture()
+    def planner(self, gateway):
+        """Get a planner."""
+        client = DnsGatewayClient(endpoint=gateway.endpoint)
+        return Planner(client, workers=4)
+
+    def test_noop(self, planner, gateway, registry):
+        """Test that an unchanged portfolio plans no changes or updates."""
+        autorenew = State(contacts={}, domains={
+            n: {"name": n, "autorenew": d["autorenew"]}
+            for n, d in ((d["name"], d)
+                         for d in registry.records["domains"].values())
+        })
+        plan = planner.plan(autorenew)
+        assert not plan and plan.unchanged == 30
+        assert set(gateway.requests) == {("GET", "collection")}
+        plan = planner.plan(portfolio(registry))
+        assert not plan and plan.unchanged == 30
+        assert gateway.requests[("GET", "object")] == 30
+
+    def test_mirror(self, planner, gateway, registry, tmp_path):
+        """Test that a mirrored portfolio is planned from a listing pass."""
+        with Mirror(str(tmp_path / "mirror.sqlite3"),
+                    client=planner.client) as mirror:
+            planner.mirror = mirror
+            state = portfolio(registry)
+            assert not planner.plan(state)
+            gateway.requests.clear()
+            assert not planner.plan(state)
+            assert set(gateway.requests) == {("GET", "collection")}
+            domain = next(iter(state.domains.values()))
+            domain["autorenew"] = not domain["autorenew"]
+            results = list(planner.apply(planner.plan(state)))
+            assert [r["status"] for r in results] == ["updated"]
+            gateway.requests.clear()
+            assert not planner.plan(state)
+            assert gateway.requests[("GET", "object")] == 1
+
+    def test_mirror_out_of_band(self, planner, gateway, registry, tmp_path):
+        """Test that a mirror shows changes made elsewhere."""
+        with Mirror(str(tmp_path / "mirror.sqlite3"),
+                    client=planner.client) as mirror:
+            planner.mirror = mirror
+            state = portfolio(registry)
+            assert not planner.plan(state)
+            first, second = list(registry.records["domains"].values())[:2]
+            autorenew = first["autorenew"]
+            registry.update("domains", first["wid"],
+                            {"autorenew": not autorenew})
+            current = second["contacts"][0]["contact"]["id"]
+            registrant, admin = [c["id"] for c in
+                                 registry.records["contacts"].values()
+                                 if c["id"] != current][:2]
+            contacts = [dict(c, contact={"id": admin})
+                        if c["type"] == "admin" else c
+                        for c in second["contacts"]]
+            registry.update("domains", second["wid"], {"contacts": contacts})
+            state.domains[second["name"]]["registrant"] = registrant
+            gateway.requests.clear()
+            plan = planner.plan(state)
+            assert plan.counts()["update"] == 2
+            changes = {c.key: c for c in plan}
+            assert changes[first["name"]].changes == \
+                {"autorenew": (not autorenew, autorenew)}
+            data = changes[second["name"]].data
+            assert domain_contacts(data) == {"registrant": registrant,
+                                             "admin": admin, "tech": current,
+                                             "billing": current}
+            assert gateway.requests[("GET", "object")] == 3
+
+    def test_apply(self, planner, gateway, registry):
+        """Test applying creates, updates and deletes in order."""
+        state = portfolio(registry)
+        names = list(state.domains)
+        state.contacts["NEW"] = {"id": "NEW", "name": "New",
+                                 "email": "new@example.net"}
+        state.domains[names[0]]["registrant"] = "NEW"
+        state.domains[names[1]]["hosts"] = ["ns9.example.net"]
+        state.domains["new.co.za"] = {"name": "new.co.za", "registrant": "NEW",
+                                      "admin": "NEW", "tech": "NEW",
+                                      "billing": "NEW"}
+        for name in names[20:]:
+            del state.domains[name]
+        plan = planner.plan(state, prune=True)
+        assert plan.counts() == {"create": 2, "update": 2, "delete": 10}
+        assert plan.unchanged == 18
+        gateway.requests.clear()
+        results = list(planner.apply(plan))
+        assert (results[0]["kind"], results[0]["action"]) == \
+            ("contact", "create")
+        assert {r["status"] for r in results} == {"created", "updated",
+                                                  "deleted"}
+        assert gateway.requests[("PUT", "object")] == 2
+        assert registry.find("domains", name="new.co.za")
+        assert not planner.plan(state, prune=True)
+
+    def test_blocked(self, planner, gateway, registry):
+        """Test that domains referencing a failed contact are skipped."""
+        state = portfolio(registry)
+        name = next(iter(state.domains))
+        state.contacts["BAD"] = {"id": "BAD"}
+        state.domains[name]["registrant"] = "BAD"
+        plan = planner.plan(state)
+        gateway.fail(status=400)
+        results = {r["key"]: r for r in planner.apply(plan)}
+        assert results["BAD"]["status"] == "failed"
+        assert results[name]["status"] == "skipped"
+        assert "BAD" in results[name]["error"]
+
+    def test_cli(self, cli, gateway, registry, tmp_path):
+        """Test the plan and apply commands."""
+        state = tmp_path / "state.yaml"
+        state.write_text(YAML)
+        args = ("--endpoint-url", gateway.endpoint)
+        result = cli.invoke(main, args + ("plan", str(state)))
+        assert result.exit_code == 0
+        assert "+ domain acme.co.za" in result.output
+        assert result.output.endswith("Plan: 2 to create, 0 to update, "
+                                      "0 to delete, 0 unchanged.\n")
+        result = cli.invoke(main, args + ("apply", str(state), "--yes"))
+        assert result.exit_code == 2
+        result = cli.invoke(main, args + ("apply", str(state),
+                                          "--max-charge", "10"),
+                            input="n\n")
+        assert result.exit_code == 1
+        assert not registry.find("contacts", id="ACME")
+        result = cli.invoke(main, args + ("apply", str(state), "-y",
+                                          "--max-charge", "10"))
+        assert result.exit_code == 2
+        result = cli.invoke(main, args + ("apply", str(state), "--yes",
+                                          "--max-charge", "10"))
+        assert result.exit_code == 0
+        assert registry.find("domains", name="acme.co.za")
+        result = cli.invoke(main, args + ("plan", str(state)))
+        assert "2 unchanged" in result.output
@@ -0,0 +1,179 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway collection query tests."""
+
+import asyncio
+import datetime
+import json
+
+from conftest import FakeAsyncTransport, FakeResponse, paginate
+
+from dnsgateway import AsyncDnsGatewayClient, DnsGatewayClient
+from dnsgateway.cli import main
+from dnsgateway.query import coerce, parse_filter_option, utc
+from dnsgateway.testing import MockGateway, MockRegistry
+
+import pytest
+
+ENDPOINT = "https://gateway.example.net/api"
+
+
+@pytest.fixture(scope="module")
+def gateway():
+    """Get a mock gateway serving a seeded registry."""
+    registry = MockRegistry().seed(domains=60, contacts=3)
+    with MockGateway(registry, page_size=10) as gateway:
+        yield gateway
+
+
+class TestFilters(object):
+    """Test cases for filter parsing and comparison."""
+
+    @pytest.mark.parametrize("text, expected", (
+        ("zone=co.za", ("zone", "co.za")),
+        ("zone__in=co.za, com", ("zone__in", ["co.za", "com"])),
+        ("expiry__isnull=yes", ("expiry__isnull", True)),
+        ("name__icontains=a=b", ("name__icontains", "a=b")),
+    ))
+    def test_parse_filter_option(self, text, expected):
+        """Test parsing of command line filters."""
+        assert parse_filter_option(text) == expected
+
+    @pytest.mark.parametrize("text", ("zone", "=co.za", "zone__near=x"))
+    def test_parse_filter_option_invalid(self, text):
+        """Test rejection of malformed filters."""
+        with pytest.raises(ValueError):
+            parse_filter_option(text)
+
+    def test_coerce(self):
+        """Test conversion of properties and arguments for comparison."""
+        expiry = "2020-01-31T10:00:00Z"
+        utc = datetime.timezone.utc
+        assert coerce(expiry, datetime.date(2020, 2, 1)) == \
+            (datetime.date(2020, 1, 31), datetime.date(2020, 2, 1))
+        assert coerce(expiry, datetime.datetime(2020, 1, 31)) == \
+            (datetime.datetime(2020, 1, 31, 10, tzinfo=utc),
+             datetime.datetime(2020, 1, 31, tzinfo=utc))
+        assert coerce(3, "10") == (3, 10)
+        assert coerce(True, "false") == (True, False)
+        assert coerce(expiry, "2020-02") == (expiry, "2020-02")
+
+    def test_utc(self):
+        """Test normalisation of dates and times to UTC."""
+        expected = datetime.datetime(2020, 1, 31, 22,
+                                     tzinfo=datetime.timezone.utc)
+        assert utc("2020-02-01T00:00:00+02:00") == expected
+        assert utc("2020-01-31T22:00:00Z") == expected
+        assert utc(datetime.datetime(2020, 1, 31, 22)) == expected
+        assert utc(datetime.date(2020, 1, 31)) == expected.replace(hour=0)
+
+
+class TestQuery(object):
+    """Test cases for collection queries."""
+
+    def test_server_filters(self, gateway):
+        """Test that exact filters and the page size are sent."""
+        client = DnsGatewayClient(endpoint=gateway.endpoint)
+        query = client.domains.filter(zone="com").page_size(4)
+        assert query.params == {"zone": "com", "limit": 4}
+        assert not query.predicates
+        requests = gateway.requests[("GET", "collection")]
+        domains = list(query)
+        expected = gateway.registry.find("domains", zone="com")
+        assert [d.wid for d in domains] == [r["wid"] for r in expected]
+        assert gateway.requests[("GET", "collection")] - requests == \
+            -(-len(expected) // 4)
+        assert [d.wid for d in query] == [d.wid for d in domains]
+
+    @pytest.mark.parametrize("prefetch", (0, 3))
+    def test_client_filters(self, gateway, prefetch):
+        """Test filters applied to received objects."""
+        client = DnsGatewayClient(endpoint=gateway.endpoint,
+                                  prefetch=prefetch)
+        records = gateway.registry.find("domains")
+        cutoff = sorted(r["curExpDate"] for r in records)[30]
+        query = client.domains(curExpDate__lt=cutoff[:10],
+                               autorenew=True, name__endswith="za")
+        expected = [r["wid"] for r in records
+                    if r["curExpDate"][:10] < cutoff[:10]
+                    and r["autorenew"] and r["name"].endswith("za")]
+        assert expected
+        assert [d.wid for d in query] == expected
+        before = datetime.datetime.fromisoformat(cutoff[:10])
+        assert [d.wid for d in client.domains.filter(
+            curExpDate__lt=before.date(), autorenew=True,
+            name__endswith="za")] == expected
+
+    def test_invalid(self, gateway):
+        """Test rejection of unknown fields and page sizes."""
+        client = DnsGatewayClient(endpoint=gateway.endpoint)
+        with pytest.raises(ValueError):
+            client.domains.filter(colour="blue")
+        with pytest.raises(ValueError):
+            client.contacts.page_size(0)
+
+    def test_async(self):
+        """Test queries of the asyncio client."""
+        domains = [{"wid": i, "name": f"example-{i}.co.za", "zone": "co.za"}
+                   for i in range(5)]
+        pages = paginate(f"{ENDPOINT}/registry/domains/", domains)
+
+        def handler(method, url, params, json):
+            assert params in (None, {"zone": "co.za"})
+            return FakeResponse(pages[url])
+
+        async def list_domains():
+            async with AsyncDnsGatewayClient(
+                endpoint=ENDPOINT, transport=FakeAsyncTransport(handler)
+            ) as client:
+                query = client.domains(zone="co.za", wid__gte=2)
+                with pytest.raises(TypeError):
+                    iter(query)
+                return [d.wid async for d in query]
+        assert asyncio.run(list_domains()) == [2, 3, 4]
+
+    def test_detail_filters(self):
+        """Test filters on properties missing from list results."""
+        registry = MockRegistry().seed(domains=4)
+        registry.update("domains", 2, {"hosts": None})
+        with MockGateway(registry, page_size=3) as gateway:
+            client = DnsGatewayClient(endpoint=gateway.endpoint)
+            query = client.domains(hosts__isnull=False)
+            assert query.detail
+            assert [d.wid for d in query] == [1, 3, 4]
+            assert gateway.requests[("GET", "object")] == 4
+            assert [d.wid for d in client.domains(hosts__isnull=True)] == [2]
+
+            async def list_domains():
+                async with AsyncDnsGatewayClient(
+                    endpoint=gateway.endpoint
+                ) as client:
+                    return [d.wid async for d in
+                            client.domains(hosts__isnull=True)]
+            assert asyncio.run(list_domains()) == [2]
+
+    def test_cli(self, cli, gateway):
+        """Test filters and page size options of list commands."""
+        result = cli.invoke(main, ("--endpoint-url", gateway.endpoint,
+                                   "domain", "list", "-o", "ndjson",
+                                   "--fields", "name,zone",
+                                   "-f", "zone=africa", "-f", "wid__lte=30",
+                                   "--page-size", "5"))
+        assert result.exit_code == 0
+        records = [json.loads(line) for line in result.output.splitlines()]
+        expected = [r["name"] for r in gateway.registry.find("domains",
+                                                             zone="africa")
+                    if r["wid"] <= 30]
+        assert [r["name"] for r in records] == expected
+        result = cli.invoke(main, ("--endpoint-url", gateway.endpoint,
+                                   "zone", "list", "-f", "colour=blue"))
+        assert result.exit_code == 2
@@ -0,0 +1,162 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway renewal scheduler tests."""
+
+import datetime
+import json
+
+from dnsgateway import DnsGatewayClient
+from dnsgateway.bulk import ChargeCeiling
+from dnsgateway.cli import main
+from dnsgateway.mirror import Mirror
+from dnsgateway.renewal import RenewalScheduler, parse_duration
+from dnsgateway.testing import MockGateway, MockRegistry
+
+import pytest
+
+NOW = datetime.datetime(2020, 6, 1, tzinfo=datetime.timezone.utc)
+WITHIN = datetime.timedelta(days=250)
+
+
+@pytest.fixture()
+def registry():
+    """Get a seeded registry."""
+    return MockRegistry().seed(domains=40, contacts=2)
+
+
+@pytest.fixture()
+def gateway(registry):
+    """Get a gateway serving the registry."""
+    with MockGateway(registry, page_size=10) as gateway:
+        yield gateway
+
+
+@pytest.fixture()
+def scheduler(gateway, tmp_path):
+    """Get a renewal scheduler with a synchronised mirror."""
+    client = DnsGatewayClient(endpoint=gateway.endpoint)
+    with Mirror(str(tmp_path / "mirror.sqlite3"), client=client) as mirror:
+        mirror.sync(tables=("domains",))
+        gateway.requests.clear()
+        yield RenewalScheduler(client, mirror, clock=lambda: NOW)
+
+
+def expiring(registry):
+    """Get the names of domains expiring within the window, by autorenew."""
+    cutoff = (NOW + WITHIN).isoformat()
+    return {autorenew: sorted(r["name"] for r in registry.find("domains")
+                              if r["curExpDate"] <= cutoff and
+                              r["autorenew"] == autorenew)
+            for autorenew in (True, False)}
+
+
+class TestRenewal(object):
+    """Test cases for the renewal scheduler."""
+
+    @pytest.mark.parametrize("value, expected", (
+        ("30d", datetime.timedelta(days=30)),
+        ("30", datetime.timedelta(days=30)),
+        ("2W", datetime.timedelta(weeks=2)),
+        (" 12h ", datetime.timedelta(hours=12)),
+    ))
+    def test_parse_duration(self, value, expected):
+        """Test parsing renewal windows."""
+        assert parse_duration(value) == expected
+
+    def test_invalid_duration(self):
+        """Test that malformed windows are refused."""
+        with pytest.raises(ValueError):
+            parse_duration("30 days")
+
+    def test_due(self, scheduler, gateway, registry):
+        """Test that due domains are answered from the index."""
+        names = expiring(registry)
+        due = scheduler.due(WITHIN)
+        assert sorted(d.name for d in due) == sorted(names[True] +
+                                                     names[False])
+        assert [d.curExpDate for d in due] == \
+            sorted(d.curExpDate for d in due)
+        assert sorted(d.name for d in scheduler.due(WITHIN, autorenew=False)) \
+            == names[False]
+        assert not gateway.requests
+
+    def test_offsets(self, scheduler, registry):
+        """Test that expiry dates in other time zones are compared in UTC."""
+        cutoff = NOW + WITHIN
+        early = datetime.timezone(datetime.timedelta(hours=2))
+        late = datetime.timezone(datetime.timedelta(hours=-2))
+        records = [r for r in registry.find("domains")
+                   if r["curExpDate"] > cutoff.isoformat()][:2]
+        due, later = (r["wid"] for r in records)
+        registry.update("domains", due, {"curExpDate": (
+            cutoff - datetime.timedelta(hours=1)).astimezone(early).isoformat()
+        })
+        registry.update("domains", later, {"curExpDate": (
+            cutoff + datetime.timedelta(hours=1)).astimezone(late).isoformat()
+        })
+        scheduler.mirror.sync(tables=("domains",))
+        wids = [d.wid for d in scheduler.due(WITHIN)]
+        assert due in wids and later not in wids
+        wids = [d.wid for d in scheduler.refresh(WITHIN)]
+        assert due in wids and later not in wids
+
+    def test_refresh(self, scheduler, gateway, registry):
+        """Test that only due domains are refreshed."""
+        due = scheduler.due(WITHIN)
+        renewed, deleted = due[0], due[1]
+        registry.get("domains", renewed.wid)["curExpDate"] = "2030-01-01"
+        registry.delete("domains", deleted.wid)
+        fresh = scheduler.refresh(WITHIN)
+        assert [d.wid for d in fresh] == [d.wid for d in due[2:]]
+        assert gateway.requests[("GET", "object")] == len(due)
+        assert ("GET", "collection") not in gateway.requests
+        assert [d.wid for d in scheduler.due(WITHIN)] == \
+            [d.wid for d in due[2:]]
+
+    def test_renew(self, scheduler, gateway, registry):
+        """Test renewing due domains within a charge ceiling."""
+        names = expiring(registry)[False]
+        ceiling = ChargeCeiling(max_total=10 * (len(names) - 1))
+        results = list(scheduler.renew(WITHIN, ceiling=ceiling,
+                                       batch_size=2))
+        assert sorted(r["name"] for r in results) == names
+        statuses = sorted(r["status"] for r in results)
+        assert statuses == ["rejected"] + ["renewed"] * (len(names) - 1)
+        assert gateway.requests[("POST", "check")] == -(-len(names) // 2)
+        renewed = [r for r in results if r["status"] == "renewed"]
+        assert all(r["expiry"] > (NOW + WITHIN).isoformat()
+                   for r in renewed)
+        assert sorted(d.name for d in scheduler.due(WITHIN,
+                                                    autorenew=False)) == \
+            [r["name"] for r in results if r["status"] == "rejected"]
+
+    def test_cli(self, cli, gateway, registry, tmp_path):
+        """Test the due and renew-due commands."""
+        args = ("--endpoint-url", gateway.endpoint, "domain")
+        mirror = ("--mirror", str(tmp_path / "mirror.sqlite3"))
+        result = cli.invoke(main, args + ("due", "--within", "30d",
+                                          "-o", "ndjson") + mirror)
+        assert result.exit_code == 0
+        due = [json.loads(line) for line in result.output.splitlines()]
+        assert len(due) == 40
+        assert set(due[0]) == {"name", "curExpDate", "autorenew"}
+        result = cli.invoke(main, args + ("renew-due",) + mirror)
+        assert result.exit_code == 2
+        result = cli.invoke(main, args + ("renew-due", "--max-charge", "10")
+                            + mirror)
+        assert result.exit_code == 0
+        results = [json.loads(line) for line in result.output.splitlines()
+                   if line.startswith("{")]
+        assert len(results) == sum(not d["autorenew"] for d in due)
+        assert {r["status"] for r in results} == {"renewed"}
+        result = cli.invoke(main, args + ("due", "--within", "1x") + mirror)
+        assert result.exit_code == 2
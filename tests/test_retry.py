@@ -0,0 +1,126 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway retry and rate limiting tests."""
+
+from unittest.mock import patch
+
+from conftest import FakeResponse, FakeTransport
+
+from dnsgateway import DnsGatewayClient
+from dnsgateway.retry import RetryPolicy, TokenBucket
+
+import pytest
+
+import requests.exceptions
+
+
+class TestRetryPolicy(object):
+    """Test cases for retry decisions."""
+
+    @pytest.mark.parametrize(("method", "status", "retryable"), (
+        ("GET", 503, True),
+        ("GET", None, True),
+        ("GET", 404, False),
+        ("DELETE", 502, True),
+        ("POST", 503, False),
+        ("POST", None, False),
+        ("POST", 429, True),
+    ))
+    def test_is_retryable(self, method, status, retryable):
+        """Test idempotency rules."""
+        policy = RetryPolicy()
+        assert policy.is_retryable(method, 0, status=status) is retryable
+        assert policy.is_retryable(method, 3, status=status) is False
+
+    def test_idempotent_override(self):
+        """Test retrying a POST marked as idempotent."""
+        policy = RetryPolicy()
+        assert policy.is_retryable("POST", 0, status=503, idempotent=True)
+
+    def test_backoff(self):
+        """Test exponential backoff without jitter."""
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5, jitter=False)
+        assert [policy.backoff(i) for i in range(4)] == [1, 2, 4, 5]
+        policy = RetryPolicy(backoff_factor=1)
+        assert all(0 <= policy.backoff(2) <= 4 for _ in range(20))
+
+    def test_retry_after(self):
+        """Test Retry-After header handling."""
+        policy = RetryPolicy(max_retry_after=60)
+        assert policy.backoff(0, {"Retry-After": "7"}) == 7
+        assert policy.backoff(0, {"Retry-After": "600"}) == 60
+        date = "Wed, 21 Oct 2015 07:28:00 GMT"
+        assert policy.backoff(0, {"Retry-After": date}) == 0
+
+
+class TestTokenBucket(object):
+    """Test cases for the client-side rate limiter."""
+
+    def test_reserve(self):
+        """Test token accrual and waits."""
+        now = [0.0]
+        bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0])
+        assert [bucket.reserve() for _ in range(4)] == [0, 0, 0.5, 1.0]
+        now[0] = 2.0
+        assert bucket.reserve() == 0
+
+
+class TestClientRetry(object):
+    """Test cases for client request retries."""
+
+    def _client(self, statuses, **kwargs):
+        statuses = iter(statuses)
+
+        def handler(method, url, params, json):
+            status = next(statuses)
+            if status is None:
+                raise requests.exceptions.ConnectionError("reset")
+            return FakeResponse({"ok": True}, status_code=status,
+                                headers={"Retry-After": "0"})
+        transport = FakeTransport(handler)
+        transport.retryable_exceptions = (requests.exceptions.ConnectionError,)
+        return DnsGatewayClient(transport=transport,
+                                retry=RetryPolicy(backoff_factor=0.01),
+                                **kwargs), transport
+
+    def test_get_retried(self):
+        """Test that idempotent requests are retried."""
+        client, transport = self._client((503, None, 200))
+        assert client._get(path="registry/zones/") == {"ok": True}
+        assert len(transport.calls) == 3
+        stats = client.stats.as_dict()
+        assert stats["requests"] == 3
+        assert stats["retries"] == 2
+        assert stats["retries_by_reason"] == {503: 1, "ConnectionError": 1}
+
+    def test_post_not_retried(self):
+        """Test that creates are not retried after server errors."""
+        client, transport = self._client((503, 200))
+        with pytest.raises(requests.exceptions.HTTPError):
+            client._post(path="registry/domains/", data={})
+        assert len(transport.calls) == 1
+
+    def test_retries_exhausted(self):
+        """Test that the last failure is raised."""
+        client, transport = self._client((429,) * 4)
+        with pytest.raises(requests.exceptions.HTTPError):
+            client._post(path="registry/domains/", data={})
+        assert len(transport.calls) == 4
+
+    def test_rate_limit(self):
+        """Test that the rate limiter delays requests."""
+        client, transport = self._client((200,) * 3, rate_limit=1)
+        with patch("dnsgateway.client.time.sleep") as sleep:
+            for _ in range(3):
+                client._get(path="registry/zones/")
+        assert sleep.call_count == 2
+        assert client.stats.limiter_waits == 2
@@ -0,0 +1,73 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway CLI start-up time tests."""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+# Cumulative import time budget for dnsgateway.cli, including click.
+IMPORT_BUDGET_US = 150000
+
+# Modules that must not be loaded until a command needs them.
+DEFERRED_MODULES = ("requests", "urllib3", "httpx", "asyncio", "sqlite3",
+                    "concurrent.futures", "dnsgateway.client",
+                    "dnsgateway.aio", "dnsgateway.base", "dnsgateway.domain",
+                    "pkg_resources")
+
+SCRIPT = """
+import json, sys
+from dnsgateway.cli import main
+main({args!r}, standalone_mode=False)
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def run(code, *options):
+    """Run `code` in a fresh interpreter, returning its output."""
+    proc = subprocess.run((sys.executable,) + options + ("-c", code),
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, check=True)
+    return proc.stdout, proc.stderr
+
+
+class TestStartup(object):
+    """Test cases for CLI cold start."""
+
+    @pytest.mark.parametrize("args", (["--help"], ["--version"],
+                                      ["domain", "list", "--help"]))
+    def test_deferred_imports(self, args):
+        """Test that help and version load no client dependencies."""
+        stdout, _ = run(SCRIPT.format(args=args))
+        modules = set(json.loads(stdout.splitlines()[-1]))
+        assert not modules.intersection(DEFERRED_MODULES)
+
+    def test_import_time(self):
+        """Test that the CLI module imports within budget."""
+        _, stderr = run("import dnsgateway.cli", "-X", "importtime")
+        for line in stderr.splitlines():
+            fields = [f.strip() for f in line.split("|")]
+            if len(fields) == 3 and fields[2] == "dnsgateway.cli":
+                assert int(fields[1]) < IMPORT_BUDGET_US
+                break
+        else:
+            pytest.fail("no import time reported for dnsgateway.cli")
+
+    def test_lazy_package_exports(self):
+        """Test that the clients are importable from the package."""
+        stdout, _ = run("import sys, dnsgateway; "
+                        "print('dnsgateway.client' in sys.modules); "
+                        "from dnsgateway import DnsGatewayClient; "
+                        "print(DnsGatewayClient.__module__)")
+        assert stdout.split() == ["False", "dnsgateway.client"]
@@ -0,0 +1,98 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway streaming decoder tests."""
+
+import json
+from unittest.mock import patch
+
+from conftest import FakeResponse, FakeTransport, paginate
+
+from dnsgateway import DnsGatewayClient
+from dnsgateway.domain import Domain
+from dnsgateway.stream import StreamedPage, iter_fallback, iter_ijson
+
+import pytest
+
+ENDPOINT = "https://gateway.example.net/api"
+RESULTS = [{"wid": i, "name": f"example-{i}.co.za", "price": 1.5,
+            "statuses": [{"status": "ok"}], "note": "café \"}]"}
+           for i in range(5)]
+PAGE = {"count": 5, "next": None, "previous": None, "results": RESULTS}
+
+
+def chunked(data, size):
+    """Serialise `data` into chunks of `size` bytes."""
+    body = json.dumps(data, ensure_ascii=False).encode()
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+class TestDecoders(object):
+    """Test cases for the incremental JSON decoders."""
+
+    @pytest.mark.parametrize("decode", (iter_ijson, iter_fallback))
+    @pytest.mark.parametrize("size", (1, 7, 4096))
+    def test_members(self, decode, size):
+        """Test decoding of top-level members and result items."""
+        members = list(decode(chunked(PAGE, size)))
+        assert members[:3] == [("count", 5), ("next", None),
+                               ("previous", None)]
+        assert members[3:] == [("results", r) for r in RESULTS]
+
+    @pytest.mark.parametrize("decode", (iter_ijson, iter_fallback))
+    def test_truncated(self, decode):
+        """Test that truncated bodies are rejected."""
+        with pytest.raises(Exception):
+            list(decode(chunked(PAGE, 64)[:-1]))
+
+
+class TestStreamedPage(object):
+    """Test cases for streamed collection pages."""
+
+    def test_envelope_after_results(self):
+        """Test access to members that follow the results."""
+        data = {"results": RESULTS, "count": 5, "next": None}
+        page = StreamedPage(chunked(data, 16))
+        assert page["count"] == 5
+        assert list(page["results"]) == RESULTS
+        assert page.get("previous") is None
+
+    def test_client(self):
+        """Test that results are yielded before the page is read."""
+        pages = paginate(f"{ENDPOINT}/registry/domains/", RESULTS)
+        read = []
+
+        def handler(method, url, params, json):
+            resp = FakeResponse(pages[url])
+            iter_content = resp.iter_content
+
+            def tracked(chunk_size=1):
+                for chunk in iter_content(chunk_size=16):
+                    read.append(chunk)
+                    yield chunk
+            resp.iter_content = tracked
+            return resp
+        transport = FakeTransport(handler)
+        client = DnsGatewayClient(endpoint=ENDPOINT, transport=transport,
+                                  stream=True)
+        domains = client.domains
+        first = next(domains)
+        assert isinstance(first, Domain) and first.wid == 0
+        assert len(b"".join(read)) < \
+            len(json.dumps(pages[transport.calls[0][1]]))
+        assert [d.wid for d in domains] == list(range(1, 5))
+        assert len(transport.calls) == 3
+
+    def test_fallback(self):
+        """Test streaming without ijson installed."""
+        with patch.dict("sys.modules", {"ijson": None}):
+            page = StreamedPage(chunked(PAGE, 10))
+            assert list(page["results"]) == RESULTS
@@ -0,0 +1,96 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway mock gateway tests."""
+
+import time
+
+from dnsgateway import DnsGatewayClient
+from dnsgateway.retry import RetryPolicy
+from dnsgateway.testing import MockGateway, MockRegistry
+
+import pytest
+
+import requests
+
+
+@pytest.fixture(scope="module")
+def registry():
+    """Get a seeded registry."""
+    return MockRegistry().seed(domains=25, contacts=3)
+
+
+class TestMockGateway(object):
+    """Test cases for the mock gateway server."""
+
+    def test_seed(self, registry):
+        """Test that seeded data is reproducible."""
+        other = MockRegistry().seed(domains=25, contacts=3)
+        assert registry.records == other.records
+        assert len(registry.find("domains")) == 25
+        assert len(registry.find("contacts", id="seed-0-1")) == 1
+
+    @pytest.mark.parametrize("prefetch", (0, 2))
+    def test_pagination(self, registry, prefetch):
+        """Test listing over several pages."""
+        with MockGateway(registry, page_size=10) as gateway:
+            client = DnsGatewayClient(endpoint=gateway.endpoint,
+                                      prefetch=prefetch)
+            domains = list(client.domains)
+            data = client._get(path="registry/domains/",
+                               params={"zone": "com"})
+        assert [d.wid for d in domains] == list(range(1, 26))
+        assert gateway.requests[("GET", "collection")] == 4
+        assert all(r["zone"] == "com" for r in data["results"])
+        assert not hasattr(domains[0], "contacts")
+
+    def test_objects(self, registry):
+        """Test lookups, checks and the lifecycle of objects."""
+        with MockGateway(registry) as gateway:
+            client = DnsGatewayClient(endpoint=gateway.endpoint)
+            name = registry.records["domains"][1]["name"]
+            domain = client.domain(name=name)
+            assert domain.contacts[0]["contact"]["id"].startswith("seed-0")
+            assert client.check_domains(["new.co.za", name, "x.invalid"]) \
+                == {"new.co.za": "10.00", name: False, "x.invalid": False}
+            contact = client.contact(id="seed-0-0", hydrate="eager")
+            assert contact.contact_address[0]["city"] == "Johannesburg"
+            with pytest.raises(requests.exceptions.HTTPError):
+                client.create_domain(name="new.co.za", charge="1.00")
+            with pytest.raises(requests.exceptions.HTTPError) as e:
+                contact.delete()
+            assert e.value.response.status_code == 400
+
+    def test_errors(self, registry):
+        """Test error injection, latency and authentication."""
+        with MockGateway(registry, latency=0.05,
+                         credentials=("user", "pass")) as gateway:
+            client = DnsGatewayClient(endpoint=gateway.endpoint,
+                                      username="user", password="pass",
+                                      retry=RetryPolicy(backoff_factor=0.01))
+            gateway.fail(503, count=2)
+            start = time.monotonic()
+            assert len(list(client.zones)) == 5
+            assert time.monotonic() - start >= 0.15
+            assert client.stats.retries == 2
+            with pytest.raises(requests.exceptions.HTTPError) as e:
+                DnsGatewayClient(endpoint=gateway.endpoint).domain(wid=1)
+            assert e.value.response.status_code == 401
+        with MockGateway(registry, error_rate=0.5) as gateway:
+            client = DnsGatewayClient(endpoint=gateway.endpoint)
+            statuses = []
+            for _ in range(20):
+                try:
+                    client.domain(wid=1)
+                    statuses.append(200)
+                except requests.exceptions.HTTPError as e:
+                    statuses.append(e.response.status_code)
+            assert set(statuses) == {200, 503}
@@ -0,0 +1,106 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway trace mode tests."""
+
+import io
+import json
+import logging
+from unittest.mock import patch
+
+from dnsgateway import DnsGatewayClient
+from dnsgateway.cli import main
+from dnsgateway.trace import REDACTED, Redacted, TraceSink, redact
+
+
+class TestRedaction(object):
+    """Test cases for the redaction of sensitive values."""
+
+    def test_redact(self):
+        """Test redaction of nested sensitive keys."""
+        data = {"name": "example.co.za", "authinfo": "secret",
+                "contacts": [{"id": "C1", "Password": "secret"}]}
+        assert redact(data) == {
+            "name": "example.co.za", "authinfo": REDACTED,
+            "contacts": [{"id": "C1", "Password": REDACTED}],
+        }
+        assert data["authinfo"] == "secret"
+        assert redact(data, keys=("name",))["name"] == REDACTED
+
+    def test_redacted_lazy(self, caplog):
+        """Test that redacted values are only built for emitted records."""
+        class Payload(dict):
+            formatted = 0
+
+            def items(self):
+                Payload.formatted += 1
+                return super().items()
+        log = logging.getLogger("dnsgateway.client")
+        with caplog.at_level(logging.INFO, logger="dnsgateway"):
+            log.debug("Details: %s", Redacted(Payload(authinfo="secret")))
+        assert Payload.formatted == 0
+        with caplog.at_level(logging.DEBUG, logger="dnsgateway"):
+            log.debug("Details: %s", Redacted(Payload(authinfo="secret")))
+        assert Payload.formatted
+        assert "secret" not in caplog.text
+
+    def test_payload_logs(self, client, caplog):
+        """Test that authinfo codes are not logged."""
+        with patch.object(client, "_post") as post, \
+                caplog.at_level(logging.DEBUG, logger="dnsgateway"):
+            post.return_value = {"name": "example.org.za"}
+            client.create_domain(name="example.org.za", charge="10.00")
+        authinfo = post.call_args[1]["data"]["authinfo"]
+        assert "Domain details" in caplog.text
+        assert authinfo not in caplog.text
+
+
+class TestTraceSink(object):
+    """Test cases for structured trace mode."""
+
+    def test_client(self, gateway, credentials):
+        """Test trace events of a client."""
+        stream = io.StringIO()
+        client = DnsGatewayClient(endpoint=gateway.endpoint,
+                                  metrics=TraceSink(stream=stream,
+                                                    redact=("name",)),
+                                  **credentials)
+        list(client.zones)
+        client._get(path="registry/domains/", params={"name": "secret"})
+        events = [json.loads(line) for line in stream.getvalue().splitlines()]
+        assert [e["event"] for e in events] == ["request", "page", "request"]
+        request = events[0]
+        assert request["status"] == 200 and request["received"] > 0
+        assert request["path"] == "registry/zones/"
+        assert request["ms"] > 0 and len(request["id"]) == 16
+        assert events[1]["path"] == "registry/zones/"
+        assert events[2]["query"] == {"name": REDACTED}
+        assert "secret" not in stream.getvalue()
+
+    def test_logger(self, caplog):
+        """Test emitting trace events to a logger."""
+        sink = TraceSink(logger=logging.getLogger("dnsgateway.trace"))
+        with caplog.at_level(logging.INFO, logger="dnsgateway.trace"):
+            sink.record_page("registry/zones/")
+        assert json.loads(caplog.records[0].getMessage())["event"] == "page"
+
+    def test_cli(self, cli, credentials, gateway, tmp_path):
+        """Test the CLI trace option."""
+        path = tmp_path / "trace.ndjson"
+        result = cli.invoke(main, ("-u", credentials["username"],
+                                   "-p", credentials["password"],
+                                   "--endpoint-url", gateway.endpoint,
+                                   "--trace", str(path),
+                                   "zone", "list", "-o", "ndjson"))
+        assert result.exit_code == 0
+        events = [json.loads(line) for line in path.read_text().splitlines()]
+        assert events[0]["event"] == "request"
+        assert events[0]["status"] == 200
@@ -0,0 +1,165 @@
+# Copyright (c) 2019 Workonline Communications (Pty) Ltd. All rights reserved.
+#
+# The contents of this file are licensed under the MIT License
+# (the "License"); you may not use this file except in compliance with the
+# License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""dnsgateway transport tests."""
+
+import asyncio
+import concurrent.futures
+import gzip
+import json
+
+from dnsgateway import AsyncDnsGatewayClient, DnsGatewayClient
+from dnsgateway.deadline import DeadlineExceeded
+from dnsgateway.testing import (COMPRESS_MIN_SIZE, MockGateway, MockRegistry,
+                                compress)
+from dnsgateway.transport import (Http2Transport, HttpxAsyncTransport,
+                                  HttpxTransport, RequestsTransport)
+
+import pytest
+
+TRANSPORTS = ("requests", "httpx", "http2")
+
+
+@pytest.fixture(scope="module")
+def registry():
+    """Get a seeded registry."""
+    return MockRegistry().seed(domains=120, contacts=2)
+
+
+def make_client(gateway, name, **kwargs):
+    """Get a client of `gateway` using the transport called `name`."""
+    if name == "http2":
+        kwargs["transport"] = Http2Transport(http1=False)
+    else:
+        kwargs["transport"] = name
+    return DnsGatewayClient(endpoint=gateway.endpoint, **kwargs)
+
+
+class TestCompression(object):
+    """Test cases for mock gateway response compression."""
+
+    def test_small(self):
+        """Test that small payloads are not compressed."""
+        payload = b"{}"
+        assert compress(payload, "gzip, br") == (payload, None)
+
+    def test_gzip(self):
+        """Test gzip compression."""
+        payload = json.dumps(list(range(COMPRESS_MIN_SIZE))).encode()
+        body, encoding = compress(payload, "gzip, deflate")
+        assert encoding == "gzip"
+        assert gzip.decompress(body) == payload
+        assert compress(payload, "identity") == (payload, None)
+
+    def test_brotli(self):
+        """Test brotli compression, if available."""
+        brotli = pytest.importorskip("brotli")
+        payload = json.dumps(list(range(COMPRESS_MIN_SIZE))).encode()
+        body, encoding = compress(payload, "gzip, deflate, br")
+        assert encoding == "br"
+        assert brotli.decompress(body) == payload
+
+
+class TestTransports(object):
+    """Test cases for the built-in transports."""
+
+    def test_default(self):
+        """Test transport selection."""
+        assert isinstance(DnsGatewayClient().transport, RequestsTransport)
+        client = DnsGatewayClient(transport="httpx", pool_maxsize=4)
+        assert isinstance(client.transport, HttpxTransport)
+        assert client.transport.max_keepalive == 4
+        client = DnsGatewayClient(transport="http2")
+        assert isinstance(client.transport, Http2Transport)
+        assert client.transport.transport.http2 is True
+        with pytest.raises(ValueError):
+            DnsGatewayClient(transport="urllib")
+
+    @pytest.mark.parametrize("name", TRANSPORTS)
+    @pytest.mark.parametrize("stream", (False, True))
+    def test_listing(self, registry, name, stream):
+        """Test listing compressed pages."""
+        with MockGateway(registry, page_size=50, compress=True,
+                         http2=name == "http2") as gateway:
+            with make_client(gateway, name, stream=stream) as client:
+                resp = client._send(url=client._url("registry/domains/"))
+                assert resp.headers["Content-Encoding"] in ("br", "gzip")
+                domains = list(client.domains)
+        assert [d.wid for d in domains] == list(range(1, 121))
+
+    @pytest.mark.parametrize("name", TRANSPORTS)
+    def test_errors(self, registry, name):
+        """Test error responses."""
+        with MockGateway(registry, http2=name == "http2") as gateway:
+            with make_client(gateway, name) as client:
+                with pytest.raises(Exception) as e:
+                    client.domain(wid=999)
+        assert e.value.response.status_code == 404
+
+    @pytest.mark.parametrize("name", TRANSPORTS)
+    def test_redirects(self, registry, name):
+        """Test that every transport follows redirects."""
+        with MockGateway(registry, http2=name == "http2") as gateway:
+            with make_client(gateway, name) as client:
+                data = client._get(path="registry/zones")
+        assert data["count"] == 5
+        assert gateway.requests[("GET", None)] == 1
+
+    @pytest.mark.parametrize("transport", (HttpxTransport, Http2Transport))
+    @pytest.mark.parametrize("timeout,expected", (
+        (None, None),
+        ((2.0, 10.0), 10.0),
+    ))
+    def test_httpx_timeout(self, registry, transport, timeout, expected):
+        """Test that httpx transports apply the request timeout, if any."""
+        transport = transport()
+        with MockGateway(registry) as gateway:
+            response = transport.request("GET", f"{gateway.endpoint}/",
+                                         timeout=timeout)
+        transport.close()
+        assert response.request.extensions["timeout"]["read"] == expected
+
+    @pytest.mark.parametrize("name", TRANSPORTS)
+    def test_deadline(self, registry, name):
+        """Test that transport timeouts expire deadlines."""
+        with MockGateway(registry, latency=0.3,
+                         http2=name == "http2") as gateway:
+            with make_client(gateway, name) as client:
+                with pytest.raises(DeadlineExceeded):
+                    with client.deadline(0.1):
+                        client.domain(wid=1)
+
+    @pytest.mark.parametrize("name,connections", (("httpx", 8),
+                                                  ("http2", 1)))
+    def test_multiplexing(self, registry, name, connections):
+        """Test that HTTP/2 requests share a single connection."""
+        with MockGateway(registry, latency=0.05,
+                         http2=name == "http2") as gateway:
+            with make_client(gateway, name) as client:
+                client.domain(wid=1)
+                with concurrent.futures.ThreadPoolExecutor(8) as pool:
+                    wids = list(pool.map(lambda wid: client.domain(wid=wid),
+                                         range(1, 9)))
+        assert [d.wid for d in wids] == list(range(1, 9))
+        assert gateway.connections == connections
+
+    def test_async_http2(self, registry):
+        """Test the asynchronous client over HTTP/2."""
+        async def lookup(endpoint):
+            transport = HttpxAsyncTransport(http2=True, http1=False)
+            async with AsyncDnsGatewayClient(endpoint=endpoint,
+                                             transport=transport) as client:
+                return await asyncio.gather(*(client.domain(wid=wid)
+                                              for wid in range(1, 9)))
+        with MockGateway(registry, latency=0.05, http2=True) as gateway:
+            domains = asyncio.run(lookup(gateway.endpoint))
+        assert [d.wid for d in domains] == list(range(1, 9))
+        assert gateway.connections == 1